@@ -0,0 +1,154 @@
+"""
+ASGI vs WSGI concurrency benchmark.
+
+Serves the async inventory views (the VM listing and a subscription detail
+page) to a logged-in user through Django's real handlers, in process:
+
+    wsgi    WSGIHandler called from a pool of CIELO_BENCH_CONCURRENCY threads,
+            like a threaded WSGI server; each request runs the async views
+            in its own event loop via async_to_sync
+    asgi    ASGIHandler with CIELO_BENCH_CONCURRENCY requests in flight on a
+            single event loop, like an ASGI server worker
+
+and reports throughput and p50/p95 latency for each.
+
+It is not collected by the regular test run; run it explicitly with:
+
+    python manage.py test benchmarks.bench_asgi
+
+Configuration is read from the environment:
+
+    CIELO_BENCH_VMS              number of synthetic VMs (default 1000)
+    CIELO_BENCH_REQUESTS         requests per handler (default 400)
+    CIELO_BENCH_CONCURRENCY      requests in flight (default 16)
+    CIELO_BENCH_MIN_ASGI_RATIO   fail when ASGI throughput / WSGI throughput is below this
+"""
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+import asyncio
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.db import connections
+from django.test import RequestFactory, TransactionTestCase
+from django.urls import reverse
+from inventory.models import AzureSubscription
+from .bench_views import percentile
+
+VMS = int(os.environ.get('CIELO_BENCH_VMS', 1000))
+REQUESTS = int(os.environ.get('CIELO_BENCH_REQUESTS', 400))
+CONCURRENCY = int(os.environ.get('CIELO_BENCH_CONCURRENCY', 16))
+MIN_ASGI_RATIO = os.environ.get('CIELO_BENCH_MIN_ASGI_RATIO')
+
+
+class ConcurrencyBenchmark(TransactionTestCase):
+    # Data must be committed: WSGI worker threads use their own connections.
+
+    def setUp(self):
+        call_command('generate_inventory_data', vms=VMS, subscriptions=10, stdout=StringIO())
+        user = get_user_model().objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark')
+        self.client.force_login(user)
+        self.cookie = f'{settings.SESSION_COOKIE_NAME}={self.client.cookies[settings.SESSION_COOKIE_NAME].value}'
+        subscription = AzureSubscription.objects.order_by('pk').first()
+        self.paths = [
+            reverse('inventory:virtual_machines'),
+            reverse('inventory:azure_subscription_detail', kwargs={'pk': subscription.pk}),
+        ]
+
+    def run_wsgi(self):
+        application = WSGIHandler()
+        factory = RequestFactory()
+
+        def get(path):
+            environ = factory._base_environ(PATH_INFO=path, HTTP_COOKIE=self.cookie)
+            statuses = []
+            started = time.perf_counter()
+            body = application(environ, lambda status, headers: statuses.append(status))
+            try:
+                b''.join(body)
+            finally:
+                body.close()
+            return int(statuses[0].split()[0]), time.perf_counter() - started
+
+        def worker(paths):
+            try:
+                return [get(path) for path in paths]
+            finally:
+                connections.close_all()
+
+        batches = [self.requested_paths()[i::CONCURRENCY] for i in range(CONCURRENCY)]
+        with ThreadPoolExecutor(CONCURRENCY) as pool:
+            return [result for results in pool.map(worker, batches) for result in results]
+
+    def run_asgi(self):
+        application = ASGIHandler()
+
+        async def get(path):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+                'query_string': b'', 'root_path': '', 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+                'headers': [(b'host', b'testserver'), (b'cookie', self.cookie.encode())],
+            }
+            request_sent = False
+            status = None
+
+            async def receive():
+                nonlocal request_sent
+                if not request_sent:
+                    request_sent = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # The client stays connected; Django cancels this when done.
+                await asyncio.Future()
+
+            async def send(message):
+                nonlocal status
+                if message['type'] == 'http.response.start':
+                    status = message['status']
+
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            return status, time.perf_counter() - started
+
+        async def main():
+            semaphore = asyncio.Semaphore(CONCURRENCY)
+
+            async def limited(path):
+                async with semaphore:
+                    return await get(path)
+
+            return await asyncio.gather(*(limited(path) for path in self.requested_paths()))
+
+        return asyncio.run(main())
+
+    def requested_paths(self):
+        return [self.paths[i % len(self.paths)] for i in range(REQUESTS)]
+
+    def measure(self, run):
+        run()  # warm up caches and connections
+        started = time.perf_counter()
+        results = run()
+        elapsed = time.perf_counter() - started
+        statuses = {status for status, _duration in results}
+        self.assertEqual(statuses, {200})
+        durations = [duration * 1000 for _status, duration in results]
+        return {
+            'rps': len(results) / elapsed,
+            'p50_ms': percentile(durations, 0.5),
+            'p95_ms': percentile(durations, 0.95),
+        }
+
+    def test_throughput(self):
+        results = {'wsgi': self.measure(self.run_wsgi), 'asgi': self.measure(self.run_asgi)}
+
+        print(f'\nConcurrency benchmark ({VMS} VMs, {REQUESTS} requests, {CONCURRENCY} in flight)')
+        print(f'{"handler":10} {"req/s":>9} {"p50 ms":>9} {"p95 ms":>9}')
+        for name, result in results.items():
+            print(f'{name:10} {result["rps"]:9.1f} {result["p50_ms"]:9.2f} {result["p95_ms"]:9.2f}')
+        if MIN_ASGI_RATIO:
+            self.assertGreaterEqual(results['asgi']['rps'] / results['wsgi']['rps'], float(MIN_ASGI_RATIO))
@@ -0,0 +1,100 @@
+"""
+Logging overhead benchmark.
+
+Measures the per-request cost, in the request thread, of the logging done by
+a view that logs ten DEBUG lines (as CieloLogoutView used to), comparing:
+
+    sync-eager      synchronous FileHandler at DEBUG, f-string messages
+                    (the previous configuration)
+    queue-lazy      QueueHandler at DEBUG, %-style arguments; the file is
+                    written by the listener thread
+    queue-info      QueueHandler at INFO, %-style arguments; DEBUG records
+                    are discarded by the level check before any formatting
+
+It is not collected by the regular test run; run it explicitly with:
+
+    python manage.py test benchmarks.bench_logging
+
+CIELO_BENCH_ITERATIONS sets the number of simulated requests (default 2000).
+"""
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+import logging
+import os
+import queue
+import statistics
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+ITERATIONS = int(os.environ.get('CIELO_BENCH_ITERATIONS', 2000))
+LINES_PER_REQUEST = 10
+FORMAT = '[{levelname}] {asctime} {name} {process:d} {thread:d} {message}'
+
+
+class FakeRequest:
+    method = 'GET'
+    path = '/users/logout/'
+    user = 'benchmark'
+    session = {'_auth_user_id': '1', '_auth_user_backend': 'django.contrib.auth.backends.ModelBackend'}
+
+
+def eager_request(logger, request):
+    for i in range(LINES_PER_REQUEST):
+        logger.debug(f"Line {i}: {request.method} {request.path} by {request.user}, session: {dict(request.session)}")
+
+
+def lazy_request(logger, request):
+    for i in range(LINES_PER_REQUEST):
+        logger.debug("Line %d: %s %s by %s, session: %s", i, request.method, request.path, request.user, request.session)
+
+
+class LoggingBenchmark(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def _logger(self, name, level, queued):
+        file_handler = logging.FileHandler(Path(self.tmp.name) / f'{name}.log')
+        file_handler.setFormatter(logging.Formatter(FORMAT, style='{'))
+        if queued:
+            records = queue.SimpleQueue()
+            handler = QueueHandler(records)
+            listener = QueueListener(records, file_handler, respect_handler_level=True)
+            listener.start()
+        else:
+            handler = file_handler
+        logger = logging.getLogger(f'cielo.bench.{name}')
+        logger.handlers = [handler]
+        logger.setLevel(level)
+        logger.propagate = False
+
+        def cleanup():
+            if queued:
+                listener.stop()
+            file_handler.close()
+            logger.handlers = []
+        self.addCleanup(cleanup)
+        return logger
+
+    def measure(self, logger, log_request):
+        request = FakeRequest()
+        log_request(logger, request)  # warm up
+        durations = []
+        for _ in range(ITERATIONS):
+            started = time.perf_counter()
+            log_request(logger, request)
+            durations.append((time.perf_counter() - started) * 1_000_000)
+        return statistics.median(durations), statistics.mean(durations)
+
+    def test_logging_overhead(self):
+        results = {
+            'sync-eager': self.measure(self._logger('sync', logging.DEBUG, queued=False), eager_request),
+            'queue-lazy': self.measure(self._logger('queue', logging.DEBUG, queued=True), lazy_request),
+            'queue-info': self.measure(self._logger('info', logging.INFO, queued=True), lazy_request),
+        }
+        print(f'\n{"configuration":<14}{"p50 us/req":>12}{"mean us/req":>13}')
+        for name, (median, mean) in results.items():
+            print(f'{name:<14}{median:>12.1f}{mean:>13.1f}')
+        self.assertLess(results['queue-info'][0], results['sync-eager'][0])
@@ -0,0 +1,94 @@
+"""
+Process startup and login benchmarks.
+
+StartupBenchmark times django.setup() in fresh interpreter processes (what
+every worker and management command pays) and checks that it opens no
+database connection. LoginBenchmark times successful logins through the
+test client and checks that each login hashes the password exactly once.
+
+It is not collected by the regular test run; run it explicitly with:
+
+    python manage.py test benchmarks.bench_startup
+
+Configuration is read from the environment:
+
+    CIELO_BENCH_STARTUP_RUNS     processes started (default 5)
+    CIELO_BENCH_ITERATIONS       timed logins (default 20)
+    CIELO_BENCH_MAX_STARTUP_MS   fail when the median django.setup() exceeds this
+    CIELO_BENCH_MAX_LOGIN_MS     fail when the median login exceeds this
+"""
+from pathlib import Path
+from unittest import mock
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from users.models import UserProfile
+
+STARTUP_RUNS = int(os.environ.get('CIELO_BENCH_STARTUP_RUNS', 5))
+ITERATIONS = int(os.environ.get('CIELO_BENCH_ITERATIONS', 20))
+MAX_STARTUP_MS = os.environ.get('CIELO_BENCH_MAX_STARTUP_MS')
+MAX_LOGIN_MS = os.environ.get('CIELO_BENCH_MAX_LOGIN_MS')
+
+SETUP_SCRIPT = """
+import json, os, time
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cielo_core.settings')
+started = time.perf_counter()
+import django
+django.setup()
+elapsed = (time.perf_counter() - started) * 1000
+from django.db import connections
+opened = [alias for alias in connections if connections[alias].connection is not None]
+print(json.dumps({'setup_ms': elapsed, 'connections': opened}))
+"""
+
+
+class StartupBenchmark(SimpleTestCase):
+    def test_django_setup(self):
+        durations = []
+        for _ in range(STARTUP_RUNS):
+            result = subprocess.run(
+                [sys.executable, '-c', SETUP_SCRIPT], cwd=Path(settings.BASE_DIR),
+                capture_output=True, text=True, check=True,
+            )
+            data = json.loads(result.stdout.strip().splitlines()[-1])
+            self.assertEqual(data['connections'], [], 'django.setup() opened a database connection')
+            durations.append(data['setup_ms'])
+        median = statistics.median(durations)
+        print(f'\ndjango.setup(): p50 {median:.1f} ms, max {max(durations):.1f} ms over {STARTUP_RUNS} processes')
+        if MAX_STARTUP_MS:
+            self.assertLessEqual(median, float(MAX_STARTUP_MS))
+
+
+class LoginBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser('admin', 'admin@example.com', 'benchmark-pass')
+        UserProfile.objects.create(user=cls.user, must_change_password=True)
+
+    def test_login(self):
+        hasher = type(get_hasher())
+        url = reverse('users:login')
+        credentials = {'username': 'admin', 'password': 'benchmark-pass'}
+        durations = []
+        with mock.patch.object(hasher, 'encode', autospec=True, side_effect=hasher.encode) as encode:
+            for _ in range(ITERATIONS):
+                self.client.logout()
+                started = time.perf_counter()
+                response = self.client.post(url, credentials)
+                durations.append((time.perf_counter() - started) * 1000)
+                self.assertEqual(response.status_code, 302)
+        self.assertEqual(encode.call_count, ITERATIONS, 'a login hashed the password more than once')
+        median = statistics.median(durations)
+        print(f'\nlogin ({hasher.algorithm}): p50 {median:.1f} ms, p95 '
+              f'{sorted(durations)[int(0.95 * (len(durations) - 1))]:.1f} ms over {ITERATIONS} logins')
+        if MAX_LOGIN_MS:
+            self.assertLessEqual(median, float(MAX_LOGIN_MS))
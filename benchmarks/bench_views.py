@@ -0,0 +1,147 @@
+"""
+View benchmark suite.
+
+Generates a synthetic inventory with the generate_inventory_data command and
+requests every URL of inventory.urls and users.urls through the Django test
+client, recording p50/p95 latency, query count and peak traced memory per URL.
+Results are compared against a stored baseline and the run fails when a URL
+is slower or uses more memory than the baseline by more than the allowed
+margin, or issues more queries than it did.
+
+It is not collected by the regular test run; run it explicitly with:
+
+    python manage.py test benchmarks.bench_views
+
+Configuration is read from the environment:
+
+    CIELO_BENCH_VMS              number of synthetic VMs (default 1000)
+    CIELO_BENCH_SUBSCRIPTIONS    number of synthetic subscriptions (default 10)
+    CIELO_BENCH_ITERATIONS       timed requests per URL (default 20)
+    CIELO_BENCH_MARGIN           allowed relative regression (default 0.25)
+    CIELO_BENCH_BASELINE         baseline file (default benchmarks/baseline.json)
+    CIELO_BENCH_UPDATE_BASELINE  set to 1 to (re)write the baseline for this dataset size
+"""
+from importlib import import_module
+from io import StringIO
+from pathlib import Path
+import json
+import os
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from inventory.models import AzureSubscription
+
+URL_MODULES = ['inventory.urls', 'users.urls']
+
+VMS = int(os.environ.get('CIELO_BENCH_VMS', 1000))
+SUBSCRIPTIONS = int(os.environ.get('CIELO_BENCH_SUBSCRIPTIONS', 10))
+ITERATIONS = int(os.environ.get('CIELO_BENCH_ITERATIONS', 20))
+MARGIN = float(os.environ.get('CIELO_BENCH_MARGIN', 0.25))
+BASELINE_PATH = Path(os.environ.get('CIELO_BENCH_BASELINE', Path(__file__).with_name('baseline.json')))
+UPDATE_BASELINE = os.environ.get('CIELO_BENCH_UPDATE_BASELINE') == '1'
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class ViewBenchmark(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('generate_inventory_data', vms=VMS, subscriptions=SUBSCRIPTIONS, stdout=StringIO())
+        cls.user = get_user_model().objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark')
+        cls.url_kwargs = {
+            'pk': AzureSubscription.objects.order_by('pk').values_list('pk', flat=True).first(),
+            'resource': 'virtual-machines',
+            'fmt': 'ndjson',
+        }
+
+    def iter_urls(self):
+        """Yields (name, url) for every pattern of the benchmarked URL modules."""
+        for module_path in URL_MODULES:
+            module = import_module(module_path)
+            for pattern in module.urlpatterns:
+                name = f'{module.app_name}:{pattern.name}'
+                converters = getattr(pattern.pattern, 'converters', {})
+                missing = [key for key in converters if key not in self.url_kwargs]
+                if missing:
+                    print(f'Skipping {name}: no benchmark value for {", ".join(missing)}')
+                    continue
+                yield name, reverse(name, kwargs={key: self.url_kwargs[key] for key in converters})
+
+    def fetch(self, url):
+        response = self.client.get(url)
+        if response.streaming:
+            # Streaming responses do their work while being consumed.
+            for _chunk in response.streaming_content:
+                pass
+        return response
+
+    def measure(self, url):
+        # Every request gets a fresh session; some URLs (logout) end it.
+        self.client.force_login(self.user)
+        self.fetch(url)  # warm up caches
+
+        durations = []
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(ITERATIONS):
+                self.client.force_login(self.user)
+                start = len(queries)
+                started = time.perf_counter()
+                self.fetch(url)
+                durations.append((time.perf_counter() - started) * 1000)
+                query_count = len(queries) - start
+
+        self.client.force_login(self.user)
+        tracemalloc.start()
+        try:
+            self.fetch(url)
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'p50_ms': round(percentile(durations, 0.5), 3),
+            'p95_ms': round(percentile(durations, 0.95), 3),
+            'queries': query_count,
+            'peak_kb': round(peak / 1024, 1),
+        }
+
+    def compare(self, name, result, baseline):
+        failures = []
+        for metric in ('p50_ms', 'p95_ms', 'peak_kb'):
+            limit = baseline[metric] * (1 + MARGIN)
+            if result[metric] > limit:
+                failures.append(f'{name} {metric}: {result[metric]} > {limit:.1f} (baseline {baseline[metric]})')
+        if result['queries'] > baseline['queries']:
+            failures.append(f'{name} queries: {result["queries"]} > baseline {baseline["queries"]}')
+        return failures
+
+    def test_views(self):
+        results = {name: self.measure(url) for name, url in self.iter_urls()}
+
+        print(f'\nView benchmark ({VMS} VMs, {SUBSCRIPTIONS} subscriptions, {ITERATIONS} iterations)')
+        print(f'{"URL":45} {"p50 ms":>9} {"p95 ms":>9} {"queries":>8} {"peak KB":>9}')
+        for name, result in results.items():
+            print(f'{name:45} {result["p50_ms"]:9.2f} {result["p95_ms"]:9.2f} {result["queries"]:8d} {result["peak_kb"]:9.1f}')
+
+        stored = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        dataset = f'{VMS}vms-{SUBSCRIPTIONS}subs'
+        if UPDATE_BASELINE or dataset not in stored:
+            stored[dataset] = results
+            BASELINE_PATH.write_text(json.dumps(stored, indent=2, sort_keys=True) + '\n')
+            print(f'Baseline for {dataset} written to {BASELINE_PATH}')
+            return
+
+        failures = []
+        for name, result in results.items():
+            if name in stored[dataset]:
+                failures.extend(self.compare(name, result, stored[dataset][name]))
+        self.assertFalse(failures, 'Benchmark regressions:\n' + '\n'.join(failures))
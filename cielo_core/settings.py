@@ -1,4 +1,5 @@
 from pathlib import Path
+import os
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -22,12 +23,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'common.middleware.PerformanceMiddleware',  # First, so it times the whole stack
+    'common.middleware.ReplicaPinningMiddleware',  # Inactive unless read replicas are configured
     'django.middleware.security.SecurityMiddleware',
+    'common.middleware.StaticFilesMiddleware',  # Inactive until collectstatic has run
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'common.middleware.DebugLoggingMiddleware',  # Add debug logging after auth
+    'common.middleware.DebugLoggingMiddleware',  # Inactive unless CIELO_DEBUG_REQUEST_LOGGING
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -53,13 +57,51 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'cielo_core.wsgi.application'
 
+# SQLite tuning: WAL lets readers run alongside the writer, synchronous=NORMAL
+# is durable in WAL mode, and IMMEDIATE transactions take the write lock up
+# front so concurrent writers wait on busy_timeout instead of failing with
+# "database is locked". Connections are kept for CONN_MAX_AGE seconds.
+SQLITE_PRAGMAS = (
+    'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; PRAGMA busy_timeout=5000; '
+    'PRAGMA temp_store=MEMORY; PRAGMA cache_size=-20000; PRAGMA mmap_size=268435456'
+)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('CIELO_DATABASE_PATH', BASE_DIR / 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': SQLITE_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
+# Read replicas for inventory reads (see common.routers.ReplicaRouter), as a
+# comma-separated list of SQLite files, e.g. kept up to date with
+# 'manage.py refresh_sqlite_replicas'. Replica connections are read-only.
+CIELO_READ_REPLICAS = []
+for number, path in enumerate(filter(None, os.environ.get('CIELO_DATABASE_REPLICAS', '').split(',')), 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path.strip(),
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'init_command': SQLITE_PRAGMAS + '; PRAGMA query_only=ON'},
+        'TEST': {'MIRROR': 'default'},
+    }
+    CIELO_READ_REPLICAS.append(alias)
+
+# Apps whose reads may be served by a replica, and seconds an unreachable
+# replica is skipped before it is tried again.
+CIELO_REPLICA_APPS = ['inventory']
+CIELO_REPLICA_RETRY_SECONDS = 30
+
+DATABASE_ROUTERS = ['common.routers.ReplicaRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -83,16 +125,124 @@ USE_I18N = True
 
 USE_TZ = True
 
+# Static assets (see common.staticfiles). collectstatic writes only the theme
+# files the templates use, under content-hashed names and with gzip (and,
+# with the 'brotli' package installed, brotli) variants, to STATIC_ROOT;
+# StaticFilesMiddleware serves them with far-future cache headers.
 STATIC_URL = 'static/'
-STATICFILES_DIRS = [BASE_DIR / 'common' / 'static']
+STATIC_ROOT = os.environ.get('CIELO_STATIC_ROOT', str(BASE_DIR / 'staticfiles'))
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'common.staticfiles.CompressedManifestStaticFilesStorage'},
+}
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'common.staticfiles.PrunedAppDirectoriesFinder',
+]
+# Theme paths collected only when used; assets that are only loaded by
+# script need a CIELO_STATIC_KEEP glob pattern.
+CIELO_STATIC_PRUNED_PREFIXES = ['material_theme/']
+CIELO_STATIC_KEEP = []
+CIELO_SERVE_STATIC = os.environ.get('CIELO_SERVE_STATIC', '1') == '1'
+# Cache lifetime of collected files without a hash in their name
+CIELO_STATIC_MAX_AGE = 60
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+AUTHENTICATION_BACKENDS = [
+    # ModelBackend with permission sets cached across requests (see users.backends)
+    'users.backends.CachedPermissionBackend',
+]
+
 LOGIN_URL = '/users/login/'
 LOGIN_REDIRECT_URL = '/inventory/'
 LOGOUT_REDIRECT_URL = '/users/login/'
 
+# CIELO navigation: seconds a cached navigation tree is kept. Trees are also
+# invalidated whenever a model listed in an app's 'cielo_navigation_models'
+# changes, through a version kept in the database like the permission cache's.
+CIELO_NAVIGATION_CACHE_TIMEOUT = 300
+
+# Seconds a user's cached permission snapshot is kept. Snapshots are also
+# invalidated whenever groups, permissions or their assignments change,
+# through a version kept in the database, so a per-process default cache is
+# safe; a shared one (e.g. Redis or Memcached) only saves recomputing them.
+CIELO_PERMISSION_CACHE_TIMEOUT = 300
+
+# How inventory listings compute their totals: 'rollup' reads the incrementally
+# maintained InventoryRollup table where the filters allow it, 'columnar' reads
+# the in-memory columnar index (see inventory.columnar), 'exact' runs
+# COUNT(*), 'estimate' reads the database planner statistics (see common.pagination).
+CIELO_INVENTORY_COUNT_MODE = 'rollup'
+
+# The columnar index keeps the VM dimensions in NumPy arrays in every process
+# (about 20 bytes per VM) when NumPy is installed. It checks the inventory
+# version at most every CIELO_COLUMNAR_REFRESH_SECONDS and then reads only the
+# rows changed since; deletions are found through tombstones, which are kept
+# for CIELO_INVENTORY_TOMBSTONE_RETENTION seconds.
+CIELO_COLUMNAR_INDEX = os.environ.get('CIELO_COLUMNAR_INDEX', '1') == '1'
+CIELO_COLUMNAR_REFRESH_SECONDS = 5
+CIELO_INVENTORY_TOMBSTONE_RETENTION = 24 * 60 * 60
+
+# Inventory pages follow changes through a server-sent events stream (see
+# inventory.events). Each process polls the change log at most every
+# CIELO_EVENTS_POLL_SECONDS for all its streams; a poll finding more than
+# CIELO_EVENTS_MAX_BATCH changed rows of a model tells pages to reload
+# instead. Streams end after CIELO_EVENTS_STREAM_SECONDS and the browser
+# reconnects where it stopped.
+CIELO_EVENTS_POLL_SECONDS = 2
+CIELO_EVENTS_HEARTBEAT_SECONDS = 15
+CIELO_EVENTS_STREAM_SECONDS = 300
+CIELO_EVENTS_MAX_BATCH = 500
+
+# Inventory pages answer reloads with 304 Not Modified while the inventory,
+# the user's permissions and the navigation are unchanged (see
+# inventory.versions). Their ETags also include CIELO_RELEASE; set it per
+# deployment (e.g. to the git commit) so pages rendered by older code are refetched.
+CIELO_RELEASE = os.environ.get('CIELO_RELEASE', '')
+
+# Azure inventory sync (see inventory.sync)
+CIELO_AZURE_API_BASE_URL = os.environ.get('CIELO_AZURE_API_BASE_URL', 'https://management.azure.com')
+CIELO_AZURE_API_VERSION = '2024-07-01'
+CIELO_AZURE_ACCESS_TOKEN = os.environ.get('CIELO_AZURE_ACCESS_TOKEN', '')
+CIELO_AZURE_SYNC_CONCURRENCY = 16
+
+# Background jobs (see common.jobs), run by 'manage.py run_jobs'. Failed jobs
+# are retried up to CIELO_JOB_MAX_ATTEMPTS times, waiting CIELO_JOB_RETRY_DELAY
+# seconds before the first retry and twice as long before each further one.
+# Running jobs whose heartbeat is older than CIELO_JOB_STALE_SECONDS are
+# assumed to have lost their worker and are requeued.
+CIELO_JOB_PROCESSES = int(os.environ.get('CIELO_JOB_PROCESSES', 2))
+CIELO_JOB_POLL_INTERVAL = 2.0
+CIELO_JOB_MAX_ATTEMPTS = 3
+CIELO_JOB_RETRY_DELAY = 30
+CIELO_JOB_HEARTBEAT_SECONDS = 15
+CIELO_JOB_STALE_SECONDS = 300
+# Uploaded exports waiting to be imported by a job
+CIELO_IMPORT_DIR = os.environ.get('CIELO_IMPORT_DIR', str(BASE_DIR / 'imports'))
+
+# Request metrics (see common.middleware.PerformanceMiddleware). Latency and
+# response sizes are recorded for every request, database query counts and
+# time for the sampled fraction. /metrics serves them to staff users or to
+# requests with 'Authorization: Bearer <CIELO_METRICS_TOKEN>'.
+CIELO_METRICS_SAMPLE_RATE = 0.1
+CIELO_METRICS_TOKEN = os.environ.get('CIELO_METRICS_TOKEN', '')
+CIELO_SERVER_TIMING = True
+
+# Verbose per-request session and POST dumps, for debugging authentication only.
+CIELO_DEBUG_REQUEST_LOGGING = os.environ.get('CIELO_DEBUG_REQUEST_LOGGING') == '1'
+
 # Logging configuration
+# Loggers hand records to a QueueHandler; a background QueueListener thread
+# (started by common.log.configure) writes them to the console and a
+# size-rotated log file, so requests never wait on I/O.
+# CIELO_LOG_LEVEL defaults to DEBUG in development and INFO otherwise;
+# CIELO_LOG_FORMAT=json writes one JSON object per line.
+CIELO_LOG_LEVEL = os.environ.get('CIELO_LOG_LEVEL', 'DEBUG' if DEBUG else 'INFO').upper()
+CIELO_LOG_FORMAT = os.environ.get('CIELO_LOG_FORMAT', 'text')
+CIELO_LOG_FILE = os.environ.get('CIELO_LOG_FILE', str(BASE_DIR / 'debug.log'))
+
+LOGGING_CONFIG = 'common.log.configure'
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -105,51 +255,62 @@ LOGGING = {
             'format': '[{levelname}] {asctime} {name}: {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'common.log.JsonFormatter',
+        },
     },
     'handlers': {
         'console': {
             'class': 'logging.StreamHandler',
-            'formatter': 'simple',
+            'formatter': 'json' if CIELO_LOG_FORMAT == 'json' else 'simple',
         },
         'file': {
-            'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'debug.log',
-            'formatter': 'verbose',
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': CIELO_LOG_FILE,
+            'maxBytes': 10 * 1024 * 1024,
+            'backupCount': 5,
+            'delay': True,
+            'formatter': 'json' if CIELO_LOG_FORMAT == 'json' else 'verbose',
+        },
+        'queue': {
+            'class': 'logging.handlers.QueueHandler',
+            'handlers': ['console', 'file'],
+            'respect_handler_level': True,
         },
     },
     'root': {
-        'handlers': ['console', 'file'],
-        'level': 'DEBUG',
+        'handlers': ['queue'],
+        'level': CIELO_LOG_LEVEL,
     },
     'loggers': {
         'django': {
-            'handlers': ['console', 'file'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': False,
         },
         'django.contrib.auth': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+            'handlers': ['queue'],
+            'level': CIELO_LOG_LEVEL,
             'propagate': False,
         },
         'django.contrib.sessions': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+            'handlers': ['queue'],
+            'level': CIELO_LOG_LEVEL,
             'propagate': False,
         },
         'users': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+            'handlers': ['queue'],
+            'level': CIELO_LOG_LEVEL,
             'propagate': False,
         },
         'inventory': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+            'handlers': ['queue'],
+            'level': CIELO_LOG_LEVEL,
             'propagate': False,
         },
         'common': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+            'handlers': ['queue'],
+            'level': CIELO_LOG_LEVEL,
             'propagate': False,
         },
     },
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.urls import path, include
 from django.shortcuts import redirect
+from common.views import job_cancel, job_status, metrics, navigation_children
 
 
 def root_redirect(request):
@@ -10,6 +11,10 @@ def root_redirect(request):
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', root_redirect, name='root'),
+    path('metrics', metrics, name='metrics'),
+    path('navigation/<str:node>/', navigation_children, name='navigation_children'),
+    path('jobs/<int:pk>/', job_status, name='job_status'),
+    path('jobs/<int:pk>/cancel/', job_cancel, name='job_cancel'),
     path('users/', include('users.urls')),
     path('inventory/', include('inventory.urls')),
 ]
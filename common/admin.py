@@ -0,0 +1,80 @@
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
+from django.db import transaction
+from django.template.response import TemplateResponse
+from django.utils.translation import gettext as _, gettext_lazy
+from .pagination import EstimatedCountPaginator
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def pk_batches(queryset, size):
+    """
+    Yields the primary keys of queryset in ascending batches of up to size,
+    each fetched with an index range seek past the previous batch, so that
+    rows can be changed or deleted between batches.
+    """
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    last = None
+    while True:
+        batch = list((pks if last is None else pks.filter(pk__gt=last))[:size])
+        if not batch:
+            return
+        yield batch
+        last = batch[-1]
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    ModelAdmin for tables with millions of rows.
+
+    The changelist estimates the total of an unfiltered listing instead of
+    counting the table (and skips the second, unfiltered count), and the
+    delete_selected action, which loads and lists every selected object, is
+    replaced by delete_in_batches. Subclasses should also set
+    list_select_related for the foreign keys in list_display, an ordering and
+    sortable_by backed by indexes, and autocomplete_fields or raw_id_fields
+    for foreign keys to large tables.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    actions = ['delete_in_batches']
+    batch_size = 1000
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    @admin.action(permissions=['delete'], description=gettext_lazy("Delete selected %(verbose_name_plural)s"))
+    def delete_in_batches(self, request, queryset):
+        """
+        Deletes the selection batch_size rows per transaction, after a
+        confirmation page that shows the number of rows but not the rows.
+        Deletes run through the model signals (rollups, search index, version
+        counters) but, unlike delete_selected, list and check no cascaded
+        objects, so only use it on models nothing else depends on.
+        """
+        opts = self.model._meta
+        if request.POST.get('post'):
+            deleted = 0
+            for pks in pk_batches(queryset, self.batch_size):
+                with transaction.atomic():
+                    deleted += self.model._default_manager.filter(pk__in=pks).delete()[1].get(opts.label, 0)
+            logger.info("User %s deleted %d %s in batches", request.user, deleted, opts.verbose_name_plural)
+            self.message_user(request, _("Deleted %(count)d %(items)s.") % {
+                'count': deleted, 'items': opts.verbose_name_plural}, messages.SUCCESS)
+            return None
+
+        select_across = request.POST.get('select_across') == '1'
+        return TemplateResponse(request, 'admin/delete_in_batches_confirmation.html', {
+            **self.admin_site.each_context(request),
+            'title': _("Are you sure?"),
+            'opts': opts,
+            'count': queryset.count(),
+            'select_across': select_across,
+            'selected': [] if select_across else request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+            'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+            'media': self.media,
+        })
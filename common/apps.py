@@ -3,3 +3,9 @@ from django.apps import AppConfig
 class CommonConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'common'
+
+    def ready(self):
+        from .jobs import registry as job_registry
+        from .navigation import registry
+        registry.build()
+        job_registry.build()
@@ -0,0 +1,14 @@
+"""
+Entry points of the run_jobs pool processes. Spawned processes import this
+module before Django is set up, so it must not import models at module level.
+"""
+
+
+def setup():
+    import django
+    django.setup()
+
+
+def execute(job_id):
+    from .jobs import execute
+    return execute(job_id)
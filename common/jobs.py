@@ -0,0 +1,288 @@
+"""
+Database-backed background jobs.
+
+Apps register jobs in 'cielo_jobs' on their AppConfig, a mapping of name to
+the dotted path of a function func(job, **params); jobs are addressed as
+'<app_label>.<name>'. Views and commands queue work with enqueue() and poll
+the Job row; the run_jobs management command claims queued jobs and runs
+them in a process pool.
+
+A running job reports progress with job.progress(), which also raises
+JobCancelled once a cancel has been requested; jobs that report no progress
+can call job.check_cancelled() between steps. A failing job is retried,
+with exponential backoff, until it has run max_attempts times. Workers keep
+a heartbeat on their running jobs, and jobs whose heartbeat stops (a
+worker that died) are requeued or failed by the other workers.
+"""
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from . import job_process
+from .models import Job
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once a cancel has been requested."""
+
+
+class JobRegistry:
+    """Resolves the 'cielo_jobs' of all installed apps once at startup."""
+
+    def __init__(self):
+        self.jobs = {}
+
+    def build(self):
+        jobs = {}
+        for app_config in apps.get_app_configs():
+            for name, func_path in getattr(app_config, 'cielo_jobs', {}).items():
+                try:
+                    jobs[f'{app_config.label}.{name}'] = import_string(func_path)
+                except ImportError as e:
+                    logger.error("Error resolving job %s of app %s: %s", func_path, app_config.label, e, exc_info=True)
+        self.jobs = jobs
+
+    def __contains__(self, name):
+        return name in self.jobs
+
+    def __getitem__(self, name):
+        return self.jobs[name]
+
+
+registry = JobRegistry()
+
+
+def enqueue(name, params=None, user=None, max_attempts=None, delay=0):
+    """Queues a registered job and returns its Job row. Raises KeyError for unknown jobs."""
+    if name not in registry:
+        raise KeyError(name)
+    now = timezone.now()
+    job = Job.objects.create(
+        name=name,
+        params=params or {},
+        created_by=user if user is not None and user.is_authenticated else None,
+        run_after=now + timedelta(seconds=delay),
+        max_attempts=max_attempts or getattr(settings, 'CIELO_JOB_MAX_ATTEMPTS', 3),
+    )
+    logger.info("Queued job %s #%s", name, job.pk)
+    return job
+
+
+def cancel(job):
+    """
+    Cancels a queued job right away, or asks a running one to stop. The
+    worker's heartbeat picks the request up within CIELO_JOB_HEARTBEAT_SECONDS
+    and the job stops at its next progress report or cancellation check.
+    Returns False if the job had already finished.
+    """
+    now = timezone.now()
+    if Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+            status=Job.CANCELLED, cancel_requested=True, finished_at=now):
+        return True
+    return bool(Job.objects.filter(pk=job.pk, status=Job.RUNNING).update(cancel_requested=True))
+
+
+class RunningJob:
+    """
+    The handle a job function receives: its Job row, progress reporting and
+    cancellation. Progress is written at most once a second.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.cancelled = threading.Event()
+        self._last_write = 0.0
+
+    @property
+    def pk(self):
+        return self.job.pk
+
+    def progress(self, current, total=None, message=''):
+        self.job.progress_current = current
+        if total is not None:
+            self.job.progress_total = total
+        self.job.progress_message = message[:255]
+        if time.monotonic() - self._last_write >= 1.0 or current == self.job.progress_total:
+            self._last_write = time.monotonic()
+            Job.objects.filter(pk=self.job.pk).update(
+                progress_current=current, progress_total=self.job.progress_total,
+                progress_message=self.job.progress_message, heartbeat_at=timezone.now(),
+            )
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self.cancelled.is_set():
+            raise JobCancelled
+
+
+def _heartbeat(job, stop, cancelled, interval):
+    """Keeps the job's heartbeat fresh and picks up cancel requests."""
+    try:
+        while not stop.wait(interval):
+            Job.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now())
+            if Job.objects.filter(pk=job.pk, cancel_requested=True).exists():
+                cancelled.set()
+    finally:
+        connections.close_all()
+
+
+def execute(job_id):
+    """
+    Runs a claimed (running) job to completion and records the outcome.
+    Called in the worker's pool processes; returns the final status.
+    """
+    job = Job.objects.get(pk=job_id)
+    running = RunningJob(job)
+    if job.cancel_requested:
+        running.cancelled.set()
+    stop = threading.Event()
+    heartbeat = threading.Thread(
+        target=_heartbeat, args=(job, stop, running.cancelled, getattr(settings, 'CIELO_JOB_HEARTBEAT_SECONDS', 15)),
+        daemon=True,
+    )
+    heartbeat.start()
+    logger.info("Running job %s #%s (attempt %d of %d)", job.name, job.pk, job.attempts, job.max_attempts)
+    try:
+        running.check_cancelled()
+        result = registry[job.name](running, **job.params)
+    except JobCancelled:
+        return _finish(job, Job.CANCELLED, error='Cancelled.')
+    except Exception as e:
+        logger.error("Job %s #%s failed: %s", job.name, job.pk, e, exc_info=True)
+        return _fail(job, traceback.format_exc())
+    finally:
+        stop.set()
+        heartbeat.join()
+    return _finish(job, Job.SUCCEEDED, result=result)
+
+
+def _finish(job, status, result=None, error=''):
+    Job.objects.filter(pk=job.pk).update(status=status, result=result, error=error, finished_at=timezone.now())
+    logger.info("Job %s #%s %s", job.name, job.pk, status)
+    return status
+
+
+def _fail(job, error):
+    """Requeues a failed attempt with exponential backoff, or fails the job."""
+    if job.attempts < job.max_attempts:
+        delay = getattr(settings, 'CIELO_JOB_RETRY_DELAY', 30) * 2 ** (job.attempts - 1)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.QUEUED, error=error, worker='', run_after=timezone.now() + timedelta(seconds=delay))
+        logger.warning("Job %s #%s will be retried in %ss", job.name, job.pk, delay)
+        return Job.QUEUED
+    return _finish(job, Job.FAILED, error=error)
+
+
+def claim(worker, limit):
+    """
+    Marks up to limit due, queued jobs as running on this worker and returns
+    their ids. The conditional UPDATE makes claiming safe across workers.
+    """
+    now = timezone.now()
+    claimed = []
+    candidates = list(Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+                      .order_by('run_after', 'id').values_list('pk', flat=True)[:limit * 2])
+    for pk in candidates:
+        if Job.objects.filter(pk=pk, status=Job.QUEUED).update(
+                status=Job.RUNNING, worker=worker, attempts=F('attempts') + 1,
+                started_at=now, heartbeat_at=now, finished_at=None):
+            claimed.append(pk)
+            if len(claimed) == limit:
+                break
+    return claimed
+
+
+def recover_stale():
+    """
+    Requeues (or fails, when out of attempts) running jobs whose worker
+    stopped sending heartbeats. Returns the number of jobs recovered.
+    """
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'CIELO_JOB_STALE_SECONDS', 300))
+    stale = list(Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=cutoff))
+    for job in stale:
+        logger.warning("Job %s #%s lost its worker %s", job.name, job.pk, job.worker)
+        _fail(job, f'Worker {job.worker} stopped responding.')
+    return len(stale)
+
+
+class Worker:
+    """
+    Claims queued jobs and runs them in a pool of processes (or in this
+    process when processes is 0).
+    """
+
+    def __init__(self, processes=None, poll_interval=None):
+        self.processes = getattr(settings, 'CIELO_JOB_PROCESSES', 2) if processes is None else processes
+        self.poll_interval = getattr(settings, 'CIELO_JOB_POLL_INTERVAL', 2.0) if poll_interval is None else poll_interval
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+
+    def run(self, once=False):
+        """
+        Processes jobs until interrupted, or with once=True until no job is
+        due. Returns the number of jobs executed.
+        """
+        if not self.processes:
+            return self._run_inline(once)
+        executed = 0
+        pool = self._pool()
+        running = {}
+        try:
+            while True:
+                recover_stale()
+                for pk in claim(self.name, self.processes - len(running)):
+                    running[pool.submit(job_process.execute, pk)] = pk
+                if not running:
+                    if once:
+                        break
+                    time.sleep(self.poll_interval)
+                    continue
+                done, _pending = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                if any(isinstance(future.exception(), BrokenProcessPool) for future in done):
+                    # A pool process died; every job still in the pool fails
+                    # with it. Collect them all and start a fresh pool.
+                    done = set(running)
+                    wait(done)
+                    pool.shutdown(wait=True)
+                    pool = self._pool()
+                for future in done:
+                    pk = running.pop(future)
+                    executed += 1
+                    if future.exception() is not None:
+                        logger.error("Job #%s crashed its worker process: %s", pk, future.exception())
+                        _fail(Job.objects.get(pk=pk), repr(future.exception()))
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+        return executed
+
+    def _pool(self):
+        # Spawned processes set Django up afresh instead of inheriting this
+        # process's database connections.
+        return ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context('spawn'),
+                                   initializer=job_process.setup)
+
+    def _run_inline(self, once):
+        executed = 0
+        while True:
+            recover_stale()
+            claimed = claim(self.name, 1)
+            if not claimed:
+                if once:
+                    return executed
+                time.sleep(self.poll_interval)
+                continue
+            execute(claimed[0])
+            executed += 1
@@ -0,0 +1,61 @@
+"""
+Logging helpers referenced from settings.
+
+The LOGGING dict routes records through the standard library's
+logging.handlers.QueueHandler, whose 'handlers' dictConfig hands to a
+QueueListener thread that owns the real (console, file) handlers, so request
+threads only pay for putting a record on a queue and never block on I/O.
+dictConfig does not start the listener; configure() (settings.LOGGING_CONFIG)
+does. JsonFormatter renders one JSON object per line for log shippers.
+"""
+import atexit
+import json
+import logging
+import logging.config
+import logging.handlers
+
+# Listeners started by the last configure(), stopped before reconfiguring.
+_listeners = []
+
+
+def stop_listeners():
+    """Stops the queue listeners after they have written every queued record."""
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def configure(config):
+    """
+    Applies a dictConfig and starts the QueueListener of every QueueHandler
+    it configures.
+    """
+    stop_listeners()
+    logging.config.dictConfig(config)
+    for name in logging.getHandlerNames():
+        handler = logging.getHandlerByName(name)
+        listener = getattr(handler, 'listener', None)
+        if isinstance(handler, logging.handlers.QueueHandler) and listener is not None:
+            listener.start()
+            _listeners.append(listener)
+
+
+atexit.register(stop_listeners)
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects."""
+
+    def format(self, record):
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.thread,
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry['stack_info'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, default=str)
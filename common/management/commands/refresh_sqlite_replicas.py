@@ -0,0 +1,27 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+import sqlite3
+
+class Command(BaseCommand):
+    help = 'Copies the primary SQLite database into each configured read replica (for local replica setups).'
+
+    def handle(self, *args, **options):
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('Replicas can only be refreshed from a SQLite primary.')
+        if not settings.CIELO_READ_REPLICAS:
+            self.stdout.write(self.style.WARNING('No read replicas configured (set CIELO_DATABASE_REPLICAS).'))
+            return
+        primary.ensure_connection()
+        for alias in settings.CIELO_READ_REPLICAS:
+            # Close the replica's own read-only connection; it reopens on the next query.
+            connections[alias].close()
+            path = connections[alias].settings_dict['NAME']
+            target = sqlite3.connect(path)
+            try:
+                # The online backup API copies a consistent snapshot while the primary stays writable.
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(self.style.SUCCESS(f'Refreshed {alias} ({path}).'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+from common.jobs import Worker
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (imports, syncs, ...) in a pool of worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int,
+                            help='Jobs run at the same time (default CIELO_JOB_PROCESSES). 0 runs them one by one in this process.')
+        parser.add_argument('--poll-interval', type=float, help='Seconds between checks for new jobs (default CIELO_JOB_POLL_INTERVAL).')
+        parser.add_argument('--once', action='store_true', help='Exit once no job is due instead of waiting for more.')
+
+    def handle(self, *args, **options):
+        if options['processes'] is not None and options['processes'] < 0:
+            raise CommandError('--processes must not be negative.')
+        worker = Worker(processes=options['processes'], poll_interval=options['poll_interval'])
+        self.stdout.write(self.style.NOTICE(f'Worker {worker.name} running jobs with {worker.processes or "no"} pool processes...'))
+        try:
+            executed = worker.run(once=options['once'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING('Interrupted; running jobs were left to finish.'))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Executed {executed} jobs.'))
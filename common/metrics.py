@@ -0,0 +1,105 @@
+"""
+In-process request metrics, rendered in the Prometheus text format.
+
+PerformanceMiddleware records every request's latency, status and response
+size here; a sampled fraction of requests additionally records database
+query counts and time. Metrics are kept per process; scrape each worker (or
+aggregate in Prometheus) when running several.
+"""
+from collections import defaultdict
+import bisect
+import threading
+
+# Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield ('+Inf' if bound == float('inf') else repr(bound)), total
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.latency = defaultdict(Histogram)
+            self.responses = defaultdict(int)
+            self.response_bytes = defaultdict(int)
+            self.sampled = defaultdict(int)
+            self.queries = defaultdict(int)
+            self.query_seconds = defaultdict(float)
+
+    def observe(self, view, method, status, duration, size=None, queries=None, query_seconds=None):
+        """Records one request. queries/query_seconds are None for unsampled requests."""
+        with self._lock:
+            self.latency[(view, method)].observe(duration)
+            self.responses[(view, method, str(status))] += 1
+            if size is not None:
+                self.response_bytes[(view, method)] += size
+            if queries is not None:
+                self.sampled[(view, method)] += 1
+                self.queries[(view, method)] += queries
+                self.query_seconds[(view, method)] += query_seconds
+
+    def render(self):
+        """Returns all metrics in the Prometheus text exposition format."""
+        with self._lock:
+            lines = []
+            _family(lines, 'cielo_http_request_duration_seconds', 'histogram', 'Request latency by view.')
+            for (view, method), histogram in sorted(self.latency.items()):
+                labels = _labels(view=view, method=method)
+                for bound, count in histogram.cumulative():
+                    lines.append(f'cielo_http_request_duration_seconds_bucket{{{labels},le="{bound}"}} {count}')
+                lines.append(f'cielo_http_request_duration_seconds_sum{{{labels}}} {histogram.sum!r}')
+                lines.append(f'cielo_http_request_duration_seconds_count{{{labels}}} {histogram.count}')
+            _counter(lines, 'cielo_http_responses_total', 'Responses by view and status.',
+                     self.responses, ('view', 'method', 'status'))
+            _counter(lines, 'cielo_http_response_size_bytes_total', 'Bytes of non-streaming response bodies.',
+                     self.response_bytes, ('view', 'method'))
+            _counter(lines, 'cielo_http_sampled_requests_total', 'Requests sampled for database metrics.',
+                     self.sampled, ('view', 'method'))
+            _counter(lines, 'cielo_db_queries_total', 'Database queries of sampled requests.',
+                     self.queries, ('view', 'method'))
+            _counter(lines, 'cielo_db_query_duration_seconds_total', 'Database time of sampled requests.',
+                     self.query_seconds, ('view', 'method'))
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    return ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+
+
+def _family(lines, name, kind, help_text):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+
+
+def _counter(lines, name, help_text, values, label_names):
+    _family(lines, name, 'counter', help_text)
+    for key, value in sorted(values.items()):
+        lines.append(f'{name}{{{_labels(**dict(zip(label_names, key)))}}} {value!r}')
+
+
+registry = MetricsRegistry()
@@ -1,36 +1,251 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from contextlib import ExitStack
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import FileResponse, HttpResponseNotAllowed, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+from urllib.parse import urlsplit
+from . import staticfiles
+from .metrics import registry as metrics_registry
+from .routers import replica_reads
 import logging
+import os
+import random
+import re
+import time
 
 logger = logging.getLogger(__name__)
 
 
+class PerformanceMiddleware:
+    """
+    Records request metrics and reports them in a Server-Timing header.
+
+    Every request costs two clock reads and a counter update. A sampled
+    fraction (CIELO_METRICS_SAMPLE_RATE) also wraps the database connections
+    to count queries and their time, which has a per-query cost (and, for
+    async requests, two switches to the request's sync thread).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = self._timer()
+        started = time.perf_counter()
+        if timer is None:
+            response = self.get_response(request)
+        else:
+            with self._wrap_connections(timer):
+                response = self.get_response(request)
+        return self._record(request, response, time.perf_counter() - started, timer)
+
+    async def __acall__(self, request):
+        timer = self._timer()
+        started = time.perf_counter()
+        if timer is None:
+            response = await self.get_response(request)
+        else:
+            # Connections are per thread and async queries run on the
+            # request's sync thread, so the wrappers are installed there.
+            stack = await sync_to_async(self._wrap_connections)(timer)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(stack.close)()
+        return self._record(request, response, time.perf_counter() - started, timer)
+
+    def _timer(self):
+        sample_rate = getattr(settings, 'CIELO_METRICS_SAMPLE_RATE', 0.1)
+        return QueryTimer() if sample_rate and random.random() < sample_rate else None
+
+    def _wrap_connections(self, timer):
+        stack = ExitStack()
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(timer))
+        return stack
+
+    def _record(self, request, response, duration, timer):
+        match = request.resolver_match
+        view = match.view_name if match else '<unmatched>'
+        size = None if response.streaming else len(response.content)
+        metrics_registry.observe(
+            view, request.method, response.status_code, duration, size=size,
+            queries=timer.count if timer else None,
+            query_seconds=timer.duration if timer else None,
+        )
+
+        if getattr(settings, 'CIELO_SERVER_TIMING', True):
+            timing = [f'app;dur={duration * 1000:.1f}']
+            if timer is not None:
+                timing.append(f'db;dur={timer.duration * 1000:.1f};desc="{timer.count} queries"')
+            response['Server-Timing'] = ', '.join(timing)
+        return response
+
+
+class QueryTimer:
+    """A connection execute_wrapper counting queries and their duration."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class ReplicaPinningMiddleware:
+    """
+    Lets safe (GET, HEAD, OPTIONS) requests read from the read replicas.
+
+    Other requests, and the rest of a safe request once it has written
+    anything, read from the primary; see common.routers.ReplicaRouter.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'CIELO_READ_REPLICAS', []):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replica_reads(request.method in ('GET', 'HEAD', 'OPTIONS')):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with replica_reads(request.method in ('GET', 'HEAD', 'OPTIONS')):
+            return await self.get_response(request)
+
+
+class StaticFilesMiddleware:
+    """
+    Serves the collected static files (STATIC_ROOT) from the app itself.
+
+    Files with a content hash in their name, i.e. those in the staticfiles
+    manifest, may be cached by browsers for a year without revalidation;
+    others for CIELO_STATIC_MAX_AGE seconds. Clients that accept them get the
+    .br or .gz variants collectstatic wrote. The file index is built when the
+    server starts, so collectstatic must run before (re)starting it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    IMMUTABLE = 'public, max-age=31536000, immutable'
+    accepts = {
+        encoding: re.compile(rf'\b{encoding}\b') for encoding, suffix in staticfiles.ENCODINGS
+    }
+
+    def __init__(self, get_response):
+        root = settings.STATIC_ROOT
+        static_url = urlsplit(settings.STATIC_URL or '')
+        if not (getattr(settings, 'CIELO_SERVE_STATIC', False) and root and os.path.isdir(root)) or static_url.netloc:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefix = static_url.path
+        hashed_names = getattr(staticfiles_storage, 'hashed_files', {}).values()
+        self.files = staticfiles.collected_files(root, hashed_names)
+        self.max_age = f'public, max-age={settings.CIELO_STATIC_MAX_AGE}'
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.serve(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.serve(request) or await self.get_response(request)
+
+    def serve(self, request):
+        """The response for a collected file, or None for other requests."""
+        if not request.path.startswith(self.prefix):
+            return None
+        collected = self.files.get(request.path[len(self.prefix):])
+        if collected is None:
+            return None
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+        if not was_modified_since(request.META.get('HTTP_IF_MODIFIED_SINCE'), collected.mtime):
+            response = HttpResponseNotModified()
+        else:
+            path, encoding = collected.path, None
+            accept_encoding = request.headers.get('Accept-Encoding', '')
+            for candidate, variant in collected.encodings:
+                if self.accepts[candidate].search(accept_encoding):
+                    path, encoding = variant, candidate
+                    break
+            response = FileResponse(open(path, 'rb'), content_type=collected.content_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+            response['Last-Modified'] = http_date(collected.mtime)
+        response['Cache-Control'] = self.IMMUTABLE if collected.immutable else self.max_age
+        if collected.encodings:
+            response['Vary'] = 'Accept-Encoding'
+        return response
+
+
 class DebugLoggingMiddleware:
-    """Middleware to log request/response details for debugging authentication issues."""
-    
+    """
+    Middleware to log request/response details for debugging authentication issues.
+
+    Loads the session and dumps it (and POST data, with passwords masked) on
+    every request, so it is only active when CIELO_DEBUG_REQUEST_LOGGING is set.
+    It is synchronous only; when enabled under ASGI, Django runs the stack
+    below it in a thread.
+    """
+
     def __init__(self, get_response):
+        if not getattr(settings, 'CIELO_DEBUG_REQUEST_LOGGING', False):
+            raise MiddlewareNotUsed
         self.get_response = get_response
 
     def __call__(self, request):
         # Log request details
-        logger.debug(f"=== REQUEST START ===")
-        logger.debug(f"Method: {request.method}")
-        logger.debug(f"Path: {request.path}")
-        logger.debug(f"User: {request.user}")
-        logger.debug(f"User authenticated: {getattr(request.user, 'is_authenticated', False)}")
-        logger.debug(f"Session key: {request.session.session_key}")
-        logger.debug(f"Session data: {dict(request.session)}")
-        
-        if hasattr(request, 'POST') and request.POST:
-            logger.debug(f"POST data: {dict(request.POST)}")
-        
+        logger.debug("=== REQUEST START ===")
+        logger.debug("Method: %s", request.method)
+        logger.debug("Path: %s", request.path)
+        self._log_auth_state(request, '')
+
+        if request.method == 'POST' and request.POST:
+            logger.debug("POST data: %s", {
+                key: '********' if 'password' in key.lower() else value
+                for key, value in request.POST.lists()
+            })
+
         # Get response
         response = self.get_response(request)
-        
+
         # Log response details
-        logger.debug(f"Response status: {response.status_code}")
-        logger.debug(f"User after request: {request.user}")
-        logger.debug(f"User authenticated after: {getattr(request.user, 'is_authenticated', False)}")
-        logger.debug(f"Session key after: {request.session.session_key}")
-        logger.debug(f"Session data after: {dict(request.session)}")
-        logger.debug(f"=== REQUEST END ===")
-        
+        logger.debug("Response status: %s", response.status_code)
+        self._log_auth_state(request, ' after')
+        logger.debug("=== REQUEST END ===")
+
         return response
+
+    def _log_auth_state(self, request, suffix):
+        logger.debug("User%s: %s", suffix, request.user)
+        logger.debug("User authenticated%s: %s", suffix, getattr(request.user, 'is_authenticated', False))
+        logger.debug("Session key%s: %s", suffix, request.session.session_key)
+        logger.debug("Session data%s: %s", suffix, dict(request.session))
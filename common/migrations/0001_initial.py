@@ -0,0 +1,47 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:53
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='Job')),
+                ('params', models.JSONField(blank=True, default=dict, verbose_name='Parameters')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='queued', max_length=20, verbose_name='Status')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Created At')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, help_text='Not started before this time; used to back off retries.', verbose_name='Run After')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finished At')),
+                ('heartbeat_at', models.DateTimeField(blank=True, help_text='Last sign of life of the worker running the job.', null=True, verbose_name='Heartbeat At')),
+                ('worker', models.CharField(blank=True, max_length=255, verbose_name='Worker')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('max_attempts', models.PositiveIntegerField(default=1, verbose_name='Max Attempts')),
+                ('cancel_requested', models.BooleanField(default=False, verbose_name='Cancel Requested')),
+                ('progress_current', models.PositiveBigIntegerField(default=0, verbose_name='Progress')),
+                ('progress_total', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='Progress Total')),
+                ('progress_message', models.CharField(blank=True, max_length=255, verbose_name='Progress Message')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Result')),
+                ('error', models.TextField(blank=True, verbose_name='Error')),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Job',
+                'verbose_name_plural': 'Jobs',
+                'indexes': [models.Index(fields=['status', 'run_after', 'id'], name='common_job_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,118 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+import uuid
+
+
+class Job(models.Model):
+    """
+    A unit of background work, queued in the database and executed by the
+    run_jobs worker (see common.jobs). 'name' is a registered job such as
+    'inventory.import'; 'params' are passed to it as keyword arguments.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = [
+        (QUEUED, _("Queued")),
+        (RUNNING, _("Running")),
+        (SUCCEEDED, _("Succeeded")),
+        (FAILED, _("Failed")),
+        (CANCELLED, _("Cancelled")),
+    ]
+    FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+    name = models.CharField(_("Job"), max_length=100)
+    params = models.JSONField(_("Parameters"), default=dict, blank=True)
+    status = models.CharField(_("Status"), max_length=20, choices=STATUS_CHOICES, default=QUEUED)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    created_at = models.DateTimeField(_("Created At"), default=timezone.now)
+    run_after = models.DateTimeField(_("Run After"), default=timezone.now, help_text="Not started before this time; used to back off retries.")
+    started_at = models.DateTimeField(_("Started At"), null=True, blank=True)
+    finished_at = models.DateTimeField(_("Finished At"), null=True, blank=True)
+    heartbeat_at = models.DateTimeField(_("Heartbeat At"), null=True, blank=True, help_text="Last sign of life of the worker running the job.")
+    worker = models.CharField(_("Worker"), max_length=255, blank=True)
+    attempts = models.PositiveIntegerField(_("Attempts"), default=0)
+    max_attempts = models.PositiveIntegerField(_("Max Attempts"), default=1)
+    cancel_requested = models.BooleanField(_("Cancel Requested"), default=False)
+    progress_current = models.PositiveBigIntegerField(_("Progress"), default=0)
+    progress_total = models.PositiveBigIntegerField(_("Progress Total"), null=True, blank=True)
+    progress_message = models.CharField(_("Progress Message"), max_length=255, blank=True)
+    result = models.JSONField(_("Result"), null=True, blank=True)
+    error = models.TextField(_("Error"), blank=True)
+
+    class Meta:
+        verbose_name = _("Job")
+        verbose_name_plural = _("Jobs")
+        indexes = [
+            # Workers claim the oldest due job of the queue
+            models.Index(fields=['status', 'run_after', 'id'], name='common_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    @property
+    def finished(self):
+        return self.status in self.FINISHED
+
+    def as_dict(self):
+        """The job's status, as served to pollers."""
+        return {
+            'id': self.pk,
+            'name': self.name,
+            'status': self.status,
+            'progress': {
+                'current': self.progress_current,
+                'total': self.progress_total,
+                'message': self.progress_message,
+            },
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'cancel_requested': self.cancel_requested,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+class CacheVersionManager(models.Manager):
+    def get_version(self, name):
+        return self.filter(name=name).values_list('version', flat=True).first() or ''
+
+    async def aget_version(self, name):
+        """Async version of get_version()."""
+        return await self.filter(name=name).values_list('version', flat=True).afirst() or ''
+
+    def bump(self, name):
+        """Gives name a new version, dropping everything cached under the old one."""
+        self.update_or_create(name=name, defaults={'version': uuid.uuid4().hex})
+
+
+class CacheVersion(models.Model):
+    """
+    Version of a family of cache entries, such as the permission snapshots
+    of users.backends or the navigation trees of common.navigation, which
+    include it in their cache keys.
+
+    Kept in the database rather than in the cache, so that a change made by
+    one process invalidates the entries of every process, whatever the cache
+    backend. Versions are random, so one rolled back with its transaction is
+    never reused.
+    """
+    name = models.CharField(_("Name"), max_length=100, primary_key=True)
+    version = models.CharField(_("Version"), max_length=32)
+
+    objects = CacheVersionManager()
+
+    class Meta:
+        verbose_name = _("Cache Version")
+        verbose_name_plural = _("Cache Versions")
+
+    def __str__(self):
+        return f"{self.name} {self.version}"
@@ -0,0 +1,193 @@
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.utils.module_loading import import_string
+from .models import CacheVersion
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'cielo:navigation'
+VERSION_NAME = 'navigation'
+
+
+class NavigationProvider:
+    """
+    A resolved 'cielo_navigation_provider' hook of a single CIELO app.
+
+    The items a provider returns are cached per permission set, so providers
+    must only vary their output on the permissions listed by the app's
+    'cielo_permissions_provider'. Apps that declare no permissions are
+    never cached and their provider is called on every request.
+    """
+
+    def __init__(self, app_config, func, permissions):
+        self.app_label = app_config.label
+        self.func = func
+        self.permissions = permissions
+
+    @property
+    def cacheable(self):
+        return bool(self.permissions)
+
+    def permission_signature(self, user):
+        granted = ''.join('1' if user.has_perm(perm) else '0' for perm in self.permissions)
+        return hashlib.md5(granted.encode()).hexdigest()
+
+    async def apermission_signature(self, user):
+        granted = ''.join(['1' if await user.ahas_perm(perm) else '0' for perm in self.permissions])
+        return hashlib.md5(granted.encode()).hexdigest()
+
+    async def acall(self, request):
+        """Calls the provider from async code; sync providers run in a thread."""
+        if iscoroutinefunction(self.func):
+            return await self.func(request)
+        return await sync_to_async(self.func)(request)
+
+
+def children_url(node, parent=None):
+    """
+    Returns the URL serving the children of a lazily expandable navigation
+    node. Navigation items set it as 'children_url' instead of embedding
+    'sub_items'; the sidebar loads one page of children when expanded.
+    """
+    url = reverse('navigation_children', kwargs={'node': node})
+    return f'{url}?{urlencode({"parent": parent})}' if parent is not None else url
+
+
+class NavigationRegistry:
+    """
+    Resolves navigation providers of all installed CIELO apps once at startup
+    and serves their (cached) navigation items at request time.
+
+    Apps can also declare lazily expandable nodes in 'cielo_navigation_nodes',
+    a mapping of node name to the dotted path of a loader
+    loader(request, parent, after, limit) returning (items, next_cursor):
+    at most limit child items of the given parent, following the opaque
+    'after' cursor. Nodes are addressed as '<app_label>.<name>'.
+    """
+
+    def __init__(self):
+        self.providers = []
+        self.nodes = {}
+
+    def build(self):
+        """
+        Resolves the navigation providers of all installed apps, in
+        INSTALLED_APPS order, and hooks up cache invalidation for the models
+        each app lists in 'cielo_navigation_models'.
+        """
+        providers = []
+        nodes = {}
+        for app_config in apps.get_app_configs():
+            for name, loader_path in getattr(app_config, 'cielo_navigation_nodes', {}).items():
+                try:
+                    nodes[f'{app_config.label}.{name}'] = import_string(loader_path)
+                except ImportError as e:
+                    logger.error("Error resolving navigation node loader %s of app %s: %s",
+                                 loader_path, app_config.label, e, exc_info=True)
+
+            provider_path = getattr(app_config, 'cielo_navigation_provider', None)
+            if not provider_path:
+                continue
+            try:
+                func = import_string(provider_path)
+                permissions = self._resolve_permissions(app_config)
+            except Exception as e:
+                logger.error("Error resolving navigation provider %s of app %s: %s",
+                             provider_path, app_config.label, e, exc_info=True)
+                continue
+            providers.append(NavigationProvider(app_config, func, permissions))
+
+            for model_label in getattr(app_config, 'cielo_navigation_models', []):
+                model = apps.get_model(model_label)
+                post_save.connect(self.invalidate, sender=model,
+                                  dispatch_uid=f'{CACHE_KEY_PREFIX}:save:{model_label}')
+                post_delete.connect(self.invalidate, sender=model,
+                                    dispatch_uid=f'{CACHE_KEY_PREFIX}:delete:{model_label}')
+        self.providers = providers
+        self.nodes = nodes
+        logger.debug("Navigation registry built with %d providers and %d nodes", len(providers), len(nodes))
+
+    def _resolve_permissions(self, app_config):
+        provider_path = getattr(app_config, 'cielo_permissions_provider', None)
+        if not provider_path:
+            return []
+        return [f'{app_config.label}.{codename}' for codename, _label in import_string(provider_path)()]
+
+    def get_version(self):
+        # Kept in the database, so invalidation reaches every process.
+        return CacheVersion.objects.get_version(VERSION_NAME)
+
+    async def aget_version(self):
+        return await CacheVersion.objects.aget_version(VERSION_NAME)
+
+    def invalidate(self, **kwargs):
+        """Drops all cached navigation trees. Usable as a signal receiver."""
+        CacheVersion.objects.bump(VERSION_NAME)
+
+    def get_items(self, request):
+        """Returns the aggregated navigation items for the current request."""
+        navigation_items = []
+        version = self.get_version()
+        timeout = getattr(settings, 'CIELO_NAVIGATION_CACHE_TIMEOUT', 300)
+        for provider in self.providers:
+            try:
+                if provider.cacheable:
+                    cache_key = (f'{CACHE_KEY_PREFIX}:{version}:{provider.app_label}:'
+                                 f'{provider.permission_signature(request.user)}')
+                    app_nav_items = cache.get(cache_key)
+                    if app_nav_items is None:
+                        app_nav_items = provider.func(request) or []
+                        cache.set(cache_key, app_nav_items, timeout)
+                else:
+                    app_nav_items = provider.func(request)
+                if app_nav_items:
+                    navigation_items.extend(app_nav_items)
+            except Exception as e:
+                logger.error("Error loading navigation from app %s: %s", provider.app_label, e, exc_info=True)
+        return navigation_items
+
+    async def aget_items(self, request):
+        """
+        Async version of get_items(). Cached items cost no thread switch;
+        providers only run (in a thread, unless they are coroutine
+        functions) on a cache miss.
+        """
+        navigation_items = []
+        version = await self.aget_version()
+        timeout = getattr(settings, 'CIELO_NAVIGATION_CACHE_TIMEOUT', 300)
+        user = await request.auser()
+        for provider in self.providers:
+            try:
+                if provider.cacheable:
+                    cache_key = (f'{CACHE_KEY_PREFIX}:{version}:{provider.app_label}:'
+                                 f'{await provider.apermission_signature(user)}')
+                    app_nav_items = await cache.aget(cache_key)
+                    if app_nav_items is None:
+                        app_nav_items = await provider.acall(request) or []
+                        await cache.aset(cache_key, app_nav_items, timeout)
+                else:
+                    app_nav_items = await provider.acall(request)
+                if app_nav_items:
+                    navigation_items.extend(app_nav_items)
+            except Exception as e:
+                logger.error("Error loading navigation from app %s: %s", provider.app_label, e, exc_info=True)
+        return navigation_items
+
+    def get_children(self, request, node, parent=None, after=None):
+        """
+        Returns (items, next_cursor) for one page of a node's children.
+        Raises KeyError for unknown nodes.
+        """
+        loader = self.nodes[node]
+        limit = getattr(settings, 'CIELO_NAVIGATION_PAGE_SIZE', 25)
+        return loader(request, parent, after, limit)
+
+
+registry = NavigationRegistry()
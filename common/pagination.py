@@ -0,0 +1,248 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+import base64
+import binascii
+import inspect
+import json
+
+
+def encode_cursor(values):
+    """Encodes the ordering values of a row into an opaque, URL-safe cursor."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decodes a cursor produced by encode_cursor, returning None if it is invalid."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def estimate_count(queryset):
+    """
+    Returns a cheap row count estimate for the (unfiltered) table behind queryset.
+
+    Uses planner statistics where the backend keeps them (PostgreSQL's
+    pg_class.reltuples, SQLite's sqlite_stat1 after ANALYZE) and falls back
+    to an exact COUNT(*) otherwise.
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+            row = cursor.fetchone()
+            if row and row[0] >= 0:
+                return row[0]
+        elif connection.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'")
+            if cursor.fetchone():
+                cursor.execute("SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1", [table])
+                row = cursor.fetchone()
+                if row:
+                    return int(row[0].split()[0])
+    return model._default_manager.using(queryset.db).count()
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that counts an unfiltered queryset with estimate_count()
+    instead of a COUNT(*) over the whole table; filtered querysets are
+    counted exactly. Used by the admin changelists of large tables.
+    """
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet) and not self.object_list.query.where:
+            return estimate_count(self.object_list)
+        return super().count
+
+
+class KeysetPage:
+    """
+    A page of results from KeysetPaginator.
+
+    Mirrors the parts of django.core.paginator.Page that templates use, but
+    links to neighbouring pages with opaque cursors instead of page numbers.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Cursor based paginator over a queryset ordered by the given fields plus pk.
+
+    ordering is a sequence of field names, each optionally prefixed with '-'
+    for descending order; the pk breaks ties in the direction of the last
+    field. Every page is fetched with a single indexed range query of
+    per_page + 1 rows, so deep pages cost the same as the first one.
+    count_mode controls the total exposed as paginator.count: 'exact' runs
+    COUNT(*), 'estimate' uses estimate_count() and None skips counting.
+    A count_func, when given, is called for the total instead (e.g. to read
+    it from a precomputed rollup).
+    """
+
+    def __init__(self, queryset, per_page, ordering=('name',), count_mode='exact', count_func=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+        self.ordering.append(('pk', self.ordering[-1][1] if self.ordering else False))
+        self.count_mode = count_mode
+        self.count_func = count_func
+        self._count = None
+
+    @property
+    def count(self):
+        if self._count is None and self.count_func is not None:
+            self._count = self.count_func()
+        elif self._count is None and self.count_mode is not None:
+            if self.count_mode == 'estimate':
+                self._count = estimate_count(self.queryset)
+            else:
+                self._count = self.queryset.count()
+        return self._count
+
+    async def acount(self):
+        """
+        Async version of count. Once awaited, count returns the same value
+        without querying, so templates can render it. count_func may be a
+        coroutine function when only acount() is used.
+        """
+        if self._count is None and self.count_func is not None:
+            count = self.count_func()
+            self._count = await count if inspect.isawaitable(count) else count
+        elif self._count is None and self.count_mode is not None:
+            if self.count_mode == 'estimate':
+                self._count = await sync_to_async(estimate_count)(self.queryset)
+            else:
+                self._count = await self.queryset.acount()
+        return self._count
+
+    @property
+    def count_is_estimate(self):
+        return self.count_func is None and self.count_mode == 'estimate'
+
+    def _order_by(self, reverse=False):
+        return [f'-{field}' if descending != reverse else field for field, descending in self.ordering]
+
+    def _cursor_for(self, obj):
+        return encode_cursor([getattr(obj, field) for field, _descending in self.ordering])
+
+    def _field(self, name):
+        opts = self.queryset.model._meta
+        *relations, name = name.split('__')
+        for relation in relations:
+            opts = opts.get_field(relation).related_model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def _decode(self, cursor):
+        """
+        Returns the ordering values of a cursor converted to their fields'
+        types, or None if the cursor is missing, malformed or was tampered with.
+        """
+        values = decode_cursor(cursor) if cursor else None
+        if values is None or len(values) != len(self.ordering):
+            return None
+        try:
+            values = [self._field(field).to_python(value) for (field, _descending), value in zip(self.ordering, values)]
+        except (FieldDoesNotExist, ValidationError, TypeError, ValueError):
+            return None
+        # A NULL can not be compared with, so no page starts after one.
+        return None if any(value is None for value in values) else values
+
+    def _seek(self, queryset, values, reverse=False):
+        """
+        Filters queryset to the rows strictly after values in the ordering
+        (or strictly before them when reverse is true).
+        """
+        condition = Q()
+        equal = {}
+        for (field, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= Q(**equal, **{f'{field}__{lookup}': value})
+            equal[field] = value
+        # The leading range lets the database seek into the index.
+        field, descending = self.ordering[0]
+        lookup = 'lte' if descending != reverse else 'gte'
+        return queryset.filter(**{f'{field}__{lookup}': values[0]}).filter(condition)
+
+    def _page_query(self, after=None, before=None, last=False):
+        """
+        Returns (queryset, reverse, has_previous, has_next) for a page, where
+        queryset selects up to per_page + 1 rows, in reverse order when
+        reverse is true. has_previous (or has_next, for reversed pages) is
+        None when the extra row decides it.
+        """
+        after_values = self._decode(after)
+        before_values = self._decode(before)
+
+        if before_values:
+            queryset = self._seek(self.queryset, before_values, reverse=True)
+            return queryset.order_by(*self._order_by(reverse=True))[:self.per_page + 1], True, None, True
+        if last:
+            return self.queryset.order_by(*self._order_by(reverse=True))[:self.per_page + 1], True, None, False
+        queryset = self.queryset
+        has_previous = False
+        if after_values:
+            queryset = self._seek(queryset, after_values)
+            has_previous = True
+        return queryset.order_by(*self._order_by())[:self.per_page + 1], False, has_previous, None
+
+    def _page(self, rows, reverse, has_previous, has_next):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows = rows[::-1]
+            has_previous = has_more
+        else:
+            has_next = has_more
+        if not rows:
+            return KeysetPage(rows, self)
+        return KeysetPage(
+            rows,
+            self,
+            next_cursor=self._cursor_for(rows[-1]) if has_next else None,
+            previous_cursor=self._cursor_for(rows[0]) if has_previous else None,
+        )
+
+    def get_page(self, after=None, before=None, last=False):
+        """
+        Returns the page following the 'after' cursor, preceding the 'before'
+        cursor, the last page when last is true, or the first page otherwise.
+        Invalid cursors fall back to the first page.
+        """
+        queryset, *page_args = self._page_query(after, before, last)
+        return self._page(list(queryset), *page_args)
+
+    async def aget_page(self, after=None, before=None, last=False):
+        """Async version of get_page(), for async views."""
+        queryset, *page_args = self._page_query(after, before, last)
+        return self._page([obj async for obj in queryset], *page_args)
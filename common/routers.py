@@ -0,0 +1,99 @@
+"""
+Read-replica database routing.
+
+Reads of models in CIELO_REPLICA_APPS go to the aliases listed in
+CIELO_READ_REPLICAS, round-robin over the replicas that are reachable, but
+only where stale data is harmless: inside a request with a safe method (GET,
+HEAD, OPTIONS) that has not written anything yet. Everything else - writes,
+reads after a write in the same request, unsafe requests, and code running
+outside a request such as management commands and the sync engine - uses
+the primary ('default').
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import DatabaseError, connections
+import itertools
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'default'
+
+# True while reads must go to the primary. Outside of requests it stays at
+# its default, so only ReplicaPinningMiddleware ever enables replica reads.
+_pinned = ContextVar('cielo_primary_pinned', default=True)
+
+
+def pin_to_primary():
+    """Sends the remaining reads of the current request to the primary."""
+    _pinned.set(True)
+
+
+@contextmanager
+def replica_reads(allowed=True):
+    """Allows (or forbids) replica reads within the block."""
+    token = _pinned.set(not allowed)
+    try:
+        yield
+    finally:
+        _pinned.reset(token)
+
+
+class ReplicaRouter:
+    def __init__(self, replicas=None, apps=None, retry_after=None):
+        self.replicas = list(getattr(settings, 'CIELO_READ_REPLICAS', []) if replicas is None else replicas)
+        self.apps = set(getattr(settings, 'CIELO_REPLICA_APPS', ['inventory']) if apps is None else apps)
+        self.retry_after = getattr(settings, 'CIELO_REPLICA_RETRY_SECONDS', 30) if retry_after is None else retry_after
+        self._turn = itertools.count()
+        self._down_until = {}
+        self._lock = threading.Lock()
+
+    def is_available(self, alias):
+        """
+        False while a replica is marked down. A replica whose connection
+        cannot be established is marked down for retry_after seconds.
+        """
+        down_until = self._down_until.get(alias)
+        if down_until is not None:
+            if time.monotonic() < down_until:
+                return False
+            with self._lock:
+                self._down_until.pop(alias, None)
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError as e:
+            logger.warning("Read replica %s unavailable for %ss: %s", alias, self.retry_after, e)
+            with self._lock:
+                self._down_until[alias] = time.monotonic() + self.retry_after
+            return False
+        return True
+
+    def db_for_read(self, model, **hints):
+        if not self.replicas or _pinned.get() or model._meta.app_label not in self.apps:
+            return None
+        start = next(self._turn)
+        for offset in range(len(self.replicas)):
+            alias = self.replicas[(start + offset) % len(self.replicas)]
+            if self.is_available(alias):
+                return alias
+        return PRIMARY
+
+    def db_for_write(self, model, **hints):
+        # Read-after-write: later reads in this request see the write.
+        _pinned.set(True)
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {PRIMARY, *self.replicas}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary and are never migrated directly.
+        if db in self.replicas:
+            return False
+        return None
@@ -0,0 +1,16 @@
+from django.shortcuts import render
+from .navigation import registry
+
+
+async def arender(request, template_name, context=None, content_type=None, status=None, using=None):
+    """
+    render() for async views.
+
+    Templates and context processors run synchronously and would load the
+    user and the navigation items lazily, which the ORM refuses to do inside
+    the event loop. Both are loaded here with async queries first, so the
+    render itself touches no database.
+    """
+    request.user = await request.auser()
+    request.cielo_navigation_items = await registry.aget_items(request)
+    return render(request, template_name, context, content_type, status, using)
@@ -0,0 +1,58 @@
+/*
+ * Lazily expandable sidebar navigation nodes.
+ *
+ * Items rendered with a data-children-url load one page of their children
+ * (as an HTML fragment from common.views.navigation_children) the first time
+ * they are expanded; "More..." links append the following page. Clicking a
+ * node's label while it is expanded follows its link, if it has one.
+ */
+(function () {
+    'use strict';
+
+    function load(url, list) {
+        var separator = url.indexOf('?') === -1 ? '?' : '&';
+        return fetch(url + separator + 'format=html', {
+            credentials: 'same-origin',
+            headers: {'X-Requested-With': 'XMLHttpRequest'}
+        }).then(function (response) {
+            if (!response.ok) {
+                throw new Error('HTTP ' + response.status);
+            }
+            return response.text();
+        }).then(function (html) {
+            list.insertAdjacentHTML('beforeend', html);
+        }).catch(function () {
+            list.insertAdjacentHTML('beforeend', '<li class="text-muted px-3">Could not load items</li>');
+        });
+    }
+
+    document.addEventListener('click', function (event) {
+        var more = event.target.closest('.cielo-nav-more');
+        if (more) {
+            event.preventDefault();
+            var item = more.parentElement;
+            var parentList = item.parentElement;
+            item.remove();
+            load(more.dataset.childrenUrl, parentList);
+            return;
+        }
+
+        var toggle = event.target.closest('.cielo-nav-toggle');
+        if (!toggle) {
+            return;
+        }
+        var list = toggle.parentElement.querySelector(':scope > .cielo-nav-children');
+        var expanded = toggle.getAttribute('aria-expanded') === 'true';
+        var href = toggle.getAttribute('href');
+        if (expanded && href && href !== '#') {
+            return;  // Second click on an expanded node with a page: navigate.
+        }
+        event.preventDefault();
+        if (!list.dataset.loaded) {
+            list.dataset.loaded = '1';
+            load(toggle.dataset.childrenUrl, list);
+        }
+        list.hidden = expanded;
+        toggle.setAttribute('aria-expanded', String(!expanded));
+    });
+})();
@@ -0,0 +1,216 @@
+"""
+The static asset pipeline.
+
+collectstatic copies only the theme assets the site uses (PrunedAppDirectoriesFinder),
+stores them under content-hashed names and writes gzip - and, when the
+optional 'brotli' package is installed, brotli - siblings of every text asset
+(CompressedManifestStaticFilesStorage). common.middleware.StaticFilesMiddleware
+serves the result with far-future cache headers.
+"""
+from django.conf import settings
+from django.contrib.staticfiles import utils
+from django.contrib.staticfiles.finders import AppDirectoriesFinder
+from django.contrib.staticfiles.storage import HashedFilesMixin, ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.template.utils import get_app_template_dirs
+from pathlib import Path
+from urllib.parse import urlsplit
+import fnmatch
+import gzip
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip siblings are written
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_TAG_RE = re.compile(r"""{%\s*static\s+(['"])(?P<url>.+?)\1""")
+
+# The references ManifestStaticFilesStorage rewrites (CSS url() and @import,
+# CSS and JS source maps) are the ones that pull further files in.
+REFERENCE_PATTERNS = [
+    (extension, re.compile(pattern[0] if isinstance(pattern, tuple) else pattern, re.IGNORECASE))
+    for extension, patterns in HashedFilesMixin.patterns
+    for pattern in patterns
+]
+
+COMPRESSIBLE_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.eot', '.ttf', '.otf', '.ico',
+}
+# Smaller files, and files that shrink by less than this ratio, are sent as is.
+COMPRESS_MIN_SIZE = 512
+COMPRESS_MAX_RATIO = 0.95
+
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+
+def template_references():
+    """The static paths named by {% static %} tags in all template directories."""
+    directories = [Path(d) for engine in settings.TEMPLATES for d in engine.get('DIRS', [])]
+    directories += get_app_template_dirs('templates')
+    found = set()
+    for directory in directories:
+        for path in Path(directory).rglob('*'):
+            if path.is_file():
+                text = path.read_text(encoding='utf-8', errors='ignore')
+                found.update(match['url'] for match in STATIC_TAG_RE.finditer(text))
+    return found
+
+
+def resolve_reference(name, url):
+    """The static path a URL inside the asset 'name' points to, or None."""
+    if re.match(r'^[a-z]+:', url) or url.startswith(('//', '#')):
+        return None
+    path = urlsplit(url).path
+    if not path:
+        return None
+    if path.startswith('/'):
+        static_path = urlsplit(settings.STATIC_URL).path
+        if not path.startswith(static_path):
+            return None
+        return path[len(static_path):]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(name), path))
+
+
+class PrunedAppDirectoriesFinder(AppDirectoriesFinder):
+    """
+    AppDirectoriesFinder that leaves unused theme assets out of collectstatic.
+
+    Files below the CIELO_STATIC_PRUNED_PREFIXES are collected only when a
+    template names them in a {% static %} tag, when they match a
+    CIELO_STATIC_KEEP pattern (for assets loaded by script), or when a
+    collected stylesheet or script references them. Finding single files,
+    as the development server does, is unaffected.
+    """
+
+    def list(self, ignore_patterns):
+        files = {}
+        for storage in self.storages.values():
+            if storage.exists(''):
+                for path in utils.get_files(storage, ignore_patterns):
+                    files.setdefault(path, storage)
+        prefixes = tuple(settings.CIELO_STATIC_PRUNED_PREFIXES)
+        used = self._used(files)
+        for path, storage in files.items():
+            if not path.startswith(prefixes) or path in used:
+                yield path, storage
+
+    def _used(self, files):
+        keep = settings.CIELO_STATIC_KEEP
+        pending = list(template_references())
+        pending += [path for path in files if any(fnmatch.fnmatch(path, pattern) for pattern in keep)]
+        used = set()
+        while pending:
+            name = pending.pop()
+            if name in used or name not in files:
+                continue
+            used.add(name)
+            patterns = [pattern for extension, pattern in REFERENCE_PATTERNS if fnmatch.fnmatch(name, extension)]
+            if patterns:
+                with files[name].open(name) as handle:
+                    text = handle.read().decode('utf-8', errors='ignore')
+                for pattern in patterns:
+                    for match in pattern.finditer(text):
+                        reference = resolve_reference(name, match['url'].strip())
+                        if reference:
+                            pending.append(reference)
+        return used
+
+
+def compress(storage, name):
+    """
+    Writes the precompressed siblings (name.br, name.gz) of a stored text
+    asset and returns their names.
+    """
+    if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+        return []
+    with storage.open(name) as handle:
+        data = handle.read()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return []
+    written = []
+    for encoding, suffix in ENCODINGS:
+        if encoding == 'br':
+            if brotli is None:
+                continue
+            compressed = brotli.compress(data)
+        else:
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+        if len(compressed) > len(data) * COMPRESS_MAX_RATIO:
+            continue
+        if storage.exists(name + suffix):
+            storage.delete(name + suffix)
+        written.append(storage._save(name + suffix, ContentFile(compressed)))
+    return written
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage that also precompresses the collected text
+    assets, tolerates references to files the theme doesn't ship (such as
+    missing source maps), and serves unhashed URLs until collectstatic has
+    written a manifest, so development and tests need no collected files.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._missing = set()
+
+    def stored_name(self, name):
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def hashed_name(self, name, content=None, filename=None):
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            if content is not None:
+                raise
+            # Reported once per name, although post_process makes several passes
+            if name not in self._missing:
+                self._missing.add(name)
+                logger.warning("Static asset %s is referenced but missing; leaving the reference unhashed.",
+                               name)
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(paths) | set(self.hashed_files.values())):
+            for compressed in compress(self, name):
+                yield name, compressed, True
+
+
+class CollectedFile:
+    """A file under STATIC_ROOT with its precompressed variants."""
+
+    def __init__(self, path, immutable):
+        self.path = path
+        self.immutable = immutable
+        self.mtime = os.stat(path).st_mtime
+        self.content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.encodings = [
+            (encoding, path + suffix) for encoding, suffix in ENCODINGS if os.path.isfile(path + suffix)
+        ]
+
+
+def collected_files(root, hashed_names=()):
+    """Maps the static path of every collected file to its CollectedFile."""
+    hashed_names = set(hashed_names)
+    files = {}
+    for directory, dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, '/')
+            if any(path.endswith(suffix) and os.path.isfile(path[:-len(suffix)]) for encoding, suffix in ENCODINGS):
+                continue  # A precompressed variant, served in place of its original
+            files[name] = CollectedFile(path, name in hashed_names)
+    return files
@@ -0,0 +1,80 @@
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from django.utils.http import urlencode
+from django.views.decorators.http import require_POST
+from . import jobs
+from .metrics import registry as metrics_registry
+from .models import Job
+from .navigation import registry as navigation_registry
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def metrics(request):
+    """Prometheus scrape endpoint, for staff users or bearer token holders."""
+    token = getattr(settings, 'CIELO_METRICS_TOKEN', '')
+    authorization = request.headers.get('Authorization', '')
+    token_ok = bool(token) and authorization.startswith('Bearer ') and constant_time_compare(
+        authorization[len('Bearer '):], token)
+    if not (token_ok or request.user.is_staff):
+        response = HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+        if token:
+            response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return HttpResponse(metrics_registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@login_required
+def navigation_children(request, node):
+    """
+    One page of a lazily expandable navigation node's children, as JSON or,
+    with ?format=html, as the <li> fragment the sidebar inserts.
+    """
+    parent = request.GET.get('parent')
+    try:
+        items, next_cursor = navigation_registry.get_children(request, node, parent, request.GET.get('after'))
+    except KeyError:
+        raise Http404("Unknown navigation node.")
+    next_url = None
+    if next_cursor:
+        params = {'after': next_cursor}
+        if parent is not None:
+            params['parent'] = parent
+        next_url = f'{request.path}?{urlencode(params)}'
+
+    if request.GET.get('format') == 'html':
+        return render(request, 'common/navigation_children.html', {'items': items, 'next_url': next_url})
+    return JsonResponse({'items': items, 'next': next_url})
+
+
+def job_response(job, status=200):
+    """The JSON status of a job, with the URLs to poll and cancel it."""
+    data = job.as_dict()
+    data['status_url'] = reverse('job_status', kwargs={'pk': job.pk})
+    data['cancel_url'] = reverse('job_cancel', kwargs={'pk': job.pk})
+    return JsonResponse(data, status=status)
+
+
+def _get_job(request, pk):
+    # Users see their own jobs; staff see all of them.
+    queryset = Job.objects.all() if request.user.is_staff else Job.objects.filter(created_by=request.user)
+    return get_object_or_404(queryset, pk=pk)
+
+
+@login_required
+def job_status(request, pk):
+    """Status and progress of a background job, for polling."""
+    return job_response(_get_job(request, pk))
+
+
+@login_required
+@require_POST
+def job_cancel(request, pk):
+    job = _get_job(request, pk)
+    jobs.cancel(job)
+    job.refresh_from_db()
+    return job_response(job, status=202 if not job.finished else 200)
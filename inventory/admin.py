@@ -1,6 +1,133 @@
 from django.contrib import admin
-from .models import VirtualMachine, StorageAccount, AzureSubscription
+from django.utils.translation import gettext_lazy as _
+from common.admin import LargeTableAdmin
+from . import resources, search
+from .models import VirtualMachine, StorageAccount, AzureSubscription, CloudResource, InventoryRollup
 
-admin.site.register(VirtualMachine)
-admin.site.register(StorageAccount)
-admin.site.register(AzureSubscription)
\ No newline at end of file
+
+class RollupValuesListFilter(admin.SimpleListFilter):
+    """
+    Filter on a VM column whose choices are read from the InventoryRollup
+    groups rather than with a SELECT DISTINCT over the whole VM table.
+    """
+
+    def lookups(self, request, model_admin):
+        values = (InventoryRollup.objects.filter(vm_count__gt=0).exclude(**{self.parameter_name: ''})
+                  .order_by(self.parameter_name).values_list(self.parameter_name, flat=True).distinct())
+        return [(value, value) for value in values]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class LocationListFilter(RollupValuesListFilter):
+    title = _("Location")
+    parameter_name = 'location'
+
+
+class EnvironmentListFilter(RollupValuesListFilter):
+    title = _("Environment")
+    parameter_name = 'environment'
+
+
+class SubscriptionListFilter(admin.SimpleListFilter):
+    """
+    Filter on the subscription whose choices are at most MAX_CHOICES
+    subscriptions, by name, instead of every AzureSubscription row. Keeps
+    the parameter of the related field filter it replaces.
+    """
+    title = _("Subscription")
+    parameter_name = 'subscription__id__exact'
+    MAX_CHOICES = 100
+
+    def subscriptions(self, request):
+        return AzureSubscription.objects.all()
+
+    def lookups(self, request, model_admin):
+        choices = list(self.subscriptions(request).order_by('name', 'pk').values_list('pk', 'name')[:self.MAX_CHOICES])
+        # The selected subscription stays shown past the cut.
+        value = self.value()
+        if value and value.isdigit() and all(str(pk) != value for pk, _name in choices):
+            choices += AzureSubscription.objects.filter(pk=value).values_list('pk', 'name')
+        return choices
+
+    def queryset(self, request, queryset):
+        if self.value() and self.value().isdigit():
+            return queryset.filter(subscription_id=self.value())
+        return queryset
+
+
+class RollupSubscriptionListFilter(SubscriptionListFilter):
+    """SubscriptionListFilter offering only the subscriptions the rollups count VMs in."""
+
+    def subscriptions(self, request):
+        groups = InventoryRollup.objects.filter(vm_count__gt=0, subscription__isnull=False)
+        return AzureSubscription.objects.filter(pk__in=groups.values('subscription_id'))
+
+
+class ResourceTypeListFilter(admin.SimpleListFilter):
+    """Filter on CloudResource.type with the registered types as choices."""
+    title = _("Type")
+    parameter_name = 'type'
+
+    def lookups(self, request, model_admin):
+        return [(resource_type.type, resource_type.label) for resource_type in resources.registry]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(type=self.value())
+        return queryset
+
+
+class InventorySearchMixin:
+    """Admin search through the full-text index (see inventory.search)."""
+    search_fields = ['name']
+    search_help_text = _("Matches every word as a prefix of the name or details.")
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        return search.filter_queryset(queryset, search_term), False
+
+
+@admin.register(VirtualMachine)
+class VirtualMachineAdmin(InventorySearchMixin, LargeTableAdmin):
+    list_display = ['name', 'subscription', 'location', 'environment', 'resource_group']
+    list_select_related = ['subscription']
+    # Each filter column leads an index on (column, name, id), and the
+    # choices come from the rollups.
+    list_filter = [RollupSubscriptionListFilter, LocationListFilter, EnvironmentListFilter]
+    # Sorting only by columns with a matching index; the default order walks
+    # the (name, id) index.
+    ordering = ['name', 'id']
+    sortable_by = ['name', 'location', 'environment']
+    autocomplete_fields = ['subscription']
+
+
+@admin.register(StorageAccount)
+class StorageAccountAdmin(InventorySearchMixin, LargeTableAdmin):
+    list_display = ['name', 'subscription', 'location', 'sku', 'access_tier']
+    list_select_related = ['subscription']
+    list_filter = [SubscriptionListFilter]
+    sortable_by = []
+    autocomplete_fields = ['subscription']
+
+
+@admin.register(CloudResource)
+class CloudResourceAdmin(LargeTableAdmin):
+    list_display = ['name', 'type', 'subscription', 'location']
+    list_select_related = ['subscription']
+    list_filter = [ResourceTypeListFilter, SubscriptionListFilter]
+    # Walks the (type, name, id) index, filtered on a type or not.
+    ordering = ['type', 'name', 'id']
+    sortable_by = []
+    autocomplete_fields = ['subscription']
+    readonly_fields = ['indexed_1', 'indexed_2', 'indexed_3']
+
+
+@admin.register(AzureSubscription)
+class AzureSubscriptionAdmin(admin.ModelAdmin):
+    list_display = ['name', 'subscription_id']
+    search_fields = ['name', 'subscription_id']
@@ -13,5 +13,64 @@ class InventoryConfig(AppConfig):
     # Path to a function that provides navigation items for this app
     cielo_navigation_provider = "inventory.cielo_hooks.get_navigation_items"
 
+    # Models whose changes invalidate the cached navigation items of this app
+    cielo_navigation_models = ["inventory.AzureSubscription"]
+
+    # Lazily expandable navigation nodes: name -> loader (see common.navigation)
+    cielo_navigation_nodes = {
+        "subscriptions": "inventory.cielo_hooks.get_subscription_nodes",
+        "resource_groups": "inventory.cielo_hooks.get_resource_group_nodes",
+        "virtual_machines": "inventory.cielo_hooks.get_virtual_machine_nodes",
+    }
+
+    # Background jobs run by the run_jobs worker: name -> function (see common.jobs)
+    cielo_jobs = {
+        "import": "inventory.jobs.import_inventory",
+        "sync": "inventory.jobs.sync_inventory",
+    }
+
+    # Resource types stored in CloudResource: Azure type -> options, with up
+    # to three indexed attributes each (see inventory.resources)
+    cielo_resource_types = {
+        "microsoft.compute/disks": {
+            "slug": "disks",
+            "label": _("Disks"),
+            "icon_class": "bi-device-hdd",
+            "attributes": {"sku": "sku.name", "size_gb": "properties.diskSizeGB", "state": "properties.diskState"},
+            "indexed": ["sku", "state"],
+        },
+        "microsoft.network/virtualnetworks": {
+            "slug": "virtual-networks",
+            "label": _("Virtual Networks"),
+            "icon_class": "bi-diagram-3",
+            "attributes": {"address_space": "properties.addressSpace.addressPrefixes"},
+        },
+    }
+
     # Path to a function that provides permission definitions for this app
     cielo_permissions_provider = "inventory.cielo_hooks.get_app_permissions"
+
+    def ready(self):
+        from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+        from . import resources, rollups, search, tags, versions
+        from .models import AzureSubscription, CloudResource, StorageAccount, VirtualMachine
+
+        resources.registry.build()
+        pre_save.connect(resources.resource_pre_save, sender=CloudResource, dispatch_uid='inventory_resource_pre_save')
+
+        pre_save.connect(rollups.virtual_machine_pre_save, sender=VirtualMachine, dispatch_uid='inventory_rollup_pre_save')
+        post_save.connect(rollups.virtual_machine_post_save, sender=VirtualMachine, dispatch_uid='inventory_rollup_post_save')
+        post_delete.connect(rollups.virtual_machine_post_delete, sender=VirtualMachine, dispatch_uid='inventory_rollup_post_delete')
+        pre_delete.connect(rollups.subscription_pre_delete, sender=AzureSubscription, dispatch_uid='inventory_rollup_subscription_delete')
+
+        for model in (VirtualMachine, StorageAccount, AzureSubscription):
+            uid = model._meta.model_name
+            post_save.connect(search.object_saved, sender=model, dispatch_uid=f'inventory_search_{uid}_save')
+            post_delete.connect(search.object_deleted, sender=model, dispatch_uid=f'inventory_search_{uid}_delete')
+            post_save.connect(versions.object_saved, sender=model, dispatch_uid=f'inventory_version_{uid}_save')
+            post_delete.connect(versions.object_deleted, sender=model, dispatch_uid=f'inventory_version_{uid}_delete')
+        post_save.connect(versions.object_saved, sender=CloudResource, dispatch_uid='inventory_version_cloudresource_save')
+        post_delete.connect(versions.object_deleted, sender=CloudResource, dispatch_uid='inventory_version_cloudresource_delete')
+        for model in (VirtualMachine, StorageAccount, CloudResource):
+            post_delete.connect(tags.object_deleted, sender=model, dispatch_uid=f'inventory_tags_{model._meta.model_name}_delete')
+        pre_delete.connect(versions.subscription_pre_delete, sender=AzureSubscription, dispatch_uid='inventory_version_subscription_delete')
@@ -0,0 +1,295 @@
+"""
+Streaming bulk import of inventory exports.
+
+Reads Azure Resource Graph style exports (CSV with a header row, or NDJSON
+with one resource object per line) row by row and upserts VirtualMachine and
+StorageAccount rows, and CloudResource rows for the resource types in
+inventory.resources.registry, in batches keyed on their Azure resource ID,
+so memory stays bounded by the batch size regardless of the file size.
+"""
+from django.db import transaction
+from common.navigation import registry as navigation_registry
+from . import resources, rollups, search, tags, versions
+from .models import AzureSubscription, CloudResource, StorageAccount, VirtualMachine
+import csv
+import json
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+VIRTUAL_MACHINE_TYPE = 'microsoft.compute/virtualmachines'
+STORAGE_ACCOUNT_TYPE = 'microsoft.storage/storageaccounts'
+
+FORMATS = ('csv', 'ndjson')
+
+# Row keys stored in CloudResource columns rather than in its attributes
+RESOURCE_COLUMNS = {'id', 'resourceid', 'resource_id', 'name', 'type', 'location', 'subscriptionid',
+                    'subscription_id', 'subscription', 'tags'}
+
+RESOURCE_GROUP_PATTERN = re.compile(r'/resourcegroups/([^/]+)', re.IGNORECASE)
+
+
+def detect_format(path):
+    """Guesses the export format from a file name, defaulting to NDJSON."""
+    return 'csv' if str(path).lower().endswith('.csv') else 'ndjson'
+
+
+def read_rows(stream, fmt):
+    """Yields one dict per resource from a CSV or NDJSON text stream."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            # DictReader keeps the fields beyond the header under the key None.
+            if None in row:
+                logger.warning("Skipping CSV line %d: %d more fields than the header",
+                               reader.line_num, len(row[None]))
+                continue
+            yield row
+        return
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            logger.warning("Skipping invalid NDJSON line %d: %s", line_number, e)
+
+
+def lookup_value(row, *paths):
+    """
+    Returns the first non-empty value found in row for the given
+    case-insensitive keys. Dotted keys ('sku.name') look into nested
+    objects, which in CSV exports may be JSON encoded strings.
+    """
+    for path in paths:
+        value = row
+        for part in path.lower().split('.'):
+            if isinstance(value, str) and value.startswith('{'):
+                try:
+                    value = json.loads(value)
+                except ValueError:
+                    value = None
+            if not isinstance(value, dict):
+                value = None
+                break
+            value = next((v for k, v in value.items() if isinstance(k, str) and k.lower() == part), None)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def resource_group_from_id(resource_id):
+    """Returns the (lower-cased) resource group named in an Azure resource ID."""
+    match = RESOURCE_GROUP_PATTERN.search(resource_id or '')
+    return match.group(1).lower() if match else ''
+
+
+def _text(value):
+    return '' if value is None else str(value)
+
+
+class ImportStats:
+    def __init__(self):
+        self.rows = 0
+        self.virtual_machines = 0
+        self.storage_accounts = 0
+        self.resources = 0
+        self.subscriptions_created = 0
+        self.skipped = 0
+        self.started = time.monotonic()
+        self.finished = None
+
+    @property
+    def duration(self):
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.duration if self.duration else 0.0
+
+
+class InventoryImporter:
+    """
+    Upserts inventory rows in batches.
+
+    AzureSubscription foreign keys are resolved from an in-memory map of
+    subscription GUID to primary key that is loaded once; unknown
+    subscriptions are created (named after their GUID) unless
+    create_subscriptions is false, in which case their rows are skipped.
+    progress, if given, is called with the ImportStats after every batch.
+    """
+
+    VIRTUAL_MACHINE_FIELDS = ['name', 'location', 'environment', 'resource_group', 'subscription', 'change_version']
+    STORAGE_ACCOUNT_FIELDS = ['name', 'location', 'sku', 'access_tier', 'subscription']
+    RESOURCE_FIELDS = ['type', 'name', 'location', 'subscription', 'attributes', 'indexed_1', 'indexed_2', 'indexed_3']
+
+    def __init__(self, batch_size=1000, create_subscriptions=True, default_type=VIRTUAL_MACHINE_TYPE, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.create_subscriptions = create_subscriptions
+        self.default_type = default_type
+        self.subscription_map = {}
+        self.stats = ImportStats()
+        self._virtual_machines = {}
+        self._storage_accounts = {}
+        self._resources = {}
+        self._tags = {VirtualMachine: {}, StorageAccount: {}, CloudResource: {}}
+        self._pending_subscriptions = set()
+
+    def run(self, rows):
+        self.subscription_map = {
+            guid.lower(): pk for guid, pk in AzureSubscription.objects.values_list('subscription_id', 'pk')
+        }
+        for row in rows:
+            self.stats.rows += 1
+            self._add(row)
+            if len(self._virtual_machines) + len(self._storage_accounts) + len(self._resources) >= self.batch_size:
+                self.flush()
+                if self.progress:
+                    self.progress(self.stats)
+        self.flush()
+        versions.prune_tombstones()
+        self.stats.finished = time.monotonic()
+        if self.stats.subscriptions_created:
+            navigation_registry.invalidate()
+        return self.stats
+
+    def _add(self, row):
+        resource_type = _text(lookup_value(row, 'type') or self.default_type).lower()
+        name = _text(lookup_value(row, 'name'))
+        subscription_id = _text(lookup_value(row, 'subscriptionId', 'subscription_id', 'subscription')).lower()
+        resource_id = _text(lookup_value(row, 'id', 'resourceId', 'resource_id'))
+        if not resource_id and name and subscription_id:
+            resource_id = f'/subscriptions/{subscription_id}/providers/{resource_type}/{name}'
+        known_type = resource_type in (VIRTUAL_MACHINE_TYPE, STORAGE_ACCOUNT_TYPE) or resource_type in resources.registry
+        if not name or not resource_id or not known_type:
+            self.stats.skipped += 1
+            return
+
+        resource_id = resource_id.lower()
+        if subscription_id and subscription_id not in self.subscription_map:
+            if not self.create_subscriptions:
+                self.stats.skipped += 1
+                return
+            self._pending_subscriptions.add(subscription_id)
+
+        # Rows with a tags column replace the resource's tags; without one
+        # they are left alone.
+        resource_tags = tags.normalise_tags(lookup_value(row, 'tags'))
+        values = {
+            'name': name,
+            'location': _text(lookup_value(row, 'location')),
+            'subscription_id': subscription_id or None,
+        }
+        if resource_type == VIRTUAL_MACHINE_TYPE:
+            values['environment'] = _text(lookup_value(row, 'environment', 'tags.environment', 'tags.env'))
+            values['resource_group'] = (_text(lookup_value(row, 'resourceGroup', 'resource_group')).lower()
+                                        or resource_group_from_id(resource_id))
+            # Later rows for the same resource win; this also keeps a single
+            # INSERT ... ON CONFLICT statement from touching a row twice.
+            self._virtual_machines[resource_id] = values
+            model = VirtualMachine
+        elif resource_type == STORAGE_ACCOUNT_TYPE:
+            values['sku'] = _text(lookup_value(row, 'sku.name', 'sku'))
+            values['access_tier'] = _text(lookup_value(row, 'accessTier', 'access_tier', 'properties.accessTier'))
+            self._storage_accounts[resource_id] = values
+            model = StorageAccount
+        else:
+            values['type'] = resource_type
+            values['attributes'] = {key: value for key, value in row.items()
+                                    if isinstance(key, str) and key.lower() not in RESOURCE_COLUMNS}
+            self._resources[resource_id] = values
+            model = CloudResource
+        if resource_tags is not None:
+            self._tags[model][resource_id] = resource_tags
+
+    def _create_pending_subscriptions(self):
+        if not self._pending_subscriptions:
+            return
+        version = versions.next_version(AzureSubscription)
+        AzureSubscription.objects.bulk_create(
+            [AzureSubscription(name=guid, subscription_id=guid, change_version=version)
+             for guid in self._pending_subscriptions],
+            ignore_conflicts=True,
+        )
+        known = len(self.subscription_map)
+        created = AzureSubscription.objects.filter(subscription_id__in=self._pending_subscriptions)
+        self.subscription_map.update(created.values_list('subscription_id', 'pk'))
+        search.index_queryset(created)
+        self.stats.subscriptions_created += len(self.subscription_map) - known
+        self._pending_subscriptions = set()
+
+    def _build(self, model, rows):
+        objects = []
+        for resource_id, values in rows.items():
+            values = dict(values, resource_id=resource_id)
+            values['subscription_id'] = self.subscription_map.get(values['subscription_id'])
+            objects.append(model(**values))
+        return objects
+
+    def _write_tags(self, model):
+        pending = self._tags[model]
+        if pending:
+            pks = model.objects.filter(resource_id__in=list(pending)).values_list('resource_id', 'pk')
+            tags.set_tags(model, {pk: pending[resource_id] for resource_id, pk in pks})
+
+    def flush(self):
+        """Writes the buffered rows in a single transaction."""
+        if not (self._virtual_machines or self._storage_accounts or self._resources):
+            return
+        with transaction.atomic():
+            self._create_pending_subscriptions()
+            if self._virtual_machines:
+                virtual_machines = self._build(VirtualMachine, self._virtual_machines)
+                # bulk_create bypasses signals, so keep InventoryRollup, the
+                # search index, the tags and the inventory version in step here.
+                old_keys = {
+                    resource_id: (subscription_id, location, environment)
+                    for resource_id, subscription_id, location, environment in VirtualMachine.objects.filter(
+                        resource_id__in=list(self._virtual_machines)).values_list(
+                        'resource_id', 'subscription_id', 'location', 'environment')
+                }
+                new_keys = {vm.resource_id: rollups.rollup_key(vm) for vm in virtual_machines}
+                change_version = versions.next_version(VirtualMachine)
+                for vm in virtual_machines:
+                    vm.change_version = change_version
+                VirtualMachine.objects.bulk_create(
+                    virtual_machines,
+                    update_conflicts=True,
+                    unique_fields=['resource_id'],
+                    update_fields=self.VIRTUAL_MACHINE_FIELDS,
+                )
+                rollups.apply_deltas(rollups.upsert_deltas(old_keys, new_keys))
+                self._write_tags(VirtualMachine)
+                search.index_queryset(VirtualMachine.objects.filter(resource_id__in=list(self._virtual_machines)))
+            if self._storage_accounts:
+                StorageAccount.objects.bulk_create(
+                    self._build(StorageAccount, self._storage_accounts),
+                    update_conflicts=True,
+                    unique_fields=['resource_id'],
+                    update_fields=self.STORAGE_ACCOUNT_FIELDS,
+                )
+                self._write_tags(StorageAccount)
+                search.index_queryset(StorageAccount.objects.filter(resource_id__in=list(self._storage_accounts)))
+                versions.bump(StorageAccount)
+            if self._resources:
+                CloudResource.objects.bulk_create(
+                    [resources.promote(resource) for resource in self._build(CloudResource, self._resources)],
+                    update_conflicts=True,
+                    unique_fields=['resource_id'],
+                    update_fields=self.RESOURCE_FIELDS,
+                )
+                self._write_tags(CloudResource)
+                versions.bump(CloudResource)
+        self.stats.virtual_machines += len(self._virtual_machines)
+        self.stats.storage_accounts += len(self._storage_accounts)
+        self.stats.resources += len(self._resources)
+        logger.debug("Flushed %d virtual machines, %d storage accounts and %d other resources",
+                     len(self._virtual_machines), len(self._storage_accounts), len(self._resources))
+        self._virtual_machines = {}
+        self._storage_accounts = {}
+        self._resources = {}
+        self._tags = {VirtualMachine: {}, StorageAccount: {}, CloudResource: {}}
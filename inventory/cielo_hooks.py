@@ -1,6 +1,10 @@
 from django.urls import reverse
+from django.utils.http import urlencode
 from django.utils.translation import gettext_lazy as _
-from .models import AzureSubscription # Import the new model
+from common.navigation import children_url
+from common.pagination import KeysetPaginator, decode_cursor, encode_cursor
+from . import resources
+from .models import AzureSubscription, VirtualMachine # Import the new model
 
 def get_navigation_items(request):
     """
@@ -31,28 +35,26 @@ def get_navigation_items(request):
             'active_pattern_names': ['inventory:storage_accounts'],
         })
 
-    # Subscriptions Menu
-    if request.user.has_perm('inventory.view_azuresubscription'):
-        subscription_sub_items = []
-        try:
-            # Fetch subscriptions from the database
-            # In a real app with many subscriptions, consider caching or optimizing this query.
-            subscriptions = AzureSubscription.objects.all()
-            for sub in subscriptions:
-                subscription_sub_items.append({
-                    'label': sub.name,
-                    'url': reverse('inventory:azure_subscription_detail', kwargs={'pk': sub.pk}),
-                    'icon_class': 'bi-cloud', # Example icon for individual subscriptions
-                    'active_pattern_names': ['inventory:azure_subscription_detail'], # Add specific active check if needed
-                })
-        except Exception: # Catch potential database errors during startup if migrations haven't run
-            pass
+    # One entry per resource type registered in 'cielo_resource_types'.
+    if request.user.has_perm('inventory.view_cloudresource'):
+        for resource_type in resources.registry:
+            items.append({
+                'label': resource_type.label,
+                'url': reverse('inventory:resources', kwargs={'slug': resource_type.slug}),
+                'icon_class': resource_type.icon_class,
+                'active_pattern_names': ['inventory:resources', 'inventory:resource_detail'],
+            })
 
-        if subscription_sub_items: # Only add the parent menu if there are subscriptions to show
+    # Subscriptions Menu. Subscriptions, their resource groups and VMs are
+    # lazily loaded nodes (see get_subscription_nodes below), so the sidebar
+    # only ships this top-level entry however many subscriptions exist.
+    if request.user.has_perm('inventory.view_azuresubscription'):
+        # Cached by the navigation registry until an AzureSubscription is saved or deleted.
+        if AzureSubscription.objects.exists(): # Only add the menu if there are subscriptions to show
             items.append({
                 'label': _('Azure Subscriptions'),
                 'icon_class': 'bi-clouds-fill', # Icon for the parent menu
-                'sub_items': subscription_sub_items,
+                'children_url': children_url('inventory.subscriptions'),
                 # 'url': reverse('inventory:azure_subscriptions_list'), # Optional: if you want a page listing all subscriptions
             })
     return items
@@ -65,5 +67,63 @@ def get_app_permissions():
         ('view_virtualmachine', _('Can view virtual machines')),
         ('view_storageaccount', _('Can view storage accounts')),
         ('view_azuresubscription', _('Can view Azure subscriptions')),
+        ('view_cloudresource', _('Can view cloud resources')),
         # Add other permissions as your app defines them, e.g., add_virtualmachine, etc.
-    ]
\ No newline at end of file
+    ]
+
+
+# Lazily loaded navigation nodes (registered in InventoryConfig.cielo_navigation_nodes):
+# subscription -> resource group -> virtual machine. Each loader returns one
+# page of children and a cursor for the next, see common.navigation.
+
+def get_subscription_nodes(request, parent, after, limit):
+    if not request.user.has_perm('inventory.view_azuresubscription'):
+        return [], None
+    page = KeysetPaginator(AzureSubscription.objects.only('pk', 'name'), limit, ordering=('name',)).get_page(after=after)
+    can_view_vms = request.user.has_perm('inventory.view_virtualmachine')
+    items = []
+    for sub in page:
+        item = {
+            'label': sub.name,
+            'url': reverse('inventory:azure_subscription_detail', kwargs={'pk': sub.pk}),
+            'icon_class': 'bi-cloud', # Example icon for individual subscriptions
+        }
+        if can_view_vms:
+            item['children_url'] = children_url('inventory.resource_groups', parent=sub.pk)
+        items.append(item)
+    return items, page.next_cursor
+
+
+def get_resource_group_nodes(request, parent, after, limit):
+    if not request.user.has_perm('inventory.view_virtualmachine') or not (parent or '').isdigit():
+        return [], None
+    # Distinct resource groups of the subscription, read from the
+    # (subscription, resource_group, ...) index.
+    groups = (VirtualMachine.objects.filter(subscription_id=int(parent)).exclude(resource_group='')
+              .order_by('resource_group').values_list('resource_group', flat=True).distinct())
+    after_values = decode_cursor(after) if after else None
+    if after_values:
+        groups = groups.filter(resource_group__gt=after_values[0])
+    groups = list(groups[:limit + 1])
+    next_cursor = encode_cursor([groups[limit - 1]]) if len(groups) > limit else None
+    listing_url = reverse('inventory:virtual_machines')
+    return [{
+        'label': group,
+        'url': f"{listing_url}?{urlencode({'subscription': parent, 'resource_group': group})}",
+        'icon_class': 'bi-folder',
+        'children_url': children_url('inventory.virtual_machines', parent=f'{parent}/{group}'),
+    } for group in groups[:limit]], next_cursor
+
+
+def get_virtual_machine_nodes(request, parent, after, limit):
+    subscription, _sep, group = (parent or '').partition('/')
+    if not request.user.has_perm('inventory.view_virtualmachine') or not subscription.isdigit() or not group:
+        return [], None
+    virtual_machines = VirtualMachine.objects.filter(subscription_id=int(subscription), resource_group=group).only('pk', 'name')
+    page = KeysetPaginator(virtual_machines, limit, ordering=('name',)).get_page(after=after)
+    listing_url = reverse('inventory:virtual_machines')
+    return [{
+        'label': vm.name,
+        'url': f"{listing_url}?{urlencode({'subscription': subscription, 'resource_group': group, 'name': vm.name})}",
+        'icon_class': 'bi-hdd',
+    } for vm in page], page.next_cursor
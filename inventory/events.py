@@ -0,0 +1,254 @@
+"""
+Inventory change events for the server-sent events stream (see views.events).
+
+The change log is the one kept by inventory.versions: VirtualMachine and
+AzureSubscription rows are stamped with the version of their last write
+and deletes leave tombstones. Every process runs one ChangeFeed which, at
+most every CIELO_EVENTS_POLL_SECONDS, reads the version counters and, when
+they moved, the rows stamped and the tombstones left since, and keeps the
+resulting events in memory. Open streams only read from the feed, so the
+number of connected dashboards does not add database load.
+
+A stream's position is a cursor holding the version of each tracked model;
+it is sent as the SSE event ID, so a reconnecting EventSource resumes where
+it stopped (Last-Event-ID) while the feed still holds the events after it.
+Otherwise, and when one poll finds more than CIELO_EVENTS_MAX_BATCH changes
+of a model (a large import or sync), readers get a 'reset' event telling
+them to reload instead of the individual changes.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Max, Sum
+from common.pagination import decode_cursor, encode_cursor
+from .models import AzureSubscription, InventoryRollup, InventoryTombstone, InventoryVersion, VirtualMachine
+import asyncio
+import json
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Tracked models, in cursor order, with the fields their events carry and
+# the permission needed to receive them.
+TRACKED = (
+    (VirtualMachine, ('name', 'subscription_id', 'location', 'environment', 'resource_group'),
+     'inventory.view_virtualmachine'),
+    (AzureSubscription, ('name', 'subscription_id'), 'inventory.view_azuresubscription'),
+)
+# Events held by a feed; readers further behind get a reset.
+MAX_EVENTS = 5000
+# Sent at the start of every stream: how long EventSource waits before reconnecting.
+RETRY_MILLISECONDS = 5000
+
+
+class Event:
+    """One change: 'virtualmachine.updated', 'azuresubscription.deleted', 'counts', 'reset'..."""
+
+    def __init__(self, name, data, index, version, permission):
+        self.name = name
+        self.data = data
+        # The cursor position (tracked model index) and version of the change
+        self.index = index
+        self.version = version
+        self.permission = permission
+
+    def encode(self):
+        return f"event: {self.name}\ndata: {json.dumps(self.data, separators=(',', ':'))}\n\n"
+
+    def __repr__(self):
+        return f'Event({self.name!r}, {self.data!r})'
+
+
+def parse_cursor(value):
+    """Returns the versions encoded in a cursor string, or None if it is missing or invalid."""
+    versions = decode_cursor(value) if value else None
+    if versions is None or len(versions) != len(TRACKED) or not all(isinstance(v, int) for v in versions):
+        return None
+    return tuple(versions)
+
+
+def current_cursor():
+    """The cursor of the current inventory versions, for pages to start their stream from."""
+    return encode_cursor(list(_read_versions()))
+
+
+def _read_versions():
+    labels = [model._meta.label_lower for model, _fields, _permission in TRACKED]
+    found = dict(InventoryVersion.objects.filter(model__in=labels).values_list('model', 'version'))
+    return tuple(found.get(label, 0) for label in labels)
+
+
+class ChangeFeed:
+    """
+    Turns the change log into events, polling it at most every
+    CIELO_EVENTS_POLL_SECONDS whatever the number of readers. A poll builds
+    the new state under a lock and swaps it in, so readers never wait.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        # (cursor the feed is up to, cursor below which events were dropped, events)
+        self.state = None
+        self.max_pks = {}
+        self._checked = 0.0
+
+    def _stale(self):
+        return self.state is None or time.monotonic() - self._checked >= getattr(settings, 'CIELO_EVENTS_POLL_SECONDS', 2)
+
+    def update(self):
+        if self._stale():
+            with self._lock:
+                if self._stale():
+                    self.refresh()
+
+    def refresh(self):
+        """Appends the events of the changes since the feed's cursor."""
+        versions = _read_versions()
+        # Versions behind the feed's (a restored database) restart it too.
+        if self.state is None or any(version < seen for version, seen in zip(versions, self.state[0])):
+            for model, _fields, _permission in TRACKED:
+                self.max_pks[model] = self._max_pk(model)
+            self.state = (versions, versions, ())
+            self._checked = time.monotonic()
+            return
+        cursor, floor, events = self.state
+        new_events = []
+        for index, (model, fields, permission) in enumerate(TRACKED):
+            if versions[index] > cursor[index]:
+                new_events.extend(self._changes(index, model, fields, permission, cursor[index], versions[index]))
+        if versions[0] > cursor[0]:
+            new_events.append(self._counts(versions[0]))
+        events = events + tuple(new_events)
+        if len(events) > MAX_EVENTS:
+            floor = list(floor)
+            for event in events[:-MAX_EVENTS]:
+                floor[event.index] = max(floor[event.index], event.version)
+            events, floor = events[-MAX_EVENTS:], tuple(floor)
+        self.state = (versions, floor, events)
+        self._checked = time.monotonic()
+        if new_events:
+            logger.debug("Change feed read %d events up to versions %s", len(new_events), versions)
+
+    def _max_pk(self, model):
+        return model.objects.aggregate(pk=Max('pk'))['pk'] or 0
+
+    def _changes(self, index, model, fields, permission, since, version):
+        # Rows stamped after the version read above are picked up by the next poll.
+        label = model._meta.model_name
+        limit = getattr(settings, 'CIELO_EVENTS_MAX_BATCH', 500)
+        rows = list(model.objects.filter(change_version__gt=since, change_version__lte=version)
+                    .order_by('change_version', 'pk').values('pk', 'change_version', *fields)[:limit + 1])
+        deleted = list(InventoryTombstone.objects.filter(model=model._meta.label_lower, version__gt=since,
+                                                         version__lte=version)
+                       .order_by('version').values_list('object_id', 'version')[:limit + 1])
+        if len(rows) + len(deleted) > limit:
+            self.max_pks[model] = self._max_pk(model)
+            return [Event('reset', {'model': label}, index, version, permission)]
+        changes = [(row.pop('change_version'), row) for row in rows]
+        changes += [(tombstone_version, {'pk': pk, 'deleted': True}) for pk, tombstone_version in deleted]
+        events = []
+        for change_version, row in sorted(changes, key=lambda change: change[0]):
+            pk = row.pop('pk')
+            if row.pop('deleted', False):
+                events.append(Event(f'{label}.deleted', {'id': pk}, index, change_version, permission))
+                continue
+            # IDs only grow, so a row above every ID seen before is new.
+            action = 'created' if pk > self.max_pks[model] else 'updated'
+            self.max_pks[model] = max(self.max_pks[model], pk)
+            events.append(Event(f'{label}.{action}', {'id': pk, **row}, index, change_version, permission))
+        return events
+
+    def _counts(self, version):
+        groups = (InventoryRollup.objects.order_by().values_list('subscription_id')
+                  .annotate(total=Sum('vm_count')).filter(total__gt=0))
+        subscriptions = {str(subscription_id or ''): total for subscription_id, total in groups}
+        return Event('counts', {'total': sum(subscriptions.values()), 'subscriptions': subscriptions},
+                     0, version, 'inventory.view_virtualmachine')
+
+    def read(self, cursor):
+        """
+        Returns the events after a cursor (a tuple of versions, None for
+        the current position) and the cursor after them.
+        """
+        feed_cursor, floor, events = self.state
+        if cursor is None:
+            return [], feed_cursor
+        if any(position < oldest for position, oldest in zip(cursor, floor)):
+            return [Event('reset', {}, 0, feed_cursor[0], None)], feed_cursor
+        events = [event for event in events if event.version > cursor[event.index]]
+        return events, tuple(max(pair) for pair in zip(cursor, feed_cursor))
+
+    async def aread(self, cursor):
+        """Async version of read(), polling the change log first if it is due."""
+        if self._stale():
+            await sync_to_async(self.update)()
+        return self.read(cursor)
+
+
+feed = ChangeFeed()
+
+
+class _Stream:
+    """The state of one stream, shared by stream() and astream()."""
+
+    def __init__(self, permissions, cursor):
+        self.permissions = permissions
+        self.cursor = cursor
+        self.poll = getattr(settings, 'CIELO_EVENTS_POLL_SECONDS', 2)
+        self.heartbeat = getattr(settings, 'CIELO_EVENTS_HEARTBEAT_SECONDS', 15)
+        self.duration = getattr(settings, 'CIELO_EVENTS_STREAM_SECONDS', 300)
+        self.started = self.last_sent = time.monotonic()
+        self.finished = False
+
+    def chunk(self, events, cursor):
+        """Returns the text to send for events read up to cursor ('' for nothing)."""
+        chunk = ''.join(event.encode() for event in events
+                        if event.permission is None or event.permission in self.permissions)
+        if cursor != self.cursor:
+            # An ID without data moves the client's Last-Event-ID without
+            # dispatching an event, also past events the user may not see.
+            chunk += f'id: {encode_cursor(list(cursor))}\n\n'
+        self.cursor = cursor
+        now = time.monotonic()
+        if not chunk and now - self.last_sent >= self.heartbeat:
+            chunk = ': keepalive\n\n'
+        if chunk:
+            self.last_sent = now
+        self.finished = now - self.started >= self.duration
+        return chunk
+
+
+def stream(permissions, cursor):
+    """
+    Yields the server-sent events for a user with the given permissions,
+    starting after cursor, for CIELO_EVENTS_STREAM_SECONDS; EventSource then
+    reconnects, which also picks up changed permissions. For WSGI, where it
+    holds a worker thread while it runs.
+    """
+    state = _Stream(permissions, cursor)
+    yield f'retry: {RETRY_MILLISECONDS}\n\n'
+    while True:
+        feed.update()
+        chunk = state.chunk(*feed.read(state.cursor))
+        if chunk:
+            yield chunk
+        if state.finished:
+            return
+        time.sleep(state.poll)
+
+
+async def astream(permissions, cursor):
+    """Async version of stream(), for ASGI."""
+    state = _Stream(permissions, cursor)
+    yield f'retry: {RETRY_MILLISECONDS}\n\n'
+    while True:
+        chunk = state.chunk(*await feed.aread(state.cursor))
+        if chunk:
+            yield chunk
+        if state.finished:
+            return
+        await asyncio.sleep(state.poll)
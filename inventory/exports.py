@@ -0,0 +1,92 @@
+"""
+Streaming exports of the inventory.
+
+Each export is a values_list projection read with QuerySet.iterator(), so
+rows are produced chunk by chunk and memory stays constant regardless of the
+table size. Column names follow the Azure Resource Graph conventions read by
+bulk_import, so an export can be fed back into import_inventory.
+"""
+from .bulk_import import STORAGE_ACCOUNT_TYPE, VIRTUAL_MACHINE_TYPE
+from .models import AzureSubscription, StorageAccount, VirtualMachine
+import csv
+import json
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+CHUNK_SIZE = 2000
+
+
+class Export:
+    """An exportable model: its (column, field) projection and resource type."""
+
+    def __init__(self, model, permission, columns, resource_type=None):
+        self.model = model
+        self.permission = permission
+        self.columns = columns
+        self.resource_type = resource_type
+
+    @property
+    def headers(self):
+        headers = [column for column, _field in self.columns]
+        return ['type'] + headers if self.resource_type else headers
+
+    def queryset(self):
+        # Ordered by pk, the cheapest stable order for a full scan.
+        return self.model.objects.order_by('pk').values_list(*(field for _column, field in self.columns))
+
+    def rows(self, queryset, chunk_size=CHUNK_SIZE):
+        for values in queryset.iterator(chunk_size=chunk_size):
+            yield [self.resource_type, *values] if self.resource_type else list(values)
+
+
+EXPORTS = {
+    'virtual-machines': Export(
+        VirtualMachine,
+        'inventory.view_virtualmachine',
+        [('id', 'resource_id'), ('name', 'name'), ('location', 'location'), ('environment', 'environment'),
+         ('resourceGroup', 'resource_group'), ('subscriptionId', 'subscription__subscription_id')],
+        resource_type=VIRTUAL_MACHINE_TYPE,
+    ),
+    'storage-accounts': Export(
+        StorageAccount,
+        'inventory.view_storageaccount',
+        [('id', 'resource_id'), ('name', 'name'), ('location', 'location'), ('sku', 'sku'),
+         ('accessTier', 'access_tier'), ('subscriptionId', 'subscription__subscription_id')],
+        resource_type=STORAGE_ACCOUNT_TYPE,
+    ),
+    'subscriptions': Export(
+        AzureSubscription,
+        'inventory.view_azuresubscription',
+        [('subscriptionId', 'subscription_id'), ('name', 'name')],
+    ),
+}
+
+
+class _Echo:
+    """A file-like object whose write() returns the value instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def ndjson_lines(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), separators=(',', ':')) + '\n'
+
+
+def csv_lines(headers, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+def stream(export, queryset, fmt, chunk_size=CHUNK_SIZE):
+    """Yields the encoded lines of an export in the given format."""
+    rows = export.rows(queryset, chunk_size=chunk_size)
+    if fmt == 'csv':
+        return csv_lines(export.headers, rows)
+    return ndjson_lines(export.headers, rows)
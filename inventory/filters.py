@@ -0,0 +1,131 @@
+"""
+Server-side filtering and sorting of inventory listings.
+
+Filters and sort orders map onto the composite indexes declared on
+VirtualMachine.Meta.indexes: each filter column leads an index that
+continues with (name, id), so a filtered listing sorted by name, and a listing
+sorted by that column, are both served by an index range scan. The resource
+group filter is used together with the subscription filter, matching the
+(subscription, resource_group, name, id) index. The tag selector filter is
+answered from the tags' inverted index (see inventory.tags).
+"""
+from django.utils.http import urlencode
+from django.utils.translation import gettext_lazy as _
+from .tags import filter_queryset as filter_by_tags
+
+# Upper bound for prefix ranges; sorts after any character a name can contain.
+PREFIX_UPPER_BOUND = '\U0010ffff'
+
+VIRTUAL_MACHINE_FILTERS = ('subscription', 'resource_group', 'location', 'environment', 'name', 'selector')
+
+VIRTUAL_MACHINE_SORTS = {
+    'name': ('name',),
+    'location': ('location', 'name'),
+    'environment': ('environment', 'name'),
+}
+VIRTUAL_MACHINE_SORT_LABELS = {
+    'name': _('Name'),
+    'location': _('Location'),
+    'environment': _('Environment'),
+}
+DEFAULT_VIRTUAL_MACHINE_SORT = 'name'
+
+
+def get_virtual_machine_filters(params):
+    """Returns the non-empty VM listing filters found in a QueryDict."""
+    filters = {}
+    for key in VIRTUAL_MACHINE_FILTERS:
+        value = params.get(key, '').strip()
+        if not value:
+            continue
+        if key == 'subscription' and not value.isdigit():
+            continue
+        filters[key] = value
+    return filters
+
+
+def filter_virtual_machines(queryset, filters):
+    """
+    Applies filters from get_virtual_machine_filters to a VirtualMachine
+    queryset. The name filter is a case-sensitive prefix match expressed as
+    a range, which (unlike LIKE) every backend can answer from an index.
+    An invalid tag selector raises inventory.tags.SelectorError.
+    """
+    if 'subscription' in filters:
+        queryset = queryset.filter(subscription_id=int(filters['subscription']))
+    if 'resource_group' in filters:
+        queryset = queryset.filter(resource_group=filters['resource_group'])
+    if 'location' in filters:
+        queryset = queryset.filter(location=filters['location'])
+    if 'environment' in filters:
+        queryset = queryset.filter(environment=filters['environment'])
+    if 'name' in filters:
+        prefix = filters['name']
+        queryset = queryset.filter(name__gte=prefix, name__lt=prefix + PREFIX_UPPER_BOUND)
+    if 'selector' in filters:
+        queryset = filter_by_tags(queryset, filters['selector'])
+    return queryset
+
+
+RESOURCE_FILTERS = ('subscription', 'location', 'name', 'selector')
+
+
+def get_resource_filters(resource_type, params):
+    """
+    Returns the non-empty listing filters of a CloudResource type found in a
+    QueryDict: the common ones plus its indexed attributes.
+    """
+    filters = {}
+    for key in (*RESOURCE_FILTERS, *resource_type.columns):
+        value = params.get(key, '').strip()
+        if not value or (key == 'subscription' and not value.isdigit()):
+            continue
+        filters[key] = value
+    return filters
+
+
+def filter_resources(resource_type, queryset, filters):
+    """
+    Applies filters from get_resource_filters to a queryset of the type's
+    resources. Every filter column has an index on (type, column, name, id).
+    """
+    if 'subscription' in filters:
+        queryset = queryset.filter(subscription_id=int(filters['subscription']))
+    if 'location' in filters:
+        queryset = queryset.filter(location=filters['location'])
+    for name in resource_type.columns:
+        if name in filters:
+            queryset = resource_type.filter(queryset, name, filters[name])
+    if 'name' in filters:
+        prefix = filters['name']
+        queryset = queryset.filter(name__gte=prefix, name__lt=prefix + PREFIX_UPPER_BOUND)
+    if 'selector' in filters:
+        queryset = filter_by_tags(queryset, filters['selector'])
+    return queryset
+
+
+def get_virtual_machine_sort(params):
+    """Returns (sort key, ordering for KeysetPaginator) from a QueryDict."""
+    sort = params.get('sort', DEFAULT_VIRTUAL_MACHINE_SORT)
+    column = sort.lstrip('-')
+    if column not in VIRTUAL_MACHINE_SORTS:
+        sort = column = DEFAULT_VIRTUAL_MACHINE_SORT
+    descending = sort.startswith('-')
+    ordering = tuple(f'-{field}' if descending else field for field in VIRTUAL_MACHINE_SORTS[column])
+    return sort, ordering
+
+
+def get_sort_columns(filters, sort):
+    """Describes the sortable column headers, each linking to its toggled order."""
+    columns = {}
+    for column, label in VIRTUAL_MACHINE_SORT_LABELS.items():
+        active = sort.lstrip('-') == column
+        descending = active and sort.startswith('-')
+        next_sort = column if descending or not active else f'-{column}'
+        columns[column] = {
+            'label': label,
+            'active': active,
+            'descending': descending,
+            'query': urlencode({**filters, 'sort': next_sort}),
+        }
+    return columns
@@ -0,0 +1,75 @@
+"""
+Background jobs of the inventory app (registered in InventoryConfig.cielo_jobs,
+run by the run_jobs worker; see common.jobs).
+"""
+from .bulk_import import VIRTUAL_MACHINE_TYPE, InventoryImporter, detect_format, read_rows
+from .models import AzureSubscription
+from .sync import AzureInventoryClient, InventorySyncEngine, SyncError
+import io
+import os
+
+
+def import_inventory(job, path, format=None, batch_size=1000, default_type=VIRTUAL_MACHINE_TYPE,
+                     create_subscriptions=True, delete_file=False):
+    """
+    Imports an export file like the import_inventory command. Progress is
+    reported in bytes read. With delete_file the file (e.g. an upload) is
+    removed once the import succeeded.
+    """
+    fmt = format or detect_format(path)
+    size = os.path.getsize(path)
+    with open(path, 'rb') as raw:
+        importer = InventoryImporter(
+            batch_size=batch_size,
+            create_subscriptions=create_subscriptions,
+            default_type=default_type,
+            progress=lambda stats: job.progress(raw.tell(), size, f'{stats.rows} rows imported'),
+        )
+        stats = importer.run(read_rows(io.TextIOWrapper(raw, encoding='utf-8', newline=''), fmt))
+    job.progress(size, size, f'{stats.rows} rows imported')
+    if delete_file:
+        os.remove(path)
+    return {
+        'rows': stats.rows,
+        'virtual_machines': stats.virtual_machines,
+        'storage_accounts': stats.storage_accounts,
+        'resources': stats.resources,
+        'subscriptions_created': stats.subscriptions_created,
+        'skipped': stats.skipped,
+        'duration': round(stats.duration, 3),
+    }
+
+
+def sync_inventory(job, subscription_ids=None, full=False, concurrency=None, base_url=None):
+    """
+    Syncs all (or the given) subscriptions like the sync_inventory command.
+    Progress is reported in subscriptions. Fails, and so is retried, only
+    when every subscription failed; partial failures are in the result.
+    """
+    subscriptions = AzureSubscription.objects.all()
+    if subscription_ids:
+        subscriptions = subscriptions.filter(subscription_id__in=subscription_ids)
+    subscriptions = list(subscriptions)
+    finished = []
+
+    def progress(result):
+        finished.append(result)
+        job.progress(len(finished), len(subscriptions), f'Synced {result.subscription.name}')
+
+    engine = InventorySyncEngine(
+        client=AzureInventoryClient(base_url=base_url),
+        concurrency=concurrency,
+        full=full,
+        progress=progress,
+    )
+    job.progress(0, len(subscriptions), f'Syncing {len(subscriptions)} subscriptions')
+    results = engine.run(subscriptions)
+    errors = {result.subscription.subscription_id: result.error for result in results if result.error}
+    if results and len(errors) == len(results):
+        raise SyncError(f'All {len(results)} subscriptions failed to sync; first error: {results[0].error}')
+    return {
+        'subscriptions': len(results),
+        'not_modified': sum(1 for result in results if result.not_modified),
+        'changed': sum(result.changed for result in results),
+        'errors': errors,
+    }
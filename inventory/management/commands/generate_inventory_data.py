@@ -0,0 +1,95 @@
+from django.core.management.base import BaseCommand, CommandError
+from common.navigation import registry as navigation_registry
+from inventory import search, versions
+from inventory.bulk_import import STORAGE_ACCOUNT_TYPE, VIRTUAL_MACHINE_TYPE, InventoryImporter
+from inventory.models import AzureSubscription
+import random
+import uuid
+
+class Command(BaseCommand):
+    help = 'Generates a reproducible synthetic inventory (subscriptions, VMs and storage accounts) for scale testing.'
+
+    SIZES = {
+        'small': 1_000,
+        'medium': 100_000,
+        'large': 1_000_000,
+    }
+
+    LOCATIONS = [
+        'eastus', 'eastus2', 'westus', 'westus2', 'centralus', 'northeurope',
+        'westeurope', 'uksouth', 'southeastasia', 'australiaeast',
+    ]
+    ENVIRONMENTS = ['Production', 'Development', 'UAT', 'Test', 'Staging']
+    ROLES = ['web', 'app', 'db', 'cache', 'worker', 'batch', 'jumphost', 'tools']
+    SKUS = ['Standard_LRS', 'Standard_GRS', 'Standard_ZRS', 'Premium_LRS']
+    ACCESS_TIERS = ['Hot', 'Cool']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', choices=sorted(self.SIZES), default='small',
+                            help='Preset number of virtual machines (small=1k, medium=100k, large=1M).')
+        parser.add_argument('--vms', type=int, help='Number of virtual machines. Overrides --size.')
+        parser.add_argument('--subscriptions', type=int, default=10, help='Number of subscriptions to spread resources over.')
+        parser.add_argument('--storage-accounts', type=int, help='Number of storage accounts. Defaults to a tenth of the VMs.')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed; the same seed always yields the same dataset.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of rows written per transaction.')
+
+    def generate_subscriptions(self, rng, count):
+        subscriptions = []
+        for i in range(count):
+            subscription_id = str(uuid.UUID(int=rng.getrandbits(128)))
+            subscriptions.append(AzureSubscription(name=f'Synthetic Subscription {i + 1:04d}', subscription_id=subscription_id))
+        return subscriptions
+
+    def generate_rows(self, rng, subscription_ids, vm_count, storage_count):
+        """Yields Azure Resource Graph style rows, suitable for InventoryImporter."""
+        for i in range(vm_count):
+            subscription_id = rng.choice(subscription_ids)
+            environment = rng.choice(self.ENVIRONMENTS)
+            name = f'{environment[:4].lower()}-{rng.choice(self.ROLES)}-{i:07d}'
+            yield {
+                'id': f'/subscriptions/{subscription_id}/resourceGroups/rg-{environment.lower()}'
+                      f'/providers/Microsoft.Compute/virtualMachines/{name}',
+                'name': name,
+                'type': VIRTUAL_MACHINE_TYPE,
+                'location': rng.choice(self.LOCATIONS),
+                'subscriptionId': subscription_id,
+                'tags': {'environment': environment},
+            }
+        for i in range(storage_count):
+            subscription_id = rng.choice(subscription_ids)
+            name = f'stsynthetic{i:07d}'
+            yield {
+                'id': f'/subscriptions/{subscription_id}/resourceGroups/rg-storage'
+                      f'/providers/Microsoft.Storage/storageAccounts/{name}',
+                'name': name,
+                'type': STORAGE_ACCOUNT_TYPE,
+                'location': rng.choice(self.LOCATIONS),
+                'subscriptionId': subscription_id,
+                'sku': {'name': rng.choice(self.SKUS)},
+                'properties': {'accessTier': rng.choice(self.ACCESS_TIERS)},
+            }
+
+    def handle(self, *args, **options):
+        vm_count = options['vms'] if options['vms'] is not None else self.SIZES[options['size']]
+        storage_count = options['storage_accounts'] if options['storage_accounts'] is not None else vm_count // 10
+        if options['subscriptions'] < 1:
+            raise CommandError('--subscriptions must be a positive integer.')
+
+        rng = random.Random(options['seed'])
+        self.stdout.write(self.style.NOTICE(
+            f'Generating {options["subscriptions"]} subscriptions, {vm_count} VMs and '
+            f'{storage_count} storage accounts (seed {options["seed"]})...'
+        ))
+        subscriptions = self.generate_subscriptions(rng, options['subscriptions'])
+        AzureSubscription.objects.bulk_create(subscriptions, ignore_conflicts=True)
+        search.index_queryset(AzureSubscription.objects.filter(
+            subscription_id__in=[sub.subscription_id for sub in subscriptions]))
+        versions.bump(AzureSubscription)
+        navigation_registry.invalidate()
+
+        importer = InventoryImporter(batch_size=options['batch_size'], create_subscriptions=False)
+        subscription_ids = [sub.subscription_id for sub in subscriptions]
+        stats = importer.run(self.generate_rows(rng, subscription_ids, vm_count, storage_count))
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {stats.rows} rows in {stats.duration:.2f}s ({stats.rows_per_second:.0f} rows/sec).'
+        ))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from inventory import rollups
+
+class Command(BaseCommand):
+    help = 'Recomputes the inventory rollup table (VM counts per subscription, location and environment) from scratch.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.NOTICE('Rebuilding inventory rollups...'))
+        groups = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {groups} rollup groups.'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from inventory import resources
+
+class Command(BaseCommand):
+    help = 'Refills the indexed attribute columns of generic cloud resources from their attributes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slugs', nargs='*', help='Resource types to rebuild (all registered types by default).')
+
+    def handle(self, *args, **options):
+        resource_types = list(resources.registry)
+        if options['slugs']:
+            resource_types = [resources.registry.by_slug(slug) for slug in options['slugs']]
+            unknown = [slug for slug, resource_type in zip(options['slugs'], resource_types) if resource_type is None]
+            if unknown:
+                raise CommandError(f"Unknown resource types: {', '.join(unknown)}")
+        for resource_type in resource_types:
+            self.stdout.write(self.style.NOTICE(f'Rebuilding indexed attributes of {resource_type.type}...'))
+            rows = resources.rebuild_indexes(resource_type)
+            self.stdout.write(self.style.SUCCESS(f'Updated {rows} {resource_type.slug}.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from inventory import search
+
+class Command(BaseCommand):
+    help = 'Recreates the full-text search index of inventory names from scratch.'
+
+    def handle(self, *args, **options):
+        if not search.fts_enabled():
+            self.stdout.write(self.style.WARNING('The full-text index is only maintained on SQLite; nothing to rebuild.'))
+            return
+        self.stdout.write(self.style.NOTICE('Rebuilding inventory search index...'))
+        entries = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {entries} inventory objects.'))
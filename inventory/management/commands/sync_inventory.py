@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+from inventory.models import AzureSubscription
+from inventory.sync import AzureInventoryClient, InventorySyncEngine
+import time
+
+class Command(BaseCommand):
+    help = 'Syncs virtual machines of all (or the given) Azure subscriptions concurrently, applying only the changes since the last sync.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('subscription_ids', nargs='*', help='Azure subscription GUIDs to sync. Defaults to all subscriptions.')
+        parser.add_argument('--concurrency', type=int, help='Maximum number of subscriptions synced at the same time.')
+        parser.add_argument('--full', action='store_true', help='Ignore stored ETags and delta links and reconcile every subscription completely.')
+        parser.add_argument('--base-url', help='Azure Resource Manager endpoint, e.g. a local stub server.')
+
+    def handle(self, *args, **options):
+        subscriptions = AzureSubscription.objects.all()
+        if options['subscription_ids']:
+            subscriptions = subscriptions.filter(subscription_id__in=options['subscription_ids'])
+        subscriptions = list(subscriptions)
+        if not subscriptions:
+            raise CommandError('No matching subscriptions to sync.')
+
+        engine = InventorySyncEngine(
+            client=AzureInventoryClient(base_url=options['base_url']),
+            concurrency=options['concurrency'],
+            full=options['full'],
+        )
+        self.stdout.write(self.style.NOTICE(f'Syncing {len(subscriptions)} subscriptions (concurrency {engine.concurrency})...'))
+        started = time.monotonic()
+        results = engine.run(subscriptions)
+
+        for result in results:
+            label = f'  {result.subscription.name} ({result.duration:.2f}s): '
+            if result.error:
+                self.stdout.write(self.style.ERROR(label + result.error))
+            elif result.not_modified:
+                self.stdout.write(label + 'not modified')
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    label + f'{result.created} created, {result.updated} updated, {result.deleted} deleted'))
+
+        failed = sum(1 for result in results if result.error)
+        changed = sum(result.changed for result in results)
+        style = self.style.WARNING if failed else self.style.SUCCESS
+        self.stdout.write(style(
+            f'Synced {len(results) - failed}/{len(results)} subscriptions in {time.monotonic() - started:.2f}s, '
+            f'{changed} rows changed.'
+        ))
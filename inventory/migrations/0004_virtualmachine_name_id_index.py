@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_virtualmachine_subscription'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='virtualmachine',
+            index=models.Index(fields=['name', 'id'], name='inventory_vm_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_virtualmachine_name_id_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storageaccount',
+            name='resource_id',
+            field=models.CharField(blank=True, help_text='The full Azure resource ID, used as the natural key for imports.', max_length=512, null=True, unique=True, verbose_name='Azure Resource ID'),
+        ),
+        migrations.AddField(
+            model_name='storageaccount',
+            name='subscription',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='storage_accounts', to='inventory.azuresubscription'),
+        ),
+        migrations.AddField(
+            model_name='virtualmachine',
+            name='resource_id',
+            field=models.CharField(blank=True, help_text='The full Azure resource ID, used as the natural key for imports.', max_length=512, null=True, unique=True, verbose_name='Azure Resource ID'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_resource_ids'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SubscriptionSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('etag', models.CharField(blank=True, help_text='ETag of the last full listing, sent as If-None-Match.', max_length=255, verbose_name='ETag')),
+                ('delta_link', models.TextField(blank=True, help_text='Cursor returned by the API to fetch only changes since the last sync.', verbose_name='Delta Link')),
+                ('last_synced_at', models.DateTimeField(blank=True, null=True, verbose_name='Last Synced At')),
+                ('last_duration', models.FloatField(blank=True, null=True, verbose_name='Last Duration (s)')),
+                ('last_changed_rows', models.PositiveIntegerField(default=0, verbose_name='Rows Changed In Last Sync')),
+                ('last_error', models.TextField(blank=True, verbose_name='Last Error')),
+                ('subscription', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sync_state', to='inventory.azuresubscription')),
+            ],
+            options={
+                'verbose_name': 'Subscription Sync State',
+                'verbose_name_plural': 'Subscription Sync States',
+            },
+        ),
+    ]
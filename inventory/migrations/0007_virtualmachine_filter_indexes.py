@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_subscriptionsyncstate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='virtualmachine',
+            index=models.Index(fields=['subscription', 'name', 'id'], name='inventory_vm_sub_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='virtualmachine',
+            index=models.Index(fields=['location', 'name', 'id'], name='inventory_vm_location_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='virtualmachine',
+            index=models.Index(fields=['environment', 'name', 'id'], name='inventory_vm_env_name_idx'),
+        ),
+    ]
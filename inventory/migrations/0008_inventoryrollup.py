@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_virtualmachine_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('location', models.CharField(blank=True, max_length=100, verbose_name='Location')),
+                ('environment', models.CharField(blank=True, max_length=50, verbose_name='Environment')),
+                ('vm_count', models.PositiveIntegerField(default=0, verbose_name='Virtual Machines')),
+                ('subscription', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='inventory.azuresubscription')),
+            ],
+            options={
+                'verbose_name': 'Inventory Rollup',
+                'verbose_name_plural': 'Inventory Rollups',
+                'constraints': [models.UniqueConstraint(fields=('subscription', 'location', 'environment'), name='inventory_rollup_group_unique'), models.UniqueConstraint(condition=models.Q(('subscription__isnull', True)), fields=('location', 'environment'), name='inventory_rollup_unassigned_group_unique')],
+            },
+        ),
+    ]
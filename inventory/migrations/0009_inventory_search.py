@@ -0,0 +1,40 @@
+from django.db import migrations
+
+# The search index is an FTS5 table on SQLite only; on other backends
+# inventory.search falls back to substring matching and no table is created.
+# rowid = pk * 4 + kind code (1 virtual machine, 2 storage account,
+# 3 subscription), see inventory/search.py.
+
+CREATE_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS inventory_search USING fts5(name, details);
+INSERT INTO inventory_search (rowid, name, details)
+    SELECT id * 4 + 1, name, location || ' ' || environment FROM inventory_virtualmachine;
+INSERT INTO inventory_search (rowid, name, details)
+    SELECT id * 4 + 2, name, location || ' ' || sku || ' ' || access_tier FROM inventory_storageaccount;
+INSERT INTO inventory_search (rowid, name, details)
+    SELECT id * 4 + 3, name, subscription_id FROM inventory_azuresubscription;
+"""
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in filter(str.strip, CREATE_SQL.split(';')):
+            cursor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS inventory_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_inventoryrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
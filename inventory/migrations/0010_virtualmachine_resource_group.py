@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:39
+
+from django.db import migrations, models
+import re
+
+RESOURCE_GROUP_PATTERN = re.compile(r'/resourcegroups/([^/]+)', re.IGNORECASE)
+
+
+def populate_resource_groups(apps, schema_editor):
+    VirtualMachine = apps.get_model('inventory', 'VirtualMachine')
+    db_alias = schema_editor.connection.alias
+    batch = []
+    for vm in VirtualMachine.objects.using(db_alias).filter(resource_id__isnull=False).only('pk', 'resource_id').iterator(chunk_size=2000):
+        match = RESOURCE_GROUP_PATTERN.search(vm.resource_id)
+        if match:
+            vm.resource_group = match.group(1).lower()
+            batch.append(vm)
+        if len(batch) >= 2000:
+            VirtualMachine.objects.using(db_alias).bulk_update(batch, ['resource_group'])
+            batch = []
+    VirtualMachine.objects.using(db_alias).bulk_update(batch, ['resource_group'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0009_inventory_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='virtualmachine',
+            name='resource_group',
+            field=models.CharField(blank=True, max_length=90, verbose_name='Resource Group'),
+        ),
+        migrations.AddIndex(
+            model_name='virtualmachine',
+            index=models.Index(fields=['subscription', 'resource_group', 'name', 'id'], name='inventory_vm_sub_rg_name_idx'),
+        ),
+        migrations.RunPython(populate_resource_groups, migrations.RunPython.noop),
+    ]
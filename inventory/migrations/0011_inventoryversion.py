@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+VERSIONED_MODELS = ['inventory.virtualmachine', 'inventory.storageaccount', 'inventory.azuresubscription']
+
+
+def create_versions(apps, schema_editor):
+    InventoryVersion = apps.get_model('inventory', 'InventoryVersion')
+    InventoryVersion.objects.using(schema_editor.connection.alias).bulk_create([InventoryVersion(model=label) for label in VERSIONED_MODELS])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_virtualmachine_resource_group'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryVersion',
+            fields=[
+                ('model', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Model')),
+                ('version', models.PositiveBigIntegerField(default=1, verbose_name='Version')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Changed At')),
+            ],
+            options={
+                'verbose_name': 'Inventory Version',
+                'verbose_name_plural': 'Inventory Versions',
+            },
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:15
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_inventoryversion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='virtualmachine',
+            name='change_version',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, editable=False, verbose_name='Change Version'),
+        ),
+        migrations.CreateModel(
+            name='InventoryTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='Model')),
+                ('object_id', models.BigIntegerField(verbose_name='Object ID')),
+                ('version', models.PositiveBigIntegerField(verbose_name='Version')),
+                ('deleted_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Deleted At')),
+            ],
+            options={
+                'verbose_name': 'Inventory Tombstone',
+                'verbose_name_plural': 'Inventory Tombstones',
+                'indexes': [models.Index(fields=['model', 'version'], name='inventory_tombstone_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_change_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model', models.CharField(max_length=100, verbose_name='Model')),
+                ('object_id', models.BigIntegerField(verbose_name='Object ID')),
+                ('key', models.CharField(max_length=512, verbose_name='Key')),
+                ('value', models.CharField(blank=True, max_length=256, verbose_name='Value')),
+            ],
+            options={
+                'verbose_name': 'Resource Tag',
+                'verbose_name_plural': 'Resource Tags',
+                'indexes': [models.Index(fields=['model', 'key', 'value', 'object_id'], name='inventory_tag_inverted_idx')],
+                'constraints': [models.UniqueConstraint(fields=('model', 'object_id', 'key'), name='inventory_resourcetag_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_resourcetag'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CloudResource',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(help_text='The lower-cased Azure resource type, e.g. microsoft.network/virtualnetworks.', max_length=100, verbose_name='Type')),
+                ('name', models.CharField(max_length=255, verbose_name='Name')),
+                ('resource_id', models.CharField(max_length=512, unique=True, verbose_name='Azure Resource ID')),
+                ('location', models.CharField(blank=True, max_length=100, verbose_name='Location')),
+                ('attributes', models.JSONField(blank=True, default=dict, verbose_name='Attributes')),
+                ('indexed_1', models.CharField(blank=True, editable=False, max_length=255)),
+                ('indexed_2', models.CharField(blank=True, editable=False, max_length=255)),
+                ('indexed_3', models.CharField(blank=True, editable=False, max_length=255)),
+            ],
+            options={
+                'verbose_name': 'Cloud Resource',
+                'verbose_name_plural': 'Cloud Resources',
+            },
+        ),
+        migrations.AddField(
+            model_name='cloudresource',
+            name='subscription',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='resources', to='inventory.azuresubscription'),
+        ),
+        migrations.AddIndex(
+            model_name='cloudresource',
+            index=models.Index(fields=['type', 'name', 'id'], name='inventory_res_type_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cloudresource',
+            index=models.Index(fields=['subscription', 'type', 'name', 'id'], name='inventory_res_sub_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cloudresource',
+            index=models.Index(fields=['type', 'location', 'name', 'id'], name='inventory_res_location_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cloudresource',
+            index=models.Index(fields=['type', 'indexed_1', 'name', 'id'], name='inventory_res_indexed_1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cloudresource',
+            index=models.Index(fields=['type', 'indexed_2', 'name', 'id'], name='inventory_res_indexed_2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cloudresource',
+            index=models.Index(fields=['type', 'indexed_3', 'name', 'id'], name='inventory_res_indexed_3_idx'),
+        ),
+    ]
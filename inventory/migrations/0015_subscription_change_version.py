@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0014_cloudresource'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='azuresubscription',
+            name='change_version',
+            field=models.PositiveBigIntegerField(db_index=True, default=0, editable=False, verbose_name='Change Version'),
+        ),
+    ]
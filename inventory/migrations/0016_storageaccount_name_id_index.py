@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0015_subscription_change_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='storageaccount',
+            index=models.Index(fields=['name', 'id'], name='inventory_sa_name_id_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 class VirtualMachine(models.Model):
@@ -6,26 +7,56 @@ class VirtualMachine(models.Model):
     location = models.CharField(_("Location"), max_length=100, blank=True)
     environment = models.CharField(_("Environment"), max_length=50, blank=True)
     subscription = models.ForeignKey('AzureSubscription', on_delete=models.SET_NULL, related_name='virtual_machines', null=True, blank=True)
+    resource_id = models.CharField(_("Azure Resource ID"), max_length=512, unique=True, null=True, blank=True, help_text="The full Azure resource ID, used as the natural key for imports.")
+    resource_group = models.CharField(_("Resource Group"), max_length=90, blank=True)
+    # The inventory version of the row's last write, so readers can fetch
+    # just what changed since a version they saw (see inventory.versions).
+    change_version = models.PositiveBigIntegerField(_("Change Version"), default=0, db_index=True, editable=False)
     # Add other relevant fields like OS, size, IP address, status, etc.
 
     class Meta:
         verbose_name = _("Virtual Machine")
         verbose_name_plural = _("Virtual Machines")
         # Django automatically creates view_virtualmachine, add_virtualmachine, etc.
+        indexes = [
+            # Keyset pagination of the VM listing walks (name, id)
+            models.Index(fields=['name', 'id'], name='inventory_vm_name_id_idx'),
+            # Listing filters (see inventory.filters): each filter column is
+            # followed by the default (name, id) sort order.
+            models.Index(fields=['subscription', 'name', 'id'], name='inventory_vm_sub_name_idx'),
+            models.Index(fields=['location', 'name', 'id'], name='inventory_vm_location_name_idx'),
+            models.Index(fields=['environment', 'name', 'id'], name='inventory_vm_env_name_idx'),
+            # Navigation tree: resource groups of a subscription, then their VMs
+            models.Index(fields=['subscription', 'resource_group', 'name', 'id'], name='inventory_vm_sub_rg_name_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the rollup group the row was loaded in, so saves and deletes
+        # can move it between InventoryRollup rows (see inventory.rollups).
+        loaded = dict(zip(field_names, values))
+        if all(field in loaded for field in ('subscription_id', 'location', 'environment')):
+            instance._loaded_rollup_key = (loaded['subscription_id'], loaded['location'], loaded['environment'])
+        return instance
+
 class StorageAccount(models.Model):
     name = models.CharField(_("Name"), max_length=255)
     location = models.CharField(_("Location"), max_length=100, blank=True)
     sku = models.CharField(_("SKU"), max_length=50, blank=True)
     access_tier = models.CharField(_("Access Tier"), max_length=50, blank=True)
+    subscription = models.ForeignKey('AzureSubscription', on_delete=models.SET_NULL, related_name='storage_accounts', null=True, blank=True)
+    resource_id = models.CharField(_("Azure Resource ID"), max_length=512, unique=True, null=True, blank=True, help_text="The full Azure resource ID, used as the natural key for imports.")
     # Add other relevant fields like kind, replication, creation_date, etc.
 
     class Meta:
         verbose_name = _("Storage Account")
         verbose_name_plural = _("Storage Accounts")
+        # Keyset pagination of the storage account listing walks (name, id)
+        indexes = [models.Index(fields=['name', 'id'], name='inventory_sa_name_id_idx')]
 
     def __str__(self):
         return self.name
@@ -33,6 +64,8 @@ class StorageAccount(models.Model):
 class AzureSubscription(models.Model):
     name = models.CharField(_("Subscription Name"), max_length=255)
     subscription_id = models.CharField(_("Azure Subscription ID"), max_length=36, unique=True, help_text="The unique GUID for the Azure Subscription.")
+    # See VirtualMachine.change_version
+    change_version = models.PositiveBigIntegerField(_("Change Version"), default=0, db_index=True, editable=False)
     # tenant_id = models.CharField(_("Azure Tenant ID"), max_length=36, blank=True, help_text="Optional: The AAD Tenant ID.")
 
     class Meta:
@@ -41,4 +74,179 @@ class AzureSubscription(models.Model):
         ordering = ['name']
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+
+class SubscriptionSyncState(models.Model):
+    """Per-subscription bookkeeping for incremental inventory syncs."""
+    subscription = models.OneToOneField(AzureSubscription, on_delete=models.CASCADE, related_name='sync_state')
+    etag = models.CharField(_("ETag"), max_length=255, blank=True, help_text="ETag of the last full listing, sent as If-None-Match.")
+    delta_link = models.TextField(_("Delta Link"), blank=True, help_text="Cursor returned by the API to fetch only changes since the last sync.")
+    last_synced_at = models.DateTimeField(_("Last Synced At"), null=True, blank=True)
+    last_duration = models.FloatField(_("Last Duration (s)"), null=True, blank=True)
+    last_changed_rows = models.PositiveIntegerField(_("Rows Changed In Last Sync"), default=0)
+    last_error = models.TextField(_("Last Error"), blank=True)
+
+    class Meta:
+        verbose_name = _("Subscription Sync State")
+        verbose_name_plural = _("Subscription Sync States")
+
+    def __str__(self):
+        return f"Sync state of {self.subscription}"
+
+
+class InventoryRollupQuerySet(models.QuerySet):
+    def _groups(self, subscription=None, location=None, environment=None):
+        queryset = self
+        if subscription is not None:
+            queryset = queryset.filter(subscription_id=subscription)
+        if location is not None:
+            queryset = queryset.filter(location=location)
+        if environment is not None:
+            queryset = queryset.filter(environment=environment)
+        return queryset
+
+    def virtual_machine_count(self, subscription=None, location=None, environment=None):
+        """Sums the VM counts of the groups matching the given filters."""
+        groups = self._groups(subscription, location, environment)
+        return groups.aggregate(total=models.Sum('vm_count'))['total'] or 0
+
+    async def avirtual_machine_count(self, subscription=None, location=None, environment=None):
+        """Async version of virtual_machine_count()."""
+        groups = self._groups(subscription, location, environment)
+        return (await groups.aaggregate(total=models.Sum('vm_count')))['total'] or 0
+
+
+class InventoryRollup(models.Model):
+    """
+    Number of virtual machines per (subscription, location, environment).
+
+    Maintained incrementally by inventory.rollups as VMs are created, changed
+    and deleted, so dashboard counters read O(groups) rows instead of
+    scanning the inventory. Rebuild with the rebuild_inventory_rollups command.
+    """
+    subscription = models.ForeignKey(AzureSubscription, on_delete=models.CASCADE, related_name='rollups', null=True, blank=True)
+    location = models.CharField(_("Location"), max_length=100, blank=True)
+    environment = models.CharField(_("Environment"), max_length=50, blank=True)
+    vm_count = models.PositiveIntegerField(_("Virtual Machines"), default=0)
+
+    objects = InventoryRollupQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _("Inventory Rollup")
+        verbose_name_plural = _("Inventory Rollups")
+        constraints = [
+            models.UniqueConstraint(fields=['subscription', 'location', 'environment'], name='inventory_rollup_group_unique'),
+            models.UniqueConstraint(fields=['location', 'environment'], condition=models.Q(subscription__isnull=True),
+                                    name='inventory_rollup_unassigned_group_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.subscription or '-'} / {self.location or '-'} / {self.environment or '-'}: {self.vm_count}"
+
+
+class InventoryVersion(models.Model):
+    """
+    Change counter of an inventory model, keyed on its label (e.g.
+    'inventory.virtualmachine').
+
+    Bumped by inventory.versions in the same transaction as every write to
+    the model, so inventory pages can derive their ETag from the counters and
+    answer unchanged reloads with 304 Not Modified without querying the
+    inventory tables.
+    """
+    model = models.CharField(_("Model"), max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(_("Version"), default=1)
+    changed_at = models.DateTimeField(_("Changed At"), default=timezone.now)
+
+    class Meta:
+        verbose_name = _("Inventory Version")
+        verbose_name_plural = _("Inventory Versions")
+
+    def __str__(self):
+        return f"{self.model} v{self.version}"
+
+
+class InventoryTombstone(models.Model):
+    """
+    A deleted row of a model whose rows carry a change_version, so readers
+    that fetch changes since a version also learn about deletions. Pruned
+    after CIELO_INVENTORY_TOMBSTONE_RETENTION seconds.
+    """
+    model = models.CharField(_("Model"), max_length=100)
+    object_id = models.BigIntegerField(_("Object ID"))
+    version = models.PositiveBigIntegerField(_("Version"))
+    deleted_at = models.DateTimeField(_("Deleted At"), default=timezone.now, db_index=True)
+
+    class Meta:
+        verbose_name = _("Inventory Tombstone")
+        verbose_name_plural = _("Inventory Tombstones")
+        indexes = [models.Index(fields=['model', 'version'], name='inventory_tombstone_idx')]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} deleted in v{self.version}"
+
+
+class ResourceTag(models.Model):
+    """
+    An Azure tag of an inventory resource, addressed like InventoryTombstone
+    by model label and primary key.
+
+    The (model, key, value, object_id) index is the inverted index that
+    tag selectors are answered from (see inventory.tags). Keys are stored
+    lower-cased, as Azure compares tag names case-insensitively.
+    """
+    model = models.CharField(_("Model"), max_length=100)
+    object_id = models.BigIntegerField(_("Object ID"))
+    key = models.CharField(_("Key"), max_length=512)
+    value = models.CharField(_("Value"), max_length=256, blank=True)
+
+    class Meta:
+        verbose_name = _("Resource Tag")
+        verbose_name_plural = _("Resource Tags")
+        constraints = [
+            models.UniqueConstraint(fields=['model', 'object_id', 'key'], name='inventory_resourcetag_unique'),
+        ]
+        indexes = [models.Index(fields=['model', 'key', 'value', 'object_id'], name='inventory_tag_inverted_idx')]
+
+    def __str__(self):
+        return f"{self.model} #{self.object_id} {self.key}={self.value}"
+
+
+class CloudResource(models.Model):
+    """
+    An Azure resource of a type without a dedicated model, with its
+    properties kept as JSON in attributes.
+
+    Resource types are declared by apps in 'cielo_resource_types' (see
+    inventory.resources), including up to three attributes per type that are
+    copied into the indexed_* columns on save, so listings filter on them
+    through an index. A new resource type needs no migration.
+    """
+    type = models.CharField(_("Type"), max_length=100, help_text="The lower-cased Azure resource type, e.g. microsoft.network/virtualnetworks.")
+    name = models.CharField(_("Name"), max_length=255)
+    subscription = models.ForeignKey(AzureSubscription, on_delete=models.SET_NULL, related_name='resources', null=True, blank=True)
+    resource_id = models.CharField(_("Azure Resource ID"), max_length=512, unique=True)
+    location = models.CharField(_("Location"), max_length=100, blank=True)
+    attributes = models.JSONField(_("Attributes"), default=dict, blank=True)
+    # Promoted attributes: the meaning of each column depends on the type.
+    indexed_1 = models.CharField(max_length=255, blank=True, editable=False)
+    indexed_2 = models.CharField(max_length=255, blank=True, editable=False)
+    indexed_3 = models.CharField(max_length=255, blank=True, editable=False)
+
+    class Meta:
+        verbose_name = _("Cloud Resource")
+        verbose_name_plural = _("Cloud Resources")
+        # Listings of a type are sorted by (name, id); each filter column
+        # comes between the type and that order.
+        indexes = [
+            models.Index(fields=['type', 'name', 'id'], name='inventory_res_type_name_idx'),
+            models.Index(fields=['subscription', 'type', 'name', 'id'], name='inventory_res_sub_type_idx'),
+            models.Index(fields=['type', 'location', 'name', 'id'], name='inventory_res_location_idx'),
+            models.Index(fields=['type', 'indexed_1', 'name', 'id'], name='inventory_res_indexed_1_idx'),
+            models.Index(fields=['type', 'indexed_2', 'name', 'id'], name='inventory_res_indexed_2_idx'),
+            models.Index(fields=['type', 'indexed_3', 'name', 'id'], name='inventory_res_indexed_3_idx'),
+        ]
+
+    def __str__(self):
+        return self.name
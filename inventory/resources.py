@@ -0,0 +1,155 @@
+"""
+Registry of generic resource types stored in CloudResource.
+
+Apps declare resource types in 'cielo_resource_types' on their AppConfig, a
+mapping of the lower-cased Azure resource type to its options:
+
+    cielo_resource_types = {
+        'microsoft.compute/disks': {
+            'slug': 'disks',
+            'label': _("Disks"),
+            'icon_class': 'bi-device-hdd',
+            # Columns shown by the listing: name -> dotted path in the resource
+            'attributes': {'sku': 'sku.name', 'size_gb': 'properties.diskSizeGB'},
+            # Up to INDEXED_SLOTS attributes the listing can filter on
+            'indexed': ['sku'],
+        },
+    }
+
+Indexed attributes are copied into the CloudResource.indexed_* columns when
+a resource is saved (by the pre_save signal, or promote() in bulk writers),
+so filtering on them is an index range scan on (type, indexed_N, name, id).
+After changing the indexed attributes of a type, run
+rebuild_resource_indexes to fill the columns of the existing rows.
+"""
+from django.apps import apps
+from django.db import transaction
+from . import bulk_import, versions
+from .models import CloudResource
+import logging
+
+logger = logging.getLogger(__name__)
+
+INDEXED_SLOTS = 3
+# Listing parameters that attribute names must not shadow (see inventory.filters)
+RESERVED_NAMES = {'subscription', 'location', 'name', 'selector', 'after', 'before', 'last'}
+# CloudResource.indexed_* column length
+INDEXED_MAX_LENGTH = 255
+
+
+class ResourceType:
+    """A resource type declared by an app in 'cielo_resource_types'."""
+
+    def __init__(self, type, slug, label, attributes=None, indexed=(), icon_class='bi-box'):
+        self.type = type.lower()
+        self.slug = slug
+        self.label = label
+        self.attributes = dict(attributes or {})
+        self.icon_class = icon_class
+        reserved = RESERVED_NAMES.intersection(self.attributes)
+        if reserved:
+            raise ValueError(f"Attribute names {sorted(reserved)} of {type} are reserved.")
+        unknown = [name for name in indexed if name not in self.attributes]
+        if unknown:
+            raise ValueError(f"Indexed attributes {unknown} of {type} are not among its attributes.")
+        if len(indexed) > INDEXED_SLOTS:
+            raise ValueError(f"{type} indexes {len(indexed)} attributes; at most {INDEXED_SLOTS} are supported.")
+        # attribute name -> CloudResource column
+        self.columns = {name: f'indexed_{slot}' for slot, name in enumerate(indexed, start=1)}
+
+    def value(self, resource, name):
+        """Returns an attribute of a CloudResource (or its attributes dict) by name."""
+        attributes = resource if isinstance(resource, dict) else resource.attributes
+        return bulk_import.lookup_value(attributes, self.attributes[name])
+
+    def promote(self, resource):
+        """Copies the indexed attributes of a CloudResource into its indexed_* columns."""
+        for slot in range(1, INDEXED_SLOTS + 1):
+            setattr(resource, f'indexed_{slot}', '')
+        for name, column in self.columns.items():
+            value = self.value(resource, name)
+            setattr(resource, column, '' if value is None else str(value)[:INDEXED_MAX_LENGTH])
+        return resource
+
+    def queryset(self):
+        return CloudResource.objects.filter(type=self.type)
+
+    def filter(self, queryset, name, value):
+        """Filters on an indexed attribute."""
+        return queryset.filter(**{self.columns[name]: value})
+
+    def __repr__(self):
+        return f'ResourceType({self.type!r})'
+
+
+class ResourceTypeRegistry:
+    """Resolves the 'cielo_resource_types' of all installed apps once at startup."""
+
+    def __init__(self):
+        self.types = {}
+        self.slugs = {}
+
+    def build(self):
+        types = {}
+        for app_config in apps.get_app_configs():
+            for type_name, options in getattr(app_config, 'cielo_resource_types', {}).items():
+                try:
+                    resource_type = ResourceType(type_name, **options)
+                except (TypeError, ValueError) as e:
+                    logger.error("Error resolving resource type %s of app %s: %s", type_name, app_config.label, e)
+                    continue
+                types[resource_type.type] = resource_type
+        self.types = types
+        self.slugs = {resource_type.slug: resource_type for resource_type in types.values()}
+
+    def __contains__(self, type_name):
+        return type_name in self.types
+
+    def __getitem__(self, type_name):
+        return self.types[type_name]
+
+    def __iter__(self):
+        return iter(self.types.values())
+
+    def by_slug(self, slug):
+        return self.slugs.get(slug)
+
+
+registry = ResourceTypeRegistry()
+
+
+def promote(resource):
+    """Fills the indexed_* columns of a CloudResource from its registered type, if any."""
+    resource_type = registry.types.get(resource.type)
+    if resource_type is not None:
+        resource_type.promote(resource)
+    return resource
+
+
+def resource_pre_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        promote(instance)
+
+
+def _update_indexes(batch, fields):
+    # bulk_update bypasses signals, so bump the version with the rows.
+    with transaction.atomic():
+        updated = CloudResource.objects.bulk_update(batch, fields)
+        versions.bump(CloudResource)
+    return updated
+
+
+def rebuild_indexes(resource_type, batch_size=2000):
+    """Refills the indexed_* columns of every resource of a type; returns the number of rows."""
+    fields = [f'indexed_{slot}' for slot in range(1, INDEXED_SLOTS + 1)]
+    updated = 0
+    batch = []
+    queryset = resource_type.queryset().only('pk', 'attributes', *fields)
+    for resource in queryset.iterator(chunk_size=batch_size):
+        batch.append(resource_type.promote(resource))
+        if len(batch) >= batch_size:
+            updated += _update_indexes(batch, fields)
+            batch = []
+    if batch:
+        updated += _update_indexes(batch, fields)
+    return updated
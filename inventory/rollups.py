@@ -0,0 +1,154 @@
+"""
+Incremental maintenance of InventoryRollup.
+
+Single-object saves and deletes of VirtualMachine are tracked through model
+signals. Bulk writers that bypass signals (the bulk importer, the Azure sync
+engine) compute the group changes of a batch themselves and pass them to
+apply_deltas(). rebuild() recomputes every group from scratch for repair.
+subscription_breakdown() reads a subscription's groups for its detail page.
+"""
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F
+from . import columnar, versions
+from .models import InventoryRollup, VirtualMachine
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def rollup_key(vm):
+    return (vm.subscription_id, vm.location, vm.environment)
+
+
+def apply_deltas(deltas):
+    """
+    Applies a mapping of (subscription_id, location, environment) -> change
+    in VM count. Costs one UPDATE per changed group (plus an INSERT for new
+    groups), independent of the number of VMs behind the change.
+    """
+    with transaction.atomic():
+        for (subscription_id, location, environment), delta in deltas.items():
+            if not delta:
+                continue
+            group = InventoryRollup.objects.filter(subscription_id=subscription_id, location=location, environment=environment)
+            if group.update(vm_count=F('vm_count') + delta):
+                continue
+            if delta > 0:
+                InventoryRollup.objects.create(subscription_id=subscription_id, location=location,
+                                               environment=environment, vm_count=delta)
+            else:
+                logger.warning("Rollup group %s missing while removing %d VMs; "
+                               "run rebuild_inventory_rollups", (subscription_id, location, environment), -delta)
+
+
+def upsert_deltas(old_keys, new_keys):
+    """
+    Returns the rollup deltas of an upsert, given the groups of the rows
+    before (resource_id -> key, for rows that already existed) and after
+    (resource_id -> key) the write.
+    """
+    deltas = Counter()
+    for resource_id, key in new_keys.items():
+        old_key = old_keys.get(resource_id)
+        if old_key != key:
+            deltas[key] += 1
+            if old_key is not None:
+                deltas[old_key] -= 1
+    return deltas
+
+
+def rebuild():
+    """Recomputes all rollup groups from the VirtualMachine table."""
+    groups = (VirtualMachine.objects.order_by().values('subscription_id', 'location', 'environment')
+              .annotate(vm_count=Count('pk')))
+    with transaction.atomic():
+        InventoryRollup.objects.all().delete()
+        InventoryRollup.objects.bulk_create(InventoryRollup(**group) for group in groups.iterator())
+        # VM listing totals are read from the rollups, so repaired counts change those pages.
+        versions.bump(VirtualMachine)
+    return InventoryRollup.objects.count()
+
+
+class Breakdown:
+    """
+    VM counts of a subscription by location and by environment, built from
+    (location, environment, vm_count) groups. Both lists are ordered by
+    descending count, then name.
+    """
+
+    def __init__(self, groups):
+        locations = Counter()
+        environments = Counter()
+        for location, environment, vm_count in groups:
+            locations[location] += vm_count
+            environments[environment] += vm_count
+        self.total = sum(locations.values())
+        self.locations = sorted(locations.items(), key=lambda item: (-item[1], item[0]))
+        self.environments = sorted(environments.items(), key=lambda item: (-item[1], item[0]))
+
+
+def _breakdown_groups(subscription_id):
+    # One grouped query: over the rollup table (a few rows per subscription)
+    # by default, over the subscription's VMs when counts must be exact.
+    if getattr(settings, 'CIELO_INVENTORY_COUNT_MODE', 'rollup') == 'rollup':
+        return (InventoryRollup.objects.filter(subscription_id=subscription_id, vm_count__gt=0)
+                .values_list('location', 'environment', 'vm_count'))
+    return (VirtualMachine.objects.filter(subscription_id=subscription_id).order_by()
+            .values_list('location', 'environment').annotate(vm_count=Count('pk')))
+
+
+def _columnar_groups(groups):
+    return [(location, environment, vm_count) for (location, environment), vm_count in groups.items()]
+
+
+def subscription_breakdown(subscription_id):
+    """Returns the Breakdown of a subscription's VMs."""
+    if getattr(settings, 'CIELO_INVENTORY_COUNT_MODE', 'rollup') == 'columnar':
+        return Breakdown(_columnar_groups(columnar.count(['location', 'environment'], subscription=subscription_id)))
+    return Breakdown(_breakdown_groups(subscription_id))
+
+
+async def asubscription_breakdown(subscription_id):
+    """Async version of subscription_breakdown()."""
+    if getattr(settings, 'CIELO_INVENTORY_COUNT_MODE', 'rollup') == 'columnar':
+        return Breakdown(_columnar_groups(
+            await columnar.acount(['location', 'environment'], subscription=subscription_id)))
+    return Breakdown([group async for group in _breakdown_groups(subscription_id)])
+
+
+def virtual_machine_pre_save(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None or hasattr(instance, '_loaded_rollup_key'):
+        return
+    # Saved without having been loaded from the database; look up its group.
+    old = VirtualMachine.objects.filter(pk=instance.pk).values_list('subscription_id', 'location', 'environment').first()
+    if old is not None:
+        instance._loaded_rollup_key = tuple(old)
+
+
+def virtual_machine_post_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    key = rollup_key(instance)
+    old_key = None if created else getattr(instance, '_loaded_rollup_key', None)
+    if old_key != key:
+        deltas = Counter({key: 1})
+        if old_key is not None:
+            deltas[old_key] -= 1
+        apply_deltas(deltas)
+    instance._loaded_rollup_key = key
+
+
+def virtual_machine_post_delete(sender, instance, **kwargs):
+    apply_deltas({getattr(instance, '_loaded_rollup_key', rollup_key(instance)): -1})
+
+
+def subscription_pre_delete(sender, instance, **kwargs):
+    # VirtualMachine.subscription is SET_NULL (a bulk UPDATE without signals):
+    # move the subscription's groups to the unassigned groups before its rows
+    # are cascade-deleted.
+    deltas = Counter()
+    for location, environment, vm_count in instance.rollups.values_list('location', 'environment', 'vm_count'):
+        deltas[(None, location, environment)] += vm_count
+    apply_deltas(deltas)
@@ -0,0 +1,211 @@
+"""
+Full-text search over inventory names.
+
+On SQLite the names of virtual machines, storage accounts and subscriptions
+are kept in an FTS5 table, inventory_search, whose rowid encodes the kind and
+primary key of the indexed object (pk * ROWID_FACTOR + kind code), so updates
+and deletes address rows directly. The index is kept in sync by model signals
+for single-object writes and by index_queryset() calls from bulk writers.
+
+Other database backends fall back to case-insensitive substring matching.
+"""
+from django.db import connection, transaction
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.utils.translation import gettext_lazy as _
+from .models import AzureSubscription, StorageAccount, VirtualMachine
+import re
+
+TABLE = 'inventory_search'
+
+# kind code -> (model, permission, label)
+KINDS = {
+    1: (VirtualMachine, 'inventory.view_virtualmachine', _('Virtual Machine')),
+    2: (StorageAccount, 'inventory.view_storageaccount', _('Storage Account')),
+    3: (AzureSubscription, 'inventory.view_azuresubscription', _('Azure Subscription')),
+}
+KIND_CODES = {model: code for code, (model, _permission, _label) in KINDS.items()}
+ROWID_FACTOR = 4
+
+WRITE_BATCH_SIZE = 500
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def _rowid(model, pk):
+    return pk * ROWID_FACTOR + KIND_CODES[model]
+
+
+def _details(obj):
+    if isinstance(obj, VirtualMachine):
+        return f'{obj.location} {obj.environment}'
+    if isinstance(obj, StorageAccount):
+        return f'{obj.location} {obj.sku} {obj.access_tier}'
+    return obj.subscription_id
+
+
+def index_objects(model, objects):
+    """Adds or replaces the index entries of the given objects."""
+    if not fts_enabled():
+        return
+    rows = [(_rowid(model, obj.pk), obj.name, _details(obj)) for obj in objects]
+    with transaction.atomic(), connection.cursor() as cursor:
+        for start in range(0, len(rows), WRITE_BATCH_SIZE):
+            batch = rows[start:start + WRITE_BATCH_SIZE]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid IN ({placeholders})', [row[0] for row in batch])
+            cursor.executemany(f'INSERT INTO {TABLE} (rowid, name, details) VALUES (%s, %s, %s)', batch)
+
+
+def remove_objects(model, pks):
+    if not fts_enabled() or not pks:
+        return
+    rowids = [_rowid(model, pk) for pk in pks]
+    with connection.cursor() as cursor:
+        for start in range(0, len(rowids), WRITE_BATCH_SIZE):
+            batch = rowids[start:start + WRITE_BATCH_SIZE]
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid IN ({", ".join(["%s"] * len(batch))})', batch)
+
+
+def index_queryset(queryset, chunk_size=2000):
+    """(Re)indexes every object of a queryset; used by bulk writers."""
+    if not fts_enabled():
+        return
+    batch = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        batch.append(obj)
+        if len(batch) >= chunk_size:
+            index_objects(queryset.model, batch)
+            batch = []
+    index_objects(queryset.model, batch)
+
+
+def rebuild():
+    """Recreates the whole search index from the inventory tables."""
+    if not fts_enabled():
+        return 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+        for model, _permission, _label in KINDS.values():
+            index_queryset(model.objects.all())
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT count(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def match_expression(text):
+    """Turns free text into an FTS5 query matching every word as a prefix."""
+    return ' '.join(f'"{term}"*' for term in re.findall(r'\w+', text.lower()))
+
+
+def filter_queryset(queryset, text):
+    """
+    Narrows a queryset of an indexed model to the objects matching text,
+    through the index: a subquery on the FTS table instead of a LIKE scan.
+    """
+    expression = match_expression(text)
+    if not expression:
+        return queryset
+    if not fts_enabled():
+        return queryset.filter(name__icontains=text)
+    code = KIND_CODES[queryset.model]
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid / {ROWID_FACTOR} FROM {TABLE} WHERE {TABLE} MATCH %s AND rowid %% {ROWID_FACTOR} = {code}',
+        [expression],
+    ))
+
+
+class SearchResults:
+    """
+    Lazily evaluated, ranked search results, sliceable so that it can be
+    handed to django.core.paginator.Paginator: len() runs one count query
+    and every page is one ranked LIMIT/OFFSET query.
+    """
+
+    def __init__(self, text, user):
+        self.text = text
+        self.kinds = [code for code, (_model, permission, _label) in KINDS.items() if user.has_perm(permission)]
+        self.expression = match_expression(text)
+        self._count = None
+
+    def _where(self):
+        kinds = ', '.join(str(code) for code in self.kinds)
+        return f'{TABLE} MATCH %s AND (rowid %% {ROWID_FACTOR}) IN ({kinds})'
+
+    def count(self):
+        if self._count is None:
+            if not self.expression or not self.kinds:
+                self._count = 0
+            elif fts_enabled():
+                with connection.cursor() as cursor:
+                    cursor.execute(f'SELECT count(*) FROM {TABLE} WHERE {self._where()}', [self.expression])
+                    self._count = cursor.fetchone()[0]
+            else:
+                self._count = sum(self._fallback_queryset(code).count() for code in self.kinds)
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            raise TypeError('SearchResults only supports slicing.')
+        offset, stop = index.start or 0, index.stop
+        if not self.expression or not self.kinds or stop <= offset:
+            return []
+        if fts_enabled():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT rowid FROM {TABLE} WHERE {self._where()} ORDER BY rank LIMIT %s OFFSET %s',
+                    [self.expression, stop - offset, offset],
+                )
+                hits = [(rowid % ROWID_FACTOR, rowid // ROWID_FACTOR) for (rowid,) in cursor.fetchall()]
+        else:
+            hits = []
+            for code in self.kinds:
+                hits.extend((code, pk) for pk in self._fallback_queryset(code).values_list('pk', flat=True))
+            hits = hits[offset:stop]
+        return self._resolve(hits)
+
+    def _fallback_queryset(self, code):
+        model = KINDS[code][0]
+        return model.objects.filter(name__icontains=self.text).order_by('name')
+
+    def _resolve(self, hits):
+        pks_by_kind = {}
+        for code, pk in hits:
+            pks_by_kind.setdefault(code, []).append(pk)
+        objects = {
+            code: KINDS[code][0].objects.in_bulk(pks)
+            for code, pks in pks_by_kind.items()
+        }
+        results = []
+        for code, pk in hits:
+            obj = objects[code].get(pk)
+            if obj is not None:
+                results.append(_result(code, obj))
+        return results
+
+
+def _result(code, obj):
+    model, _permission, label = KINDS[code]
+    if model is AzureSubscription:
+        url = reverse('inventory:azure_subscription_detail', kwargs={'pk': obj.pk})
+    elif model is VirtualMachine:
+        url = reverse('inventory:virtual_machines') + '?' + urlencode({'name': obj.name})
+    else:
+        url = reverse('inventory:storage_accounts')
+    return {'kind': label, 'name': obj.name, 'details': _details(obj), 'url': url, 'object': obj}
+
+
+def object_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_objects(sender, [instance])
+
+
+def object_deleted(sender, instance, **kwargs):
+    remove_objects(sender, [instance.pk])
@@ -0,0 +1,69 @@
+/*
+ * Live inventory updates from the server-sent events stream (inventory.views.events).
+ *
+ * The element with a data-events-url opens the stream. Elements with
+ * data-live-total show the VM total, or that of the subscription in their
+ * data-live-subscription, from 'counts' events. Table rows with a
+ * data-vm-id update their data-field cells in place and are struck through
+ * once deleted. Changes a page cannot apply in place (new VMs, subscription
+ * changes, resets after large imports) are counted on the data-live-refresh link.
+ */
+(function () {
+    'use strict';
+
+    var root = document.querySelector('[data-events-url]');
+    if (!root || !window.EventSource) {
+        return;
+    }
+    var refresh = document.querySelector('[data-live-refresh]');
+    var pending = 0;
+
+    function announce() {
+        pending += 1;
+        if (refresh) {
+            refresh.textContent = 'Refresh (' + pending + (pending === 1 ? ' change)' : ' changes)');
+            refresh.classList.add('fw-bold');
+        }
+    }
+
+    function row(vm) {
+        return document.querySelector('tr[data-vm-id="' + vm.id + '"]');
+    }
+
+    // EventSource reconnects by itself, resuming after the Last-Event-ID.
+    var source = new EventSource(root.dataset.eventsUrl);
+
+    source.addEventListener('counts', function (event) {
+        var counts = JSON.parse(event.data);
+        document.querySelectorAll('[data-live-total]').forEach(function (element) {
+            var subscription = element.dataset.liveSubscription;
+            element.textContent = subscription ? (counts.subscriptions[subscription] || 0) : counts.total;
+        });
+    });
+
+    source.addEventListener('virtualmachine.updated', function (event) {
+        var vm = JSON.parse(event.data);
+        var tr = row(vm);
+        if (!tr) {
+            return;
+        }
+        tr.querySelectorAll('[data-field]').forEach(function (cell) {
+            var value = vm[cell.dataset.field];
+            if (value !== undefined) {
+                cell.textContent = value;
+            }
+        });
+    });
+
+    source.addEventListener('virtualmachine.deleted', function (event) {
+        var tr = row(JSON.parse(event.data));
+        if (tr) {
+            tr.classList.add('text-decoration-line-through', 'text-muted');
+        }
+    });
+
+    ['virtualmachine.created', 'azuresubscription.created', 'azuresubscription.updated',
+     'azuresubscription.deleted', 'reset'].forEach(function (name) {
+        source.addEventListener(name, announce);
+    });
+})();
@@ -0,0 +1,307 @@
+"""
+Concurrent, incremental inventory sync with the Azure Resource Manager API.
+
+Virtual machines are listed per AzureSubscription, many subscriptions at a
+time (bounded by an asyncio semaphore), and only the differences with the
+inventory are written. Each subscription keeps a SubscriptionSyncState with
+the ETag of its last listing (sent as If-None-Match, so unchanged
+subscriptions cost a single 304) and, where the API hands one out, a delta
+link that returns only the resources changed since the previous sync.
+
+HTTP requests use the standard library on worker threads; database work runs
+through sync_to_async on the thread that started the sync.
+"""
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from . import rollups, search, tags, versions
+from .bulk_import import lookup_value, resource_group_from_id
+from .models import AzureSubscription, SubscriptionSyncState, VirtualMachine
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+import asyncio
+import json
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+WRITE_BATCH_SIZE = 1000
+
+
+class SyncError(Exception):
+    pass
+
+
+class AzureInventoryClient:
+    """
+    Minimal client for the ARM list API: follows nextLink paging and retries
+    throttled (429) and transient (5xx) responses with exponential backoff,
+    honouring Retry-After when the service sends it.
+    """
+
+    def __init__(self, base_url=None, access_token=None, api_version=None, timeout=30, max_retries=5, backoff=1.0):
+        self.base_url = (base_url or getattr(settings, 'CIELO_AZURE_API_BASE_URL', 'https://management.azure.com')).rstrip('/')
+        self.access_token = access_token if access_token is not None else getattr(settings, 'CIELO_AZURE_ACCESS_TOKEN', '')
+        self.api_version = api_version or getattr(settings, 'CIELO_AZURE_API_VERSION', '2024-07-01')
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+
+    def virtual_machines_url(self, subscription_id):
+        query = urlencode({'api-version': self.api_version})
+        return f'{self.base_url}/subscriptions/{subscription_id}/providers/Microsoft.Compute/virtualMachines?{query}'
+
+    def _request(self, url, etag=None):
+        headers = {'Accept': 'application/json'}
+        if self.access_token:
+            headers['Authorization'] = f'Bearer {self.access_token}'
+        if etag:
+            headers['If-None-Match'] = etag
+        try:
+            with urlopen(Request(url, headers=headers), timeout=self.timeout) as response:
+                return response.status, response.headers, response.read()
+        except HTTPError as e:
+            return e.code, e.headers, e.read()
+
+    def _retry_delay(self, headers, attempt):
+        retry_after = headers.get('Retry-After') if headers else None
+        if retry_after is not None:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    async def get(self, url, etag=None):
+        """Returns (status, headers, parsed JSON body or None for 304)."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                status, headers, body = await asyncio.to_thread(self._request, url, etag)
+            except (URLError, TimeoutError) as e:
+                if attempt == self.max_retries:
+                    raise SyncError(f'GET {url} failed: {e}') from e
+                await asyncio.sleep(self._retry_delay(None, attempt))
+                continue
+            if status in RETRY_STATUSES and attempt < self.max_retries:
+                delay = self._retry_delay(headers, attempt)
+                logger.info("GET %s returned %s, retrying in %.1fs", url, status, delay)
+                await asyncio.sleep(delay)
+                continue
+            if status == 304:
+                return status, headers, None
+            if status >= 400:
+                raise SyncError(f'GET {url} returned {status}: {body[:200]!r}')
+            try:
+                return status, headers, json.loads(body)
+            except ValueError as e:
+                raise SyncError(f'GET {url} returned invalid JSON: {body[:200]!r}') from e
+
+
+class SyncResult:
+    def __init__(self, subscription):
+        self.subscription = subscription
+        self.created = 0
+        self.updated = 0
+        self.deleted = 0
+        self.not_modified = False
+        self.duration = 0.0
+        self.error = ''
+
+    @property
+    def changed(self):
+        return self.created + self.updated + self.deleted
+
+
+class InventorySyncEngine:
+    """
+    Syncs the virtual machines of many subscriptions concurrently.
+
+    With full=True stored ETags and delta links are ignored and every
+    subscription is listed and reconciled completely. progress, if given, is
+    called (in a thread) with the SyncResult of every finished subscription.
+    """
+
+    def __init__(self, client=None, concurrency=None, full=False, progress=None):
+        self.client = client or AzureInventoryClient()
+        self.concurrency = concurrency or getattr(settings, 'CIELO_AZURE_SYNC_CONCURRENCY', 16)
+        self.full = full
+        self.progress = progress
+
+    def run(self, subscriptions=None):
+        return async_to_sync(self.arun)(subscriptions)
+
+    async def arun(self, subscriptions=None):
+        if subscriptions is None:
+            subscriptions = await sync_to_async(list)(AzureSubscription.objects.all())
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(*(self._sync_subscription(semaphore, sub) for sub in subscriptions))
+        await sync_to_async(versions.prune_tombstones)()
+        return results
+
+    async def _sync_subscription(self, semaphore, subscription):
+        async with semaphore:
+            result = SyncResult(subscription)
+            started = time.monotonic()
+            state = None
+            # Any failure is recorded on this subscription's result and state
+            # only, so it cannot abort the other subscriptions of the run.
+            try:
+                state, _created = await sync_to_async(SubscriptionSyncState.objects.get_or_create)(subscription=subscription)
+                listing = await self._fetch(subscription, state)
+                if listing is None:
+                    result.not_modified = True
+                else:
+                    await sync_to_async(self._apply)(subscription, state, listing, result)
+            except SyncError as e:
+                logger.error("Sync of subscription %s failed: %s", subscription.subscription_id, e)
+                result.error = str(e)
+            except Exception as e:
+                logger.exception("Sync of subscription %s failed", subscription.subscription_id)
+                result.error = f'{type(e).__name__}: {e}'
+            result.duration = time.monotonic() - started
+            if state is not None:
+                if result.error:
+                    # Delta links expire; fall back to a full listing next time.
+                    state.delta_link = ''
+                try:
+                    await sync_to_async(self._save_state)(state, result)
+                except Exception:
+                    logger.exception("Saving the sync state of subscription %s failed", subscription.subscription_id)
+            if self.progress:
+                await sync_to_async(self.progress)(result)
+            return result
+
+    async def _fetch(self, subscription, state):
+        """
+        Returns a dict with the listed 'items', the resource IDs reported as
+        'removed', whether the listing is 'complete' and the new 'etag' and
+        'delta_link', or None when the subscription has not changed.
+        """
+        use_delta = bool(state.delta_link) and not self.full
+        url = state.delta_link if use_delta else self.client.virtual_machines_url(subscription.subscription_id)
+        etag = None if (use_delta or self.full) else (state.etag or None)
+
+        status, headers, page = await self.client.get(url, etag=etag)
+        if status == 304:
+            return None
+        listing = {
+            'items': [],
+            'removed': [],
+            'complete': not use_delta,
+            'etag': (headers.get('ETag') or '') if not use_delta else state.etag,
+            'delta_link': '',
+        }
+        while True:
+            for item in page.get('value', []):
+                if '@removed' in item:
+                    if item.get('id'):
+                        listing['removed'].append(item['id'].lower())
+                else:
+                    listing['items'].append(item)
+            listing['delta_link'] = page.get('deltaLink') or page.get('@odata.deltaLink') or listing['delta_link']
+            next_link = page.get('nextLink')
+            if not next_link:
+                return listing
+            _status, _headers, page = await self.client.get(next_link)
+
+    def _apply(self, subscription, state, listing, result):
+        rows = {}
+        listed_tags = {}
+        for item in listing['items']:
+            resource_id = (item.get('id') or '').lower()
+            if not resource_id or not item.get('name'):
+                continue
+            rows[resource_id] = (
+                item['name'],
+                item.get('location') or '',
+                str(lookup_value(item, 'tags.environment', 'tags.env') or ''),
+                resource_group_from_id(resource_id),
+            )
+            listed_tags[resource_id] = tags.normalise_tags(item.get('tags')) or {}
+
+        managed = VirtualMachine.objects.filter(resource_id__isnull=False)
+        if listing['complete']:
+            existing_qs = managed.filter(subscription=subscription)
+        else:
+            existing_qs = managed.filter(resource_id__in=list(rows))
+        existing = {}
+        resource_ids = {}
+        for pk, resource_id, name, location, environment, resource_group, subscription_id in existing_qs.values_list(
+                'pk', 'resource_id', 'name', 'location', 'environment', 'resource_group', 'subscription_id'):
+            existing[resource_id] = (name, location, environment, resource_group, subscription_id)
+            resource_ids[pk] = resource_id
+        existing_tags = {resource_ids[pk]: values
+                         for pk, values in tags.tags_for(VirtualMachine, existing_qs.values('pk')).items()}
+
+        changed = []
+        for resource_id, values in rows.items():
+            current = existing.get(resource_id)
+            if current is None:
+                result.created += 1
+            elif current != values + (subscription.pk,) or existing_tags.get(resource_id, {}) != listed_tags[resource_id]:
+                result.updated += 1
+            else:
+                continue
+            name, location, environment, resource_group = values
+            changed.append(VirtualMachine(resource_id=resource_id, name=name, location=location, environment=environment,
+                                          resource_group=resource_group, subscription=subscription))
+
+        if listing['complete']:
+            removed = [resource_id for resource_id in existing if resource_id not in rows]
+        else:
+            removed = listing['removed']
+
+        with transaction.atomic():
+            for start in range(0, len(changed), WRITE_BATCH_SIZE):
+                batch = changed[start:start + WRITE_BATCH_SIZE]
+                # bulk_create bypasses signals, so keep InventoryRollup, the
+                # search index, the tags and the inventory version in step here. Rows new to this subscription may
+                # still exist under another one.
+                old_keys = {}
+                unknown = []
+                for vm in batch:
+                    if vm.resource_id in existing:
+                        _name, location, environment, _resource_group, subscription_id = existing[vm.resource_id]
+                        old_keys[vm.resource_id] = (subscription_id, location, environment)
+                    else:
+                        unknown.append(vm.resource_id)
+                if unknown:
+                    old_keys.update(
+                        (resource_id, (subscription_id, location, environment))
+                        for resource_id, subscription_id, location, environment in managed.filter(
+                            resource_id__in=unknown).values_list('resource_id', 'subscription_id', 'location', 'environment')
+                    )
+                change_version = versions.next_version(VirtualMachine)
+                for vm in batch:
+                    vm.change_version = change_version
+                VirtualMachine.objects.bulk_create(
+                    batch,
+                    update_conflicts=True,
+                    unique_fields=['resource_id'],
+                    update_fields=['name', 'location', 'environment', 'resource_group', 'subscription', 'change_version'],
+                )
+                rollups.apply_deltas(rollups.upsert_deltas(
+                    old_keys, {vm.resource_id: rollups.rollup_key(vm) for vm in batch}))
+                written = VirtualMachine.objects.filter(resource_id__in=[vm.resource_id for vm in batch])
+                tags.set_tags(VirtualMachine, {pk: listed_tags[resource_id]
+                                               for resource_id, pk in written.values_list('resource_id', 'pk')})
+                search.index_queryset(written)
+            # Deletes go through the model signals, which update InventoryRollup,
+            # the search index, the tags and the inventory version.
+            for start in range(0, len(removed), WRITE_BATCH_SIZE):
+                deleted, _per_model = managed.filter(resource_id__in=removed[start:start + WRITE_BATCH_SIZE]).delete()
+                result.deleted += deleted
+            state.etag = listing['etag']
+            state.delta_link = listing['delta_link']
+
+    def _save_state(self, state, result):
+        state.last_synced_at = timezone.now()
+        state.last_duration = result.duration
+        state.last_changed_rows = result.changed
+        state.last_error = result.error
+        state.save()
@@ -0,0 +1,162 @@
+"""
+Azure tags of inventory resources and tag selector queries.
+
+Tags are stored one ResourceTag row per (resource, key), and the
+(model, key, value, object_id) index serves as the inverted index from a
+tag to the resources carrying it. A selector is a comma-separated list of
+requirements that must all hold, in the syntax of Kubernetes label selectors:
+
+    env=prod            the tag has the value (also env==prod)
+    team!=data          the tag is missing or has another value
+    region in (a,b)     the tag has one of the values
+    region notin (a,b)  the tag is missing or has none of the values
+    owner               the tag is set
+    !owner              the tag is not set
+
+Every requirement is one index range scan yielding resource IDs; the
+scans are combined with SQL INTERSECT and EXCEPT, so the database
+intersects ID lists instead of scanning the resources.
+
+Bulk writers replace the tags of their batches with set_tags(); deletes are
+handled through model signals.
+"""
+from django.db import transaction
+from .models import ResourceTag
+import json
+import re
+
+MAX_REQUIREMENTS = 20
+
+KEY = r'[^\s=!,()]+'
+REQUIREMENT_PATTERNS = [
+    ('!', re.compile(rf'^!\s*({KEY})$')),
+    ('set', re.compile(rf'^({KEY})\s+(in|notin)\s*\(([^()]*)\)$', re.IGNORECASE)),
+    ('compare', re.compile(rf'^({KEY})\s*(==|=|!=)\s*([^,()=!]*)$')),
+    ('exists', re.compile(rf'^({KEY})$')),
+]
+# Commas separate requirements, except inside the parentheses of in/notin.
+SEPARATOR = re.compile(r',(?![^()]*\))')
+
+WRITE_BATCH_SIZE = 1000
+
+
+class SelectorError(ValueError):
+    pass
+
+
+class Requirement:
+    """One term of a selector: operator is 'in', 'notin', 'exists' or '!'."""
+
+    def __init__(self, key, operator, values=()):
+        self.key = key.lower()
+        self.operator = operator
+        self.values = tuple(values)
+
+    @property
+    def negated(self):
+        return self.operator in ('notin', '!')
+
+    def __eq__(self, other):
+        return isinstance(other, Requirement) and (self.key, self.operator, self.values) == (
+            other.key, other.operator, other.values)
+
+    def __repr__(self):
+        return f'Requirement({self.key!r}, {self.operator!r}, {self.values!r})'
+
+
+def _requirement(text):
+    for kind, pattern in REQUIREMENT_PATTERNS:
+        match = pattern.match(text)
+        if not match:
+            continue
+        if kind == '!':
+            return Requirement(match[1], '!')
+        if kind == 'exists':
+            return Requirement(match[1], 'exists')
+        if kind == 'set':
+            values = [value.strip() for value in match[3].split(',')]
+            if not all(values):
+                raise SelectorError(f"Empty value in {text!r}.")
+            return Requirement(match[1], match[2].lower(), values)
+        operator = 'notin' if match[2] == '!=' else 'in'
+        return Requirement(match[1], operator, [match[3].strip()])
+    raise SelectorError(f"Invalid requirement {text!r}.")
+
+
+def parse_selector(selector):
+    """Parses a selector into Requirements, raising SelectorError when invalid."""
+    terms = [term.strip() for term in SEPARATOR.split(selector.strip())] if selector.strip() else []
+    if not all(terms):
+        raise SelectorError("Empty requirement in selector.")
+    if len(terms) > MAX_REQUIREMENTS:
+        raise SelectorError(f"Selectors are limited to {MAX_REQUIREMENTS} requirements.")
+    return [_requirement(term) for term in terms]
+
+
+def _matches(label, requirement):
+    # The IDs of the resources on which the tag exists (for 'exists' and '!')
+    # or has one of the values, from the inverted index alone.
+    tags = ResourceTag.objects.filter(model=label, key=requirement.key)
+    if requirement.operator not in ('exists', '!'):
+        tags = tags.filter(value__in=requirement.values)
+    return tags.order_by().values('object_id')
+
+
+def filter_queryset(queryset, selector):
+    """Narrows a queryset to the resources matching a selector (a string or parsed)."""
+    requirements = parse_selector(selector) if isinstance(selector, str) else selector
+    if not requirements:
+        return queryset
+    label = queryset.model._meta.label_lower
+    included = [_matches(label, requirement) for requirement in requirements if not requirement.negated]
+    excluded = [_matches(label, requirement) for requirement in requirements if requirement.negated]
+    if not included:
+        return queryset.exclude(pk__in=excluded[0].union(*excluded[1:]) if len(excluded) > 1 else excluded[0])
+    ids = included[0].intersection(*included[1:]) if len(included) > 1 else included[0]
+    if excluded:
+        ids = ids.difference(*excluded)
+    return queryset.filter(pk__in=ids)
+
+
+def normalise_tags(value):
+    """
+    Returns the {key: value} tags of an export or API value (a dict, or in CSV
+    exports a JSON encoded string), with lower-cased keys; None if not a dict.
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value) if value.strip() else {}
+        except ValueError:
+            return None
+    if not isinstance(value, dict):
+        return None
+    return {str(key).lower(): '' if tag is None else str(tag) for key, tag in value.items()}
+
+
+def tags_for(model, pks):
+    """Returns {pk: {key: value}} for the given primary keys (a list or a values() queryset)."""
+    tags = {}
+    rows = ResourceTag.objects.filter(model=model._meta.label_lower, object_id__in=pks).order_by('key')
+    for object_id, key, value in rows.values_list('object_id', 'key', 'value'):
+        tags.setdefault(object_id, {})[key] = value
+    return tags
+
+
+def set_tags(model, tags_by_pk):
+    """Replaces the tags of the given objects ({pk: {key: value}})."""
+    if not tags_by_pk:
+        return
+    label = model._meta.label_lower
+    with transaction.atomic():
+        pks = list(tags_by_pk)
+        for start in range(0, len(pks), WRITE_BATCH_SIZE):
+            ResourceTag.objects.filter(model=label, object_id__in=pks[start:start + WRITE_BATCH_SIZE]).delete()
+        ResourceTag.objects.bulk_create(
+            (ResourceTag(model=label, object_id=pk, key=key, value=value)
+             for pk, tags in tags_by_pk.items() for key, value in tags.items()),
+            batch_size=WRITE_BATCH_SIZE,
+        )
+
+
+def object_deleted(sender, instance, **kwargs):
+    ResourceTag.objects.filter(model=sender._meta.label_lower, object_id=instance.pk).delete()
@@ -6,6 +6,13 @@ app_name = 'inventory'
 
 urlpatterns = [
     path('', login_required(views.virtual_machines), name='virtual_machines'),
+    path('events/', login_required(views.events), name='events'),
+    path('search/', login_required(views.search), name='search'),
+    path('export/<slug:resource>.<slug:fmt>', login_required(views.export), name='export'),
+    path('import/', login_required(views.import_upload), name='import'),
+    path('sync/', login_required(views.sync), name='sync'),
     path('storage-accounts/', login_required(views.storage_accounts), name='storage_accounts'),
+    path('resources/<slug:slug>/', login_required(views.resources), name='resources'),
+    path('resources/<slug:slug>/<int:pk>/', login_required(views.resource_detail), name='resource_detail'),
     path('azure-subscriptions/<int:pk>/', login_required(views.azure_subscription_detail), name='azure_subscription_detail'),
 ]
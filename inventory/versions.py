@@ -0,0 +1,176 @@
+"""
+Inventory change counters and conditional GET of inventory pages.
+
+Every write to a versioned model bumps its InventoryVersion row in the same
+transaction: single-object saves and deletes through model signals, bulk
+writers that bypass signals (the bulk importer, the Azure sync engine) by
+calling bump() once per batch. conditional_page() derives a page's ETag from
+the counters of the models it shows, the requesting user's permissions and
+session and the full URL, so an unchanged page is answered with 304 Not
+Modified after one query on the (tiny) version table instead of re-querying
+and re-rendering it. Pages rendered with pending messages are never
+revalidated, as the messages would be consumed without being shown.
+
+Rows of models with a change_version field (VirtualMachine,
+AzureSubscription) are also stamped with the version of their last write,
+and their deletes leave an InventoryTombstone, so readers holding a copy
+(see inventory.columnar, inventory.events) can fetch only what changed
+since the version they saw. Bulk writers stamp rows
+with next_version(); writes through QuerySet.update() are not tracked.
+"""
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from common.navigation import registry as navigation_registry
+from functools import wraps
+from .models import InventoryTombstone, InventoryVersion, VirtualMachine
+from datetime import timedelta
+import hashlib
+
+
+def bump(*models):
+    """Marks the given models as changed."""
+    now = timezone.now()
+    for model in models:
+        label = model._meta.label_lower
+        versions = InventoryVersion.objects.filter(model=label)
+        if versions.update(version=F('version') + 1, changed_at=now):
+            continue
+        try:
+            with transaction.atomic():
+                InventoryVersion.objects.create(model=label, version=1, changed_at=now)
+        except IntegrityError:
+            versions.update(version=F('version') + 1, changed_at=now)
+
+
+def next_version(model):
+    """Bumps the model's version and returns the new value, to stamp rows with."""
+    bump(model)
+    return InventoryVersion.objects.filter(model=model._meta.label_lower).values_list('version', flat=True).get()
+
+
+def current_version(model):
+    return InventoryVersion.objects.filter(model=model._meta.label_lower).values_list('version', flat=True).first() or 0
+
+
+def _stamped(model):
+    return any(field.name == 'change_version' for field in model._meta.concrete_fields)
+
+
+def object_saved(sender, instance, raw=False, **kwargs):
+    if not _stamped(sender):
+        bump(sender)
+        return
+    # Stamped after the save, which may have been limited to other
+    # update_fields. The bump and the stamp commit together: a reader that
+    # saw the new version before the row carried it would skip the row.
+    with transaction.atomic():
+        instance.change_version = next_version(sender)
+        sender._default_manager.filter(pk=instance.pk).update(change_version=instance.change_version)
+
+
+def object_deleted(sender, instance, **kwargs):
+    if not _stamped(sender):
+        bump(sender)
+        return
+    with transaction.atomic():
+        InventoryTombstone.objects.create(model=sender._meta.label_lower, object_id=instance.pk,
+                                          version=next_version(sender))
+
+
+def subscription_pre_delete(sender, instance, **kwargs):
+    # The database sets the subscription of its VMs to NULL without signals.
+    with transaction.atomic():
+        VirtualMachine.objects.filter(subscription=instance).update(change_version=next_version(VirtualMachine))
+
+
+def prune_tombstones():
+    """Deletes tombstones older than CIELO_INVENTORY_TOMBSTONE_RETENTION seconds."""
+    retention = timedelta(seconds=getattr(settings, 'CIELO_INVENTORY_TOMBSTONE_RETENTION', 86400))
+    return InventoryTombstone.objects.filter(deleted_at__lt=timezone.now() - retention).delete()[0]
+
+
+def _state(models):
+    return InventoryVersion.objects.filter(model__in=[model._meta.label_lower for model in models]).order_by('model')
+
+
+def _pending_messages(request):
+    # len() loads the messages without marking them as used.
+    return bool(len(messages.get_messages(request)))
+
+
+def _etag(request, user, permissions, versions, navigation_version):
+    # The session key and CSRF cookie change on login and logout; pages
+    # embed the CSRF token, so a copy from another session must not be reused.
+    key = '\n'.join([
+        getattr(settings, 'CIELO_RELEASE', ''),
+        request.get_full_path(),
+        str(user.pk),
+        getattr(getattr(request, 'session', None), 'session_key', None) or '',
+        request.COOKIES.get(settings.CSRF_COOKIE_NAME, ''),
+        ','.join(sorted(permissions)),
+        str(navigation_version),
+        ','.join(f'{version.model}:{version.version}' for version in versions),
+    ])
+    return 'W/"%s"' % hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def _conditional(request, etag, versions):
+    # Last-Modified is informational only: it ignores the user and the URL,
+    # so If-Modified-Since must not produce a 304 on its own.
+    last_modified = max((version.changed_at for version in versions), default=None)
+    response = get_conditional_response(request, etag=etag)
+    return response, last_modified
+
+
+def _finish(response, etag, last_modified):
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+        # Pages are per user and must be revalidated on every use.
+        patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def conditional_page(*models):
+    """
+    View decorator answering GET and HEAD requests for a page that only
+    shows the given models with 304 Not Modified while none of them, the
+    user's permissions and session or the navigation changed. Pages with
+    pending messages are always rendered and sent without an ETag. Works on
+    sync and async views.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def inner(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD') or await sync_to_async(_pending_messages)(request):
+                    return await view(request, *args, **kwargs)
+                user = await request.auser()
+                versions = [version async for version in _state(models)]
+                etag = _etag(request, user, await user.aget_all_permissions(), versions,
+                             await navigation_registry.aget_version())
+                response, last_modified = _conditional(request, etag, versions)
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return _finish(response, etag, last_modified)
+        else:
+            @wraps(view)
+            def inner(request, *args, **kwargs):
+                if request.method not in ('GET', 'HEAD') or _pending_messages(request):
+                    return view(request, *args, **kwargs)
+                versions = list(_state(models))
+                etag = _etag(request, request.user, request.user.get_all_permissions(), versions,
+                             navigation_registry.get_version())
+                response, last_modified = _conditional(request, etag, versions)
+                if response is None:
+                    response = view(request, *args, **kwargs)
+                return _finish(response, etag, last_modified)
+        return inner
+    return decorator
@@ -1,40 +1,326 @@
-from django.shortcuts import render, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.core.handlers.asgi import ASGIRequest
 from django.core.paginator import Paginator
-from .models import AzureSubscription, VirtualMachine # Import models
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404, get_object_or_404, render
+from django.urls import reverse
+from django.utils.http import urlencode
+from django.views.decorators.http import require_POST
+from common import jobs
+from common.pagination import KeysetPaginator
+from common.shortcuts import arender
+from common.views import job_response
+from . import columnar, events as inventory_events, resources as resource_types, rollups, tags
+from .versions import conditional_page
+from .bulk_import import FORMATS as IMPORT_FORMATS, detect_format
+from .exports import EXPORTS, FORMATS as EXPORT_FORMATS, stream as stream_export
+from .filters import (
+    filter_resources, filter_virtual_machines, get_resource_filters, get_sort_columns, get_virtual_machine_filters,
+    get_virtual_machine_sort,
+)
+from .models import AzureSubscription, CloudResource, InventoryRollup, StorageAccount, VirtualMachine # Import models
+from .search import SearchResults
+from .tags import SelectorError
+from functools import partial
+from pathlib import Path
+import json
 import logging
+import uuid
 
 logger = logging.getLogger(__name__)
 
+VMS_PER_PAGE = 5
+SUBSCRIPTION_VMS_PER_PAGE = 25
+SEARCH_RESULTS_PER_PAGE = 20
+STORAGE_ACCOUNTS_PER_PAGE = 25
+RESOURCES_PER_PAGE = 25
 
-def virtual_machines(request):
-    logger.debug(f"virtual_machines view called by user: {request.user}")
-    logger.debug(f"User authenticated: {request.user.is_authenticated}")
+
+async def _columnar_total(filters):
+    return (await columnar.acount(**filters))[()]
+
+
+@conditional_page(VirtualMachine, AzureSubscription)
+async def virtual_machines(request):
+    # An async view: under ASGI it runs on the event loop with an async
+    # middleware stack, and its queries go through the async ORM instead of
+    # the whole request being adapted to a worker thread (see common.shortcuts.arender).
+    user = await request.auser()
+    logger.debug("virtual_machines view called by user: %s", user)
+    filters = get_virtual_machine_filters(request.GET)
+    sort, ordering = get_virtual_machine_sort(request.GET)
     # Fetch VirtualMachine objects from the database
-    vm_list = VirtualMachine.objects.select_related('subscription').all().order_by('name')
+    selector_error = None
+    try:
+        vm_list = filter_virtual_machines(VirtualMachine.objects.select_related('subscription'), filters)
+    except SelectorError as e:
+        selector_error = str(e)
+        del filters['selector']
+        vm_list = filter_virtual_machines(VirtualMachine.objects.select_related('subscription'), filters)
     # The .select_related('subscription') is an optimization to fetch
     # the related AzureSubscription object in the same query,
     # preventing N+1 queries if you access subscription details in the template.
 
-    paginator = Paginator(vm_list, 5) # Show 5 VMs per page
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Keyset pagination on the sort columns plus id: every page is a single
+    # indexed range query, so deep pages cost the same as the first one.
+    # Totals come from the rollup table unless a name prefix, resource group
+    # or tag selector is filtered on; planner statistics describe the whole
+    # table, so other filtered listings count exactly.
+    count_mode = getattr(settings, 'CIELO_INVENTORY_COUNT_MODE', 'rollup')
+    count_func = None
+    if count_mode == 'columnar':
+        count_mode = 'exact'
+        if not filters.keys() & {'name', 'resource_group', 'selector'}:
+            dimensions = {dimension: filters[dimension] for dimension in ('location', 'environment') if dimension in filters}
+            if 'subscription' in filters:
+                dimensions['subscription'] = int(filters['subscription'])
+            count_func = partial(_columnar_total, dimensions)
+    elif count_mode == 'rollup':
+        count_mode = 'exact'
+        if not filters.keys() & {'name', 'resource_group', 'selector'}:
+            count_func = partial(
+                InventoryRollup.objects.avirtual_machine_count,
+                subscription=int(filters['subscription']) if 'subscription' in filters else None,
+                location=filters.get('location'),
+                environment=filters.get('environment'),
+            )
+    paginator = KeysetPaginator(
+        vm_list,
+        VMS_PER_PAGE,
+        ordering=ordering,
+        count_mode='exact' if filters else count_mode,
+        count_func=count_func,
+    )
+    page_obj = await paginator.aget_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        last='last' in request.GET,
+    )
+    await paginator.acount()
+
+    logger.debug("Rendering virtual_machines template with %d VMs on this page", len(page_obj))
+    return await arender(request, 'inventory/virtual_machines.html', {
+        'page_obj': page_obj,
+        'filters': filters,
+        'sort': sort,
+        'sort_columns': get_sort_columns(filters, sort),
+        'listing_query': urlencode({**filters, 'sort': sort}),
+        'selector_error': selector_error,
+        'events_url': await _events_url(request),
+    })
+
+
+async def _events_url(request):
+    # Pages only follow the stream under ASGI: under WSGI every open page
+    # would hold a worker thread. Streams start at the versions the page was
+    # rendered from, so changes made in between are not missed.
+    if not isinstance(request, ASGIRequest):
+        return None
+    cursor = await sync_to_async(inventory_events.current_cursor)()
+    return f"{reverse('inventory:events')}?{urlencode({'cursor': cursor})}"
 
-    logger.debug(f"Rendering virtual_machines template with {len(vm_list)} VMs")
-    return render(request, 'inventory/virtual_machines.html', {
-        'page_obj': page_obj
+
+async def events(request):
+    """
+    Server-sent events stream of the inventory changes the user may see
+    (see inventory.events). Meant for ASGI: under WSGI every open stream
+    holds a worker thread.
+    """
+    user = await request.auser()
+    permissions = await user.aget_all_permissions()
+    cursor = inventory_events.parse_cursor(request.headers.get('Last-Event-ID') or request.GET.get('cursor'))
+    # Each handler buffers the other kind of iterator to the end of the
+    # stream, so the generator must match the handler serving the request.
+    if isinstance(request, ASGIRequest):
+        content = inventory_events.astream(permissions, cursor)
+    else:
+        content = inventory_events.stream(permissions, cursor)
+    response = StreamingHttpResponse(content, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Tells nginx not to buffer the stream.
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    logger.debug("search view called by user: %s with query: %r", request.user, query)
+    # Ranked matches from the full-text index; the paginator costs one count
+    # query and one LIMIT/OFFSET query per page.
+    paginator = Paginator(SearchResults(query, request.user), SEARCH_RESULTS_PER_PAGE)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    return render(request, 'inventory/search.html', {
+        'search_query': query,
+        'page_obj': page_obj,
+        'search_params': urlencode({'q': query}),
     })
 
 
+def export(request, resource, fmt):
+    export = EXPORTS.get(resource)
+    if export is None or fmt not in EXPORT_FORMATS:
+        raise Http404("Unknown export.")
+    if not request.user.has_perm(export.permission):
+        raise PermissionDenied
+    logger.debug("export view called by user: %s for %s.%s", request.user, resource, fmt)
+    queryset = export.queryset()
+    if export.model is VirtualMachine:
+        # The listing filters apply, so automation can export a slice.
+        try:
+            queryset = filter_virtual_machines(queryset, get_virtual_machine_filters(request.GET))
+        except SelectorError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+    response = StreamingHttpResponse(stream_export(export, queryset, fmt), content_type=EXPORT_FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{resource}.{fmt}"'
+    return response
+
+
+@require_POST
+def import_upload(request):
+    """
+    Queues an import of an uploaded export file ('file') as a background job
+    and answers 202 with the job's status URL.
+    """
+    if not request.user.has_perm('inventory.add_virtualmachine'):
+        raise PermissionDenied
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'error': 'No file uploaded.'}, status=400)
+    fmt = request.POST.get('format') or detect_format(upload.name)
+    if fmt not in IMPORT_FORMATS:
+        return JsonResponse({'error': f'Unknown format {fmt!r}.'}, status=400)
+    directory = Path(settings.CIELO_IMPORT_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{uuid.uuid4().hex}.{fmt}'
+    with open(path, 'wb') as destination:
+        for chunk in upload.chunks():
+            destination.write(chunk)
+    job = jobs.enqueue('inventory.import', {'path': str(path), 'format': fmt, 'delete_file': True}, user=request.user)
+    logger.info("User %s queued import of %s as job #%s", request.user, upload.name, job.pk)
+    return job_response(job, status=202)
+
+
+@require_POST
+def sync(request):
+    """
+    Queues an Azure sync of all subscriptions (or the given 'subscription'
+    GUIDs) as a background job and answers 202 with its status URL.
+    """
+    if not request.user.has_perm('inventory.change_virtualmachine'):
+        raise PermissionDenied
+    params = {'full': request.POST.get('full') == '1'}
+    if request.POST.getlist('subscription'):
+        params['subscription_ids'] = request.POST.getlist('subscription')
+    job = jobs.enqueue('inventory.sync', params, user=request.user)
+    logger.info("User %s queued inventory sync as job #%s", request.user, job.pk)
+    return job_response(job, status=202)
+
+
+@conditional_page(StorageAccount, AzureSubscription)
 def storage_accounts(request):
-    logger.debug(f"storage_accounts view called by user: {request.user}")
-    accounts = []
-    return render(request, 'inventory/storage_accounts.html', {'accounts': accounts})
-
-def azure_subscription_detail(request, pk):
-    logger.debug(f"azure_subscription_detail view called by user: {request.user} for pk: {pk}")
-    subscription = get_object_or_404(AzureSubscription, pk=pk)
-    # For now, just passing the subscription object.
-    # Later, you might fetch VMs or other resources related to this subscription.
-    return render(request, 'inventory/azure_subscription_detail.html', {
-        'subscription': subscription
+    logger.debug("storage_accounts view called by user: %s", request.user)
+    # Keyset pages over the (name, id) index.
+    paginator = KeysetPaginator(
+        StorageAccount.objects.select_related('subscription'),
+        STORAGE_ACCOUNTS_PER_PAGE,
+        ordering=('name',),
+    )
+    page_obj = paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        last='last' in request.GET,
+    )
+    return render(request, 'inventory/storage_accounts.html', {'page_obj': page_obj})
+
+
+def _attribute_label(name):
+    return name.replace('_', ' ').capitalize()
+
+
+def _resource_type(request, slug):
+    resource_type = resource_types.registry.by_slug(slug)
+    if resource_type is None:
+        raise Http404("Unknown resource type.")
+    if not request.user.has_perm('inventory.view_cloudresource'):
+        raise PermissionDenied
+    return resource_type
+
+
+@conditional_page(CloudResource, AzureSubscription)
+def resources(request, slug):
+    """Listing of the CloudResources of a registered type (see inventory.resources)."""
+    resource_type = _resource_type(request, slug)
+    logger.debug("resources view called by user: %s for %s", request.user, resource_type.type)
+    filters = get_resource_filters(resource_type, request.GET)
+    queryset = resource_type.queryset().select_related('subscription')
+    selector_error = None
+    try:
+        resource_list = filter_resources(resource_type, queryset, filters)
+    except SelectorError as e:
+        selector_error = str(e)
+        del filters['selector']
+        resource_list = filter_resources(resource_type, queryset, filters)
+    # Every filter leads an index on (type, column, name, id), so pages are
+    # range scans and the total is an index-only count of the type.
+    paginator = KeysetPaginator(resource_list, RESOURCES_PER_PAGE, ordering=('name',), count_mode='exact')
+    page_obj = paginator.get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        last='last' in request.GET,
+    )
+    for resource in page_obj.object_list:
+        resource.attribute_values = [resource_type.value(resource, name) for name in resource_type.attributes]
+    return render(request, 'inventory/resources.html', {
+        'resource_type': resource_type,
+        'attribute_labels': [_attribute_label(name) for name in resource_type.attributes],
+        'page_obj': page_obj,
+        'filters': filters,
+        'indexed_filters': [(name, _attribute_label(name), filters.get(name, '')) for name in resource_type.columns],
+        'listing_query': urlencode(filters),
+        'selector_error': selector_error,
+    })
+
+
+@conditional_page(CloudResource, AzureSubscription)
+def resource_detail(request, slug, pk):
+    resource_type = _resource_type(request, slug)
+    resource = get_object_or_404(resource_type.queryset().select_related('subscription'), pk=pk)
+    return render(request, 'inventory/resource_detail.html', {
+        'resource_type': resource_type,
+        'resource': resource,
+        'attributes': [(_attribute_label(name), resource_type.value(resource, name)) for name in resource_type.attributes],
+        'tags': tags.tags_for(CloudResource, [resource.pk]).get(resource.pk, {}),
+        'attributes_json': json.dumps(resource.attributes, indent=2, sort_keys=True),
+    })
+
+
+@conditional_page(VirtualMachine, AzureSubscription)
+async def azure_subscription_detail(request, pk):
+    user = await request.auser()
+    logger.debug("azure_subscription_detail view called by user: %s for pk: %s", user, pk)
+    subscription = await aget_object_or_404(AzureSubscription, pk=pk)
+    # Location/environment totals from a single grouped query over the
+    # subscription's rollup groups; the VM page is a keyset range scan of
+    # the (subscription, name, id) index, so large subscriptions cost the
+    # same as small ones.
+    breakdown = await rollups.asubscription_breakdown(subscription.pk)
+    paginator = KeysetPaginator(
+        VirtualMachine.objects.filter(subscription=subscription),
+        SUBSCRIPTION_VMS_PER_PAGE,
+        ordering=('name',),
+        count_mode=None,
+    )
+    page_obj = await paginator.aget_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+        last='last' in request.GET,
+    )
+    return await arender(request, 'inventory/azure_subscription_detail.html', {
+        'subscription': subscription,
+        'breakdown': breakdown,
+        'page_obj': page_obj,
+        'listing_url': f"{reverse('inventory:virtual_machines')}?{urlencode({'subscription': subscription.pk})}",
+        'events_url': await _events_url(request),
     })
@@ -13,6 +13,9 @@ poetry install
 # Apply database migrations
 poetry run python manage.py migrate --noinput
 
+# Create the default administrator (admin/admin) unless it already exists
+poetry run python manage.py bootstrap_admin
+
 # Populate database with sample inventory data
 poetry run python manage.py populate_inventory_data
 
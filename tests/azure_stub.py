@@ -0,0 +1,129 @@
+"""
+A local stub of the Azure Resource Manager virtual machine list API.
+
+Supports nextLink paging, ETag / If-None-Match, throttling with 429 and
+Retry-After, and (optionally) delta links returning only changed resources.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import json
+import re
+import threading
+
+LIST_PATH = re.compile(r'^/subscriptions/(?P<subscription>[^/]+)/providers/Microsoft\.Compute/virtualMachines$')
+
+
+class AzureStub:
+    def __init__(self, page_size=2, throttle_first=0, delta=False):
+        self.page_size = page_size
+        self.throttle_first = throttle_first
+        self.delta = delta
+        self.version = 0
+        self.vms = {}
+        self.changes = []
+        self.subscription_versions = {}
+        self.requests = []
+        # Subscriptions whose listing answers 200 with a body that is not JSON
+        self.broken = set()
+        self._request_counts = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler())
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def resource_id(self, subscription_id, name):
+        return f'/subscriptions/{subscription_id}/resourceGroups/rg/providers/Microsoft.Compute/virtualMachines/{name}'
+
+    def set_vm(self, subscription_id, name, location='eastus', environment='Production'):
+        with self._lock:
+            item = {
+                'id': self.resource_id(subscription_id, name),
+                'name': name,
+                'location': location,
+                'tags': {'environment': environment},
+            }
+            self.vms.setdefault(subscription_id, {})[name] = item
+            self._changed(subscription_id, item)
+
+    def delete_vm(self, subscription_id, name):
+        with self._lock:
+            item = self.vms[subscription_id].pop(name)
+            self._changed(subscription_id, {'id': item['id'], '@removed': {'reason': 'deleted'}})
+
+    def _changed(self, subscription_id, item):
+        self.version += 1
+        self.subscription_versions[subscription_id] = self.version
+        self.changes.append((self.version, subscription_id, item))
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                match = LIST_PATH.match(parsed.path)
+                if not match:
+                    return self._json(404, {'error': {'code': 'NotFound'}})
+                subscription_id = match['subscription']
+                query = parse_qs(parsed.query)
+                with stub._lock:
+                    stub.requests.append(self.path)
+                    count = stub._request_counts.get(subscription_id, 0) + 1
+                    stub._request_counts[subscription_id] = count
+                    if count <= stub.throttle_first:
+                        return self._json(429, {'error': {'code': 'TooManyRequests'}}, {'Retry-After': '0'})
+                    if subscription_id in stub.broken:
+                        body = b'<html>Service Unavailable</html>'
+                        self.send_response(200)
+                        self.send_header('Content-Length', str(len(body)))
+                        self.end_headers()
+                        self.wfile.write(body)
+                        return
+
+                    base = f'{stub.url}{parsed.path}?api-version={query["api-version"][0]}'
+                    if '$deltatoken' in query:
+                        since = int(query['$deltatoken'][0])
+                        items = [item for version, sub, item in stub.changes if sub == subscription_id and version > since]
+                        return self._json(200, {'value': items, 'deltaLink': f'{base}&$deltatoken={stub.version}'})
+
+                    etag = f'"{stub.subscription_versions.get(subscription_id, 0)}"'
+                    skip = int(query.get('$skiptoken', ['0'])[0])
+                    if skip == 0 and self.headers.get('If-None-Match') == etag:
+                        self.send_response(304)
+                        self.send_header('ETag', etag)
+                        self.end_headers()
+                        return
+                    items = sorted(stub.vms.get(subscription_id, {}).values(), key=lambda item: item['name'])
+                    page = {'value': items[skip:skip + stub.page_size]}
+                    if skip + stub.page_size < len(items):
+                        page['nextLink'] = f'{base}&$skiptoken={skip + stub.page_size}'
+                    elif stub.delta:
+                        page['deltaLink'] = f'{base}&$deltatoken={stub.version}'
+                return self._json(200, page, {'ETag': etag})
+
+        return Handler
@@ -0,0 +1,100 @@
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from inventory.admin import VirtualMachineAdmin
+from inventory.models import AzureSubscription, InventoryRollup, VirtualMachine
+from unittest import mock
+
+
+class LargeTableAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("admin", "admin@example.com", "password")
+        cls.subscriptions = [
+            AzureSubscription.objects.create(name=f"Sub{i}", subscription_id=f"{i}2345678-1234-1234-1234-123456789012")
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse("admin:inventory_virtualmachine_changelist")
+
+    def _create(self, count, start=0):
+        for i in range(start, start + count):
+            VirtualMachine.objects.create(name=f"vm{i:04d}", subscription=self.subscriptions[i % 3],
+                                          location=["westeurope", "northeurope"][i % 2], environment="prod")
+
+    def _queries(self, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_cost_is_independent_of_table_size(self):
+        cases = [{}, {"subscription__id__exact": self.subscriptions[0].pk}, {"location": "westeurope"},
+                 {"q": "vm0001"}, {"o": "2"}, {"p": "2"}]
+        self._create(5)
+        small = [self._queries(params) for params in cases]
+        self._create(300, start=5)
+        self.assertEqual([self._queries(params) for params in cases], small)
+
+    def test_unfiltered_totals_are_estimated(self):
+        self._create(120)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self._create(10, start=120)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context["cl"].result_count, 120)
+        self.assertIsNone(response.context["cl"].full_result_count)
+        response = self.client.get(self.url, {"environment": "prod"})
+        self.assertEqual(response.context["cl"].result_count, 130)
+
+    def test_filters_and_search(self):
+        self._create(6)
+        response = self.client.get(self.url, {"location": "northeurope"})
+        self.assertEqual([vm.name for vm in response.context["cl"].result_list], ["vm0001", "vm0003", "vm0005"])
+        # Filter choices come from the rollups
+        self.assertContains(response, "?location=westeurope")
+        response = self.client.get(self.url, {"q": "vm0004"})
+        self.assertEqual([vm.name for vm in response.context["cl"].result_list], ["vm0004"])
+
+    @mock.patch("inventory.admin.SubscriptionListFilter.MAX_CHOICES", 1)
+    def test_subscription_filter_choices_are_bounded(self):
+        self._create(3)
+        AzureSubscription.objects.create(name="Empty", subscription_id="92345678-1234-1234-1234-123456789012")
+        response = self.client.get(self.url, {"subscription__id__exact": self.subscriptions[2].pk})
+        self.assertEqual([vm.name for vm in response.context["cl"].result_list], ["vm0002"])
+        # The first subscription with VMs, and the selected one.
+        subscriptions = next(spec for spec in response.context["cl"].filter_specs if spec.title == "Subscription")
+        self.assertEqual([name for _pk, name in subscriptions.lookup_choices], ["Sub0", "Sub2"])
+
+        response = self.client.get(reverse("admin:inventory_storageaccount_changelist"))
+        subscriptions = next(spec for spec in response.context["cl"].filter_specs if spec.title == "Subscription")
+        self.assertEqual([name for _pk, name in subscriptions.lookup_choices], ["Empty"])
+
+    def test_change_form_uses_autocomplete(self):
+        response = self.client.get(reverse("admin:inventory_virtualmachine_add"))
+        self.assertContains(response, "admin-autocomplete")
+        self.assertNotContains(response, f'<option value="{self.subscriptions[1].pk}"')
+
+    def test_delete_in_batches(self):
+        self._create(7)
+        data = {"action": "delete_in_batches", "select_across": "1", "index": "0",
+                ACTION_CHECKBOX_NAME: [VirtualMachine.objects.first().pk]}
+        url = f"{self.url}?location=westeurope"
+        choices = self.client.get(self.url).context["action_form"].fields["action"].choices
+        self.assertEqual([name for name, label in choices if name], ["delete_in_batches"])
+
+        response = self.client.post(url, data)
+        self.assertContains(response, "delete 4 Virtual Machines")
+        self.assertEqual(VirtualMachine.objects.count(), 7)
+
+        with mock.patch.object(VirtualMachineAdmin, "batch_size", 3):
+            response = self.client.post(url, dict(data, post="yes"))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(set(VirtualMachine.objects.values_list("location", flat=True)), {"northeurope"})
+        # Deletes went through the model signals
+        self.assertEqual(sum(InventoryRollup.objects.values_list("vm_count", flat=True)), 3)
@@ -0,0 +1,59 @@
+from asgiref.sync import iscoroutinefunction
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from common.middleware import PerformanceMiddleware
+from inventory.models import AzureSubscription, VirtualMachine
+
+
+class AsyncViewTests(TestCase):
+    """Requests served through the ASGI handler, without a thread per request."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_superuser("async", "async@example.com", "password")
+        cls.subscription = AzureSubscription.objects.create(
+            name="Sub1", subscription_id="12345678-1234-1234-1234-123456789012",
+        )
+        for i in range(7):
+            VirtualMachine.objects.create(name=f"vm{i}", subscription=cls.subscription, location="westeurope")
+
+    async def test_virtual_machines(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("inventory:virtual_machines"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["page_obj"]), 5)
+        self.assertTrue(response.context["page_obj"].has_next())
+        self.assertEqual(response.context["page_obj"].paginator.count, 7)
+        # The navigation is loaded asynchronously before rendering.
+        labels = [item["label"] for item in response.context["cielo_navigation_items"]]
+        self.assertIn("Azure Subscriptions", labels)
+
+        response = await self.async_client.get(
+            reverse("inventory:virtual_machines"), {"after": response.context["page_obj"].next_cursor})
+        self.assertEqual([vm.name for vm in response.context["page_obj"]], ["vm5", "vm6"])
+
+    async def test_subscription_detail(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(
+            reverse("inventory:azure_subscription_detail", kwargs={"pk": self.subscription.pk}))
+        self.assertContains(response, "Sub1")
+        response = await self.async_client.get(
+            reverse("inventory:azure_subscription_detail", kwargs={"pk": self.subscription.pk + 100}))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_login_required(self):
+        response = await self.async_client.get(reverse("inventory:virtual_machines"))
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(CIELO_METRICS_SAMPLE_RATE=1.0)
+    async def test_middleware_counts_async_queries(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse("inventory:virtual_machines"))
+        self.assertRegex(response["Server-Timing"], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    def test_middleware_is_async_capable(self):
+        async def get_response(request):
+            pass
+
+        self.assertTrue(iscoroutinefunction(PerformanceMiddleware(get_response)))
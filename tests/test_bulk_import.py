@@ -0,0 +1,88 @@
+from io import StringIO
+from pathlib import Path
+import json
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase
+from inventory.models import AzureSubscription, StorageAccount, VirtualMachine
+
+SUBSCRIPTION_ID = "12345678-1234-1234-1234-123456789012"
+NEW_SUBSCRIPTION_ID = "22345678-1234-1234-1234-123456789012"
+
+
+def vm_id(subscription_id, name):
+    return f"/subscriptions/{subscription_id}/resourceGroups/rg/providers/Microsoft.Compute/virtualMachines/{name}"
+
+
+class ImportInventoryCommandTests(TestCase):
+    def setUp(self):
+        self.subscription = AzureSubscription.objects.create(name="Sub1", subscription_id=SUBSCRIPTION_ID)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def _write(self, name, content):
+        path = Path(self.tmpdir.name) / name
+        path.write_text(content)
+        return str(path)
+
+    def _import(self, path, *args):
+        out = StringIO()
+        call_command("import_inventory", path, *args, stdout=out)
+        return out.getvalue()
+
+    def test_ndjson_import_upserts_in_batches(self):
+        rows = [
+            {"id": vm_id(SUBSCRIPTION_ID, f"vm{i}"), "name": f"vm{i}", "type": "microsoft.compute/virtualmachines",
+             "location": "eastus", "subscriptionId": SUBSCRIPTION_ID, "tags": {"environment": "prod"}}
+            for i in range(5)
+        ]
+        rows.append({"id": "/subscriptions/x/storageAccounts/sa1", "name": "sa1",
+                     "type": "Microsoft.Storage/storageAccounts", "location": "westus",
+                     "subscriptionId": NEW_SUBSCRIPTION_ID, "sku": {"name": "Standard_LRS"},
+                     "properties": {"accessTier": "Hot"}})
+        path = self._write("export.ndjson", "\n".join(json.dumps(row) for row in rows))
+
+        output = self._import(path, "--batch-size", "2")
+        self.assertIn("rows/sec", output)
+        self.assertEqual(VirtualMachine.objects.filter(subscription=self.subscription, environment="prod").count(), 5)
+        self.assertEqual(set(VirtualMachine.objects.values_list("resource_group", flat=True)), {"rg"})
+        account = StorageAccount.objects.get(name="sa1")
+        self.assertEqual((account.sku, account.access_tier), ("Standard_LRS", "Hot"))
+        self.assertEqual(account.subscription.subscription_id, NEW_SUBSCRIPTION_ID)
+
+        # Re-importing updates the existing rows instead of duplicating them.
+        rows[0]["location"] = "northeurope"
+        self._import(self._write("again.ndjson", "\n".join(json.dumps(row) for row in rows)))
+        self.assertEqual(VirtualMachine.objects.count(), 5)
+        self.assertEqual(VirtualMachine.objects.get(name="vm0").location, "northeurope")
+
+    def test_csv_import(self):
+        path = self._write("export.csv", "\n".join([
+            "id,name,type,location,subscriptionId,tags",
+            f'{vm_id(SUBSCRIPTION_ID, "web")},web,microsoft.compute/virtualmachines,eastus,{SUBSCRIPTION_ID},"{{""environment"": ""dev""}}"',
+            f"{vm_id(SUBSCRIPTION_ID, 'web')},web,microsoft.compute/virtualmachines,westus,{SUBSCRIPTION_ID},",
+            ",,microsoft.compute/virtualmachines,eastus,,",
+        ]))
+        output = self._import(path)
+        vm = VirtualMachine.objects.get()
+        self.assertEqual((vm.name, vm.location, vm.subscription), ("web", "westus", self.subscription))
+        self.assertIn("1 skipped", output)
+
+    def test_csv_rows_with_extra_fields_are_skipped(self):
+        path = self._write("export.csv", "\n".join([
+            "id,name,type,location,subscriptionId",
+            f"{vm_id(SUBSCRIPTION_ID, 'web')},web,microsoft.compute/virtualmachines,eastus,{SUBSCRIPTION_ID},extra",
+            f"{vm_id(SUBSCRIPTION_ID, 'db')},db,microsoft.compute/virtualmachines,eastus,{SUBSCRIPTION_ID}",
+        ]))
+        with self.assertLogs("inventory.bulk_import", "WARNING") as logs:
+            self._import(path)
+        self.assertEqual(list(VirtualMachine.objects.values_list("name", flat=True)), ["db"])
+        self.assertIn("Skipping CSV line 2", logs.output[0])
+
+    def test_unknown_subscriptions_can_be_skipped(self):
+        path = self._write("export.ndjson", json.dumps(
+            {"id": vm_id(NEW_SUBSCRIPTION_ID, "vm"), "name": "vm", "subscriptionId": NEW_SUBSCRIPTION_ID}))
+        self._import(path, "--no-create-subscriptions")
+        self.assertFalse(VirtualMachine.objects.exists())
+        self.assertFalse(AzureSubscription.objects.filter(subscription_id=NEW_SUBSCRIPTION_ID).exists())
@@ -0,0 +1,199 @@
+from datetime import timedelta
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from inventory import columnar, events, versions
+from inventory.bulk_import import InventoryImporter
+from inventory.models import AzureSubscription, InventoryTombstone, VirtualMachine
+from unittest import mock, skipUnless
+import threading
+
+SUBSCRIPTION_ID = "12345678-1234-1234-1234-123456789012"
+
+
+class ChangeVersionTests(TestCase):
+    def test_writes_are_stamped_and_deletes_leave_tombstones(self):
+        vm = VirtualMachine.objects.create(name="vm1")
+        vm.refresh_from_db()
+        self.assertEqual(vm.change_version, versions.current_version(VirtualMachine))
+        vm.location = "westeurope"
+        vm.save(update_fields=["location"])
+        self.assertEqual(VirtualMachine.objects.get().change_version, versions.current_version(VirtualMachine))
+
+        pk = vm.pk
+        vm.delete()
+        tombstone = InventoryTombstone.objects.get()
+        self.assertEqual((tombstone.model, tombstone.object_id, tombstone.version),
+                         ("inventory.virtualmachine", pk, versions.current_version(VirtualMachine)))
+
+    def test_bulk_writers_stamp_their_batches(self):
+        rows = [{"id": f"/subscriptions/{SUBSCRIPTION_ID}/resourceGroups/rg/providers/Microsoft.Compute/virtualMachines/vm{i}",
+                 "name": f"vm{i}", "subscriptionId": SUBSCRIPTION_ID} for i in range(4)]
+        before = versions.current_version(VirtualMachine)
+        InventoryImporter(batch_size=2).run(rows)
+        self.assertEqual(sorted(VirtualMachine.objects.values_list("change_version", flat=True)),
+                         [before + 1, before + 1, before + 2, before + 2])
+
+    def test_deleting_a_subscription_stamps_its_vms(self):
+        subscription = AzureSubscription.objects.create(name="Sub1", subscription_id=SUBSCRIPTION_ID)
+        VirtualMachine.objects.create(name="vm1", subscription=subscription)
+        subscription.delete()
+        self.assertEqual(VirtualMachine.objects.get().change_version, versions.current_version(VirtualMachine))
+
+    @override_settings(CIELO_INVENTORY_TOMBSTONE_RETENTION=60)
+    def test_old_tombstones_are_pruned(self):
+        InventoryTombstone.objects.create(model="inventory.virtualmachine", object_id=1, version=1,
+                                          deleted_at=timezone.now() - timedelta(seconds=120))
+        InventoryTombstone.objects.create(model="inventory.virtualmachine", object_id=2, version=2)
+        self.assertEqual(versions.prune_tombstones(), 1)
+        self.assertEqual(list(InventoryTombstone.objects.values_list("object_id", flat=True)), [2])
+
+
+class ColumnarCountTests(TestCase):
+    """Runs against the index when NumPy is installed, else the rollup fallback."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.subscriptions = [
+            AzureSubscription.objects.create(name=f"Sub{i}", subscription_id=f"{i}2345678-1234-1234-1234-123456789012")
+            for i in range(2)
+        ]
+        for i in range(12):
+            VirtualMachine.objects.create(name=f"vm{i}", subscription=cls.subscriptions[i % 2],
+                                          location=["westeurope", "northeurope", "eastus"][i % 3],
+                                          environment="prod" if i < 8 else "dev")
+        VirtualMachine.objects.create(name="orphan", location="westeurope", environment="prod")
+
+    def setUp(self):
+        columnar.index.clear()
+
+    def test_count(self):
+        self.assertEqual(columnar.count(), {(): 13})
+        self.assertEqual(columnar.count(environment="dev"), {(): 4})
+        self.assertEqual(columnar.count(location=["westeurope", "eastus"], environment="prod"), {(): 6})
+        self.assertEqual(columnar.count(location="nowhere"), {(): 0})
+        self.assertEqual(columnar.count(subscription=None), {(): 1})
+
+    def test_group_by(self):
+        groups = columnar.count(["location"])
+        self.assertEqual(dict(groups), {("westeurope",): 5, ("northeurope",): 4, ("eastus",): 4})
+        self.assertEqual(next(iter(groups)), ("westeurope",))
+        self.assertEqual(columnar.count(["subscription", "environment"], location="westeurope"), {
+            (self.subscriptions[0].pk, "prod"): 2, (self.subscriptions[1].pk, "prod"): 1,
+            (self.subscriptions[1].pk, "dev"): 1, (None, "prod"): 1,
+        })
+
+    def test_unknown_dimensions_are_rejected(self):
+        with self.assertRaises(ValueError):
+            columnar.count(["name"])
+        with self.assertRaises(ValueError):
+            columnar.count(resource_group="rg")
+
+    @override_settings(CIELO_INVENTORY_COUNT_MODE="columnar")
+    def test_count_mode(self):
+        self.client.force_login(get_user_model().objects.create_user("viewer", password="password"))
+        response = self.client.get(reverse("inventory:azure_subscription_detail", kwargs={"pk": self.subscriptions[0].pk}))
+        self.assertEqual(response.context["breakdown"].total, 6)
+        response = self.client.get(reverse("inventory:virtual_machines"), {"environment": "dev"})
+        self.assertEqual(response.context["page_obj"].paginator.count, 4)
+
+
+@skipUnless(columnar.np, "NumPy is not installed")
+@override_settings(CIELO_COLUMNAR_REFRESH_SECONDS=0)
+class ColumnarIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.subscription = AzureSubscription.objects.create(name="Sub1", subscription_id=SUBSCRIPTION_ID)
+        cls.vms = [VirtualMachine.objects.create(name=f"vm{i}", subscription=cls.subscription,
+                                                 location="westeurope", environment="prod") for i in range(5)]
+
+    def setUp(self):
+        self.index = columnar.ColumnarIndex()
+
+    def test_changes_are_merged_incrementally(self):
+        snapshot = self.index.get_snapshot()
+        self.assertEqual(len(snapshot), 5)
+
+        vm = self.vms[0]
+        vm.location = "northeurope"
+        vm.save()
+        self.vms[1].delete()
+        VirtualMachine.objects.create(name="vm5", location="eastus", environment="dev")
+        with CaptureQueriesContext(connection) as queries:
+            snapshot = self.index.get_snapshot()
+        self.assertFalse([query for query in queries if "inventory_virtualmachine" in query["sql"]
+                          and "change_version" not in query["sql"]])
+        self.assertEqual(len(snapshot), 5)
+        self.assertEqual(snapshot.count(("location",), {}),
+                         {("westeurope",): 3, ("northeurope",): 1, ("eastus",): 1})
+        self.assertEqual(snapshot.version, versions.current_version(VirtualMachine))
+
+    def test_unchanged_inventory_reads_only_the_version(self):
+        self.index.get_snapshot()
+        with CaptureQueriesContext(connection) as queries:
+            self.index.get_snapshot()
+        self.assertEqual(len(queries), 1)
+        self.assertIn("inventory_inventoryversion", queries[0]["sql"])
+
+    @override_settings(CIELO_COLUMNAR_REFRESH_SECONDS=60)
+    def test_refresh_is_throttled(self):
+        self.index.get_snapshot()
+        VirtualMachine.objects.create(name="vm5")
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(self.index.get_snapshot()), 5)
+        self.assertEqual(len(queries), 0)
+
+    def test_sparse_group_keys(self):
+        with mock.patch.object(columnar, "DENSE_GROUPS_LIMIT", 0):
+            groups = self.index.get_snapshot().count(("subscription", "location"), {})
+        self.assertEqual(groups, {(self.subscription.pk, "westeurope"): 5})
+
+    def test_matches_the_rollups(self):
+        VirtualMachine.objects.create(name="vm5", location="eastus", environment="dev")
+        for group_by, filters in [((), {}), (("location", "environment"), {}),
+                                  (("environment",), {"subscription": [self.subscription.pk, None]})]:
+            group_by, filters = columnar._normalise(group_by, filters)
+            self.assertEqual(self.index.get_snapshot().count(group_by, filters),
+                             columnar._rollup_count(group_by, filters))
+
+
+@override_settings(CIELO_EVENTS_POLL_SECONDS=0)
+class ChangeVersionVisibilityTests(TransactionTestCase):
+    """Readers on other connections never see a version before the rows stamped with it."""
+
+    def _refresh_in_another_thread(self, feed):
+        def refresh():
+            try:
+                feed.refresh()
+            except OperationalError:
+                # The write transaction holds the tables: nothing is visible yet.
+                pass
+            finally:
+                connections.close_all()
+        thread = threading.Thread(target=refresh)
+        thread.start()
+        thread.join()
+
+    def test_refresh_between_bump_and_stamp(self):
+        vm = VirtualMachine.objects.create(name="vm1", location="westeurope")
+        feed = events.ChangeFeed()
+        feed.refresh()
+        _events, cursor = feed.read(None)
+
+        bump = versions.next_version
+
+        def next_version(model):
+            version = bump(model)
+            self._refresh_in_another_thread(feed)
+            return version
+
+        vm.location = "northeurope"
+        with mock.patch.object(versions, "next_version", next_version):
+            vm.save()
+        feed.refresh()
+        found, _cursor = feed.read(cursor)
+        self.assertEqual([(event.name, event.data.get("location")) for event in found],
+                         [("virtualmachine.updated", "northeurope"), ("counts", None)])
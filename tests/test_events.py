@@ -0,0 +1,135 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from inventory import events
+from inventory.bulk_import import InventoryImporter
+from inventory.models import AzureSubscription, VirtualMachine
+from common.pagination import encode_cursor
+from unittest import mock
+import time
+
+SUBSCRIPTION_ID = "12345678-1234-1234-1234-123456789012"
+
+
+@override_settings(CIELO_EVENTS_POLL_SECONDS=0)
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.feed = events.ChangeFeed()
+        self.subscription = AzureSubscription.objects.create(name="Sub1", subscription_id=SUBSCRIPTION_ID)
+        self.vm = VirtualMachine.objects.create(name="vm1", subscription=self.subscription, location="westeurope")
+        self.feed.update()
+        _events, self.cursor = self.feed.read(None)
+
+    def _read(self):
+        self.feed.update()
+        found, self.cursor = self.feed.read(self.cursor)
+        return [(event.name, event.data) for event in found]
+
+    def test_changes(self):
+        self.assertEqual(self._read(), [])
+        pk = self.vm.pk
+        self.vm.location = "northeurope"
+        self.vm.save()
+        self.assertEqual(self._read(), [
+            ("virtualmachine.updated", {"id": pk, "name": "vm1", "subscription_id": self.subscription.pk,
+                                        "location": "northeurope", "environment": "", "resource_group": ""}),
+            ("counts", {"total": 1, "subscriptions": {str(self.subscription.pk): 1}}),
+        ])
+
+        vm2 = VirtualMachine.objects.create(name="vm2")
+        self.vm.delete()
+        self.subscription.name = "Production"
+        self.subscription.save()
+        self.assertEqual(self._read(), [
+            ("virtualmachine.created", {"id": vm2.pk, "name": "vm2", "subscription_id": None,
+                                        "location": "", "environment": "", "resource_group": ""}),
+            ("virtualmachine.deleted", {"id": pk}),
+            ("azuresubscription.updated", {"id": self.subscription.pk, "name": "Production",
+                                           "subscription_id": SUBSCRIPTION_ID}),
+            ("counts", {"total": 1, "subscriptions": {"": 1}}),
+        ])
+        self.assertEqual(self._read(), [])
+
+    @override_settings(CIELO_EVENTS_MAX_BATCH=3)
+    def test_large_batches_reset(self):
+        InventoryImporter().run([{"id": f"/vm/{i}", "name": f"bulk{i}"} for i in range(5)])
+        self.assertEqual(self._read(), [("reset", {"model": "virtualmachine"}),
+                                        ("counts", {"total": 6, "subscriptions": {str(self.subscription.pk): 1, "": 5}})])
+        VirtualMachine.objects.create(name="vm2")
+        self.assertEqual([name for name, _data in self._read()], ["virtualmachine.created", "counts"])
+
+    def test_cursors_behind_the_feed_reset(self):
+        for i in range(3):
+            VirtualMachine.objects.create(name=f"vm{i + 2}")
+        with mock.patch.object(events, "MAX_EVENTS", 2):
+            self.feed.update()
+        found, _cursor = self.feed.read(self.cursor)
+        self.assertEqual([event.name for event in found], ["reset"])
+
+
+@override_settings(CIELO_EVENTS_POLL_SECONDS=0, CIELO_EVENTS_STREAM_SECONDS=0)
+class EventStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer = get_user_model().objects.create_user("viewer", password="password")
+        cls.viewer.user_permissions.add(Permission.objects.get(codename="view_virtualmachine"))
+        cls.subscription = AzureSubscription.objects.create(name="Sub1", subscription_id=SUBSCRIPTION_ID)
+
+    def setUp(self):
+        events.feed.clear()
+
+    async def _stream(self, user, cursor):
+        await self.async_client.aforce_login(user)
+        response = await self.async_client.get(reverse("inventory:events"), headers={"Last-Event-ID": cursor})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return "".join([chunk.decode() async for chunk in response.streaming_content])
+
+    async def test_stream_is_filtered_by_permissions(self):
+        response = await self.async_client.get(reverse("inventory:events"))
+        self.assertEqual(response.status_code, 302)
+
+        await events.feed.aread(None)
+        cursor = encode_cursor(list(events.feed.state[0]))
+        await VirtualMachine.objects.acreate(name="vm1", subscription=self.subscription)
+        await AzureSubscription.objects.acreate(name="Sub2", subscription_id="22345678-1234-1234-1234-123456789012")
+
+        body = await self._stream(self.viewer, cursor)
+        self.assertTrue(body.startswith("retry: "))
+        self.assertIn("event: virtualmachine.created\ndata: {", body)
+        self.assertIn("event: counts\n", body)
+        self.assertNotIn("azuresubscription", body)
+        self.assertEqual(events.parse_cursor(body.rsplit("id: ", 1)[1].strip()), events.feed.state[0])
+
+        other = await get_user_model().objects.acreate_user("other", password="password")
+        body = await self._stream(other, cursor)
+        self.assertNotIn("event:", body)
+        self.assertIn("id: ", body)
+
+    @override_settings(CIELO_EVENTS_STREAM_SECONDS=60)
+    def test_wsgi_stream_flushes_events_as_they_come(self):
+        self.client.force_login(self.viewer)
+        events.feed.update()
+        cursor = encode_cursor(list(events.feed.state[0]))
+        VirtualMachine.objects.create(name="vm1", subscription=self.subscription)
+        started = time.monotonic()
+        response = self.client.get(reverse("inventory:events"), headers={"Last-Event-ID": cursor})
+        self.addCleanup(response.close)
+        chunks = iter(response.streaming_content)
+        self.assertTrue(next(chunks).startswith(b"retry: "))
+        self.assertIn(b"event: virtualmachine.created\n", next(chunks))
+        # Sent while the stream still had most of its minute to run
+        self.assertLess(time.monotonic() - started, 30)
+
+    def test_wsgi_pages_do_not_follow_the_stream(self):
+        self.client.force_login(self.viewer)
+        response = self.client.get(reverse("inventory:virtual_machines"))
+        self.assertNotContains(response, "data-events-url")
+        self.assertNotContains(response, "live_updates.js")
+
+    async def test_pages_link_the_stream_at_their_version(self):
+        await self.async_client.aforce_login(self.viewer)
+        response = await self.async_client.get(reverse("inventory:virtual_machines"))
+        self.assertContains(response, 'data-events-url="/inventory/events/?cursor=')
+        self.assertEqual(events.parse_cursor(response.context["events_url"].split("cursor=")[1]),
+                         events.parse_cursor(await events.sync_to_async(events.current_cursor)()))
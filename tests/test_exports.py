@@ -0,0 +1,73 @@
+from io import StringIO
+from pathlib import Path
+import csv
+import json
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from inventory.models import AzureSubscription, StorageAccount, VirtualMachine
+
+SUBSCRIPTION_ID = "12345678-1234-1234-1234-123456789012"
+
+
+class InventoryExportTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="exporter", password="password")
+        self.user.user_permissions.set(Permission.objects.filter(
+            codename__in=["view_virtualmachine", "view_storageaccount", "view_azuresubscription"]))
+        self.client.force_login(self.user)
+        subscription = AzureSubscription.objects.create(name="Sub1", subscription_id=SUBSCRIPTION_ID)
+        for i in range(3):
+            VirtualMachine.objects.create(name=f"vm-{i}", location="eastus", environment="Production",
+                                          subscription=subscription, resource_id=f"/vm/{i}")
+        VirtualMachine.objects.create(name="orphan", location="westeurope", environment="Test")
+        StorageAccount.objects.create(name="logs", location="eastus", sku="Standard_LRS", access_tier="Hot",
+                                      resource_id="/sa/logs", subscription=subscription)
+
+    def _export(self, resource, fmt, **params):
+        response = self.client.get(reverse("inventory:export", kwargs={"resource": resource, "fmt": fmt}), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_ndjson_virtual_machines(self):
+        rows = [json.loads(line) for line in self._export("virtual-machines", "ndjson").splitlines()]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0], {
+            "type": "microsoft.compute/virtualmachines", "id": "/vm/0", "name": "vm-0", "location": "eastus",
+            "environment": "Production", "resourceGroup": "", "subscriptionId": SUBSCRIPTION_ID,
+        })
+        self.assertIsNone(rows[3]["subscriptionId"])
+
+    def test_csv_storage_accounts_and_subscriptions(self):
+        rows = list(csv.DictReader(StringIO(self._export("storage-accounts", "csv"))))
+        self.assertEqual([(row["name"], row["accessTier"], row["subscriptionId"]) for row in rows],
+                         [("logs", "Hot", SUBSCRIPTION_ID)])
+        rows = list(csv.DictReader(StringIO(self._export("subscriptions", "csv"))))
+        self.assertEqual(rows, [{"subscriptionId": SUBSCRIPTION_ID, "name": "Sub1"}])
+
+    def test_listing_filters_apply(self):
+        lines = self._export("virtual-machines", "ndjson", location="westeurope").splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["orphan"])
+
+    def test_export_round_trips_through_import(self):
+        content = self._export("virtual-machines", "csv")
+        VirtualMachine.objects.filter(resource_id="/vm/1").update(location="northeurope")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "vms.csv"
+            path.write_text(content)
+            call_command("import_inventory", str(path), stdout=StringIO())
+        self.assertEqual(VirtualMachine.objects.get(resource_id="/vm/1").location, "eastus")
+
+    def test_unknown_export_and_missing_permission(self):
+        response = self.client.get(reverse("inventory:export", kwargs={"resource": "disks", "fmt": "csv"}))
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse("inventory:export", kwargs={"resource": "subscriptions", "fmt": "xml"}))
+        self.assertEqual(response.status_code, 404)
+        self.user.user_permissions.clear()
+        response = self.client.get(reverse("inventory:export", kwargs={"resource": "subscriptions", "fmt": "csv"}))
+        self.assertEqual(response.status_code, 403)
@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from unittest import skipUnless
+from common.pagination import KeysetPaginator
+from inventory.filters import filter_virtual_machines
+from inventory.models import AzureSubscription, VirtualMachine
+
+LOCATIONS = ["eastus", "westus", "northeurope"]
+ENVIRONMENTS = ["Production", "Development"]
+
+
+class VirtualMachineFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(username="testuser", password="pass123")
+        cls.subscriptions = [
+            AzureSubscription.objects.create(name=f"Sub{i}", subscription_id=f"{i}2345678-1234-1234-1234-123456789012")
+            for i in range(2)
+        ]
+        VirtualMachine.objects.bulk_create([
+            VirtualMachine(
+                name=f"{'web' if i % 2 else 'db'}-{i:03d}",
+                location=LOCATIONS[i % 3],
+                environment=ENVIRONMENTS[i % 2],
+                subscription=cls.subscriptions[i % 2],
+            )
+            for i in range(60)
+        ])
+
+    def setUp(self):
+        self.client.login(username="testuser", password="pass123")
+
+    def _names(self, response):
+        return [vm.name for vm in response.context["page_obj"]]
+
+    def test_filters_combine(self):
+        response = self.client.get(reverse("inventory:virtual_machines"), {
+            "location": "eastus", "environment": "Development", "name": "web",
+            "subscription": self.subscriptions[1].pk,
+        })
+        expected = list(VirtualMachine.objects.filter(
+            location="eastus", environment="Development", name__startswith="web",
+            subscription=self.subscriptions[1],
+        ).order_by("name").values_list("name", flat=True)[:5])
+        self.assertEqual(self._names(response), expected)
+        self.assertEqual(response.context["page_obj"].paginator.count, 10)
+
+    def test_descending_sort_walks_all_pages(self):
+        url = reverse("inventory:virtual_machines")
+        params = {"sort": "-location", "environment": "Production"}
+        response = self.client.get(url, params)
+        names = self._names(response)
+        while response.context["page_obj"].has_next():
+            response = self.client.get(url, {**params, "after": response.context["page_obj"].next_cursor})
+            names.extend(self._names(response))
+        expected = list(VirtualMachine.objects.filter(environment="Production")
+                        .order_by("-location", "-name", "-id").values_list("name", flat=True))
+        self.assertEqual(names, expected)
+
+    def test_invalid_sort_and_subscription_are_ignored(self):
+        response = self.client.get(reverse("inventory:virtual_machines"), {"sort": "password", "subscription": "x"})
+        self.assertEqual(response.context["sort"], "name")
+        self.assertEqual(response.context["filters"], {})
+
+
+@skipUnless(connection.vendor == "sqlite", "query plans are checked with SQLite's EXPLAIN QUERY PLAN")
+class VirtualMachineQueryPlanTests(TestCase):
+    """Filtered and sorted listings must be answered from an index, without a sort step."""
+
+    def _plan(self, filters, ordering, after=None):
+        queryset = filter_virtual_machines(VirtualMachine.objects.all(), filters)
+        paginator = KeysetPaginator(queryset, 5, ordering=ordering, count_mode=None)
+        if after:
+            queryset = paginator._seek(queryset, after)
+        return queryset.order_by(*paginator._order_by())[:6].explain()
+
+    def assertIndexed(self, plan, index):
+        self.assertIn(index, plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_filter_plans(self):
+        self.assertIndexed(self._plan({"location": "eastus"}, ("name",)), "inventory_vm_location_name_idx")
+        self.assertIndexed(self._plan({"environment": "UAT"}, ("name",)), "inventory_vm_env_name_idx")
+        self.assertIndexed(self._plan({"subscription": "1"}, ("name",)), "inventory_vm_sub_name_idx")
+        self.assertIndexed(self._plan({"name": "web"}, ("name",)), "inventory_vm_name_id_idx")
+
+    def test_sort_plans(self):
+        self.assertIndexed(self._plan({}, ("-location", "-name")), "inventory_vm_location_name_idx")
+        self.assertIndexed(self._plan({}, ("environment", "name"), after=["UAT", "web-1", 10]), "inventory_vm_env_name_idx")
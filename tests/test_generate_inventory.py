@@ -0,0 +1,22 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from inventory.models import AzureSubscription, StorageAccount, VirtualMachine
+
+
+class GenerateInventoryDataTests(TestCase):
+    def _generate(self, seed):
+        call_command("generate_inventory_data", vms=50, subscriptions=3, seed=seed, stdout=StringIO())
+        return sorted(VirtualMachine.objects.values_list("resource_id", "location", "environment", "subscription__subscription_id"))
+
+    def test_counts(self):
+        self._generate(seed=1)
+        self.assertEqual(AzureSubscription.objects.count(), 3)
+        self.assertEqual(VirtualMachine.objects.count(), 50)
+        self.assertEqual(StorageAccount.objects.count(), 5)
+
+    def test_same_seed_is_reproducible(self):
+        first = self._generate(seed=7)
+        VirtualMachine.objects.all().delete()
+        self.assertEqual(self._generate(seed=7), first)
@@ -0,0 +1,156 @@
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+import json
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from common import jobs
+from common.models import Job
+from inventory.models import AzureSubscription, VirtualMachine
+
+SUBSCRIPTION_ID = "12345678-1234-1234-1234-123456789012"
+
+
+def count_to(job, to):
+    for i in range(1, to + 1):
+        job.progress(i, to, f"step {i}")
+    return {"counted": to}
+
+
+def explode(job):
+    raise RuntimeError("boom")
+
+
+def cancel_midway(job):
+    job.progress(1, 3)
+    Job.objects.filter(pk=job.pk).update(cancel_requested=True)
+    job.cancelled.set()  # what the heartbeat thread does once it sees the request
+    job.progress(2, 3)
+    return "unreachable"
+
+
+TEST_JOBS = {"tests.count": count_to, "tests.explode": explode, "tests.cancel": cancel_midway}
+
+
+@override_settings(CIELO_JOB_RETRY_DELAY=10)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(jobs.registry.jobs, TEST_JOBS)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _run(self, job):
+        self.assertEqual(jobs.claim("test-worker", 1), [job.pk])
+        jobs.execute(job.pk)
+        job.refresh_from_db()
+        return job
+
+    def test_unknown_jobs_are_rejected(self):
+        with self.assertRaises(KeyError):
+            jobs.enqueue("tests.missing")
+
+    def test_job_succeeds_with_progress_and_result(self):
+        job = self._run(jobs.enqueue("tests.count", {"to": 3}))
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual((job.progress_current, job.progress_total, job.progress_message), (3, 3, "step 3"))
+        self.assertEqual(job.result, {"counted": 3})
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_failures_are_retried_with_backoff(self):
+        job = self._run(jobs.enqueue("tests.explode", max_attempts=2))
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn("RuntimeError: boom", job.error)
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=5))
+        # Not due yet.
+        self.assertEqual(jobs.claim("test-worker", 1), [])
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        job = self._run(job)
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+
+    def test_cancel(self):
+        queued = jobs.enqueue("tests.count", {"to": 1})
+        self.assertTrue(jobs.cancel(queued))
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.CANCELLED)
+        self.assertEqual(jobs.claim("test-worker", 1), [])
+        self.assertFalse(jobs.cancel(queued))
+
+        job = self._run(jobs.enqueue("tests.cancel"))
+        self.assertEqual(job.status, Job.CANCELLED)
+        self.assertIsNone(job.result)
+
+    def test_claim_is_exclusive_and_ordered(self):
+        first, second, third = (jobs.enqueue("tests.count", {"to": 1}) for _ in range(3))
+        self.assertEqual(jobs.claim("worker-a", 2), [first.pk, second.pk])
+        self.assertEqual(jobs.claim("worker-b", 2), [third.pk])
+        self.assertEqual(Job.objects.get(pk=first.pk).worker, "worker-a")
+
+    def test_stale_jobs_are_recovered(self):
+        job = jobs.enqueue("tests.count", {"to": 1}, max_attempts=1)
+        retried = jobs.enqueue("tests.count", {"to": 1}, max_attempts=2)
+        jobs.claim("dead-worker", 2)
+        Job.objects.update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.recover_stale(), 2)
+        self.assertEqual(Job.objects.get(pk=job.pk).status, Job.FAILED)
+        self.assertEqual(Job.objects.get(pk=retried.pk).status, Job.QUEUED)
+
+    def test_inline_worker_runs_due_jobs(self):
+        for to in (1, 2):
+            jobs.enqueue("tests.count", {"to": to})
+        out = StringIO()
+        call_command("run_jobs", "--processes", "0", "--once", stdout=out)
+        self.assertIn("Executed 2 jobs.", out.getvalue())
+        self.assertEqual(set(Job.objects.values_list("status", flat=True)), {Job.SUCCEEDED})
+
+
+class JobViewTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="operator", password="password")
+        self.user.user_permissions.add(Permission.objects.get(codename="add_virtualmachine"))
+        self.client.force_login(self.user)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def test_upload_is_imported_by_a_job(self):
+        AzureSubscription.objects.create(name="Sub1", subscription_id=SUBSCRIPTION_ID)
+        rows = [{"id": f"/subscriptions/{SUBSCRIPTION_ID}/resourceGroups/rg/providers/Microsoft.Compute/virtualMachines/vm{i}",
+                 "name": f"vm{i}", "subscriptionId": SUBSCRIPTION_ID} for i in range(3)]
+        upload = SimpleUploadedFile("export.ndjson", "".join(json.dumps(row) + "\n" for row in rows).encode())
+        with self.settings(CIELO_IMPORT_DIR=self.tmpdir.name):
+            response = self.client.post(reverse("inventory:import"), {"file": upload})
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], Job.QUEUED)
+        self.assertFalse(VirtualMachine.objects.exists())
+
+        jobs.Worker(processes=0).run(once=True)
+        status = self.client.get(response.json()["status_url"]).json()
+        self.assertEqual(status["status"], Job.SUCCEEDED)
+        self.assertEqual(status["result"]["virtual_machines"], 3)
+        self.assertEqual(VirtualMachine.objects.count(), 3)
+        self.assertEqual(list(Path(self.tmpdir.name).iterdir()), [])
+
+    def test_enqueue_requires_permission(self):
+        response = self.client.post(reverse("inventory:sync"))
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get(reverse("inventory:import")).status_code, 405)
+
+    def test_jobs_are_visible_to_their_owner_and_staff(self):
+        job = jobs.enqueue("inventory.sync", user=self.user)
+        self.assertEqual(self.client.get(reverse("job_status", kwargs={"pk": job.pk})).status_code, 200)
+        other = get_user_model().objects.create_user(username="other", password="password")
+        self.client.force_login(other)
+        self.assertEqual(self.client.get(reverse("job_status", kwargs={"pk": job.pk})).status_code, 404)
+        other.is_staff = True
+        other.save()
+        response = self.client.post(reverse("job_cancel", kwargs={"pk": job.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["status"], Job.CANCELLED)
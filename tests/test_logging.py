@@ -0,0 +1,42 @@
+import json
+import logging
+import logging.handlers
+
+from django.conf import settings
+from django.test import SimpleTestCase
+from django.utils.log import configure_logging
+from common import log
+from common.log import JsonFormatter
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class LoggingPipelineTests(SimpleTestCase):
+    def test_configure_starts_the_queue_listener(self):
+        self.assertIsInstance(logging.getHandlerByName("queue"), logging.handlers.QueueHandler)
+        self.addCleanup(configure_logging, settings.LOGGING_CONFIG, settings.LOGGING)
+        log.configure({
+            "version": 1,
+            "disable_existing_loggers": False,
+            "handlers": {
+                "target": {"class": "tests.test_logging.ListHandler"},
+                "queue": {"class": "logging.handlers.QueueHandler", "handlers": ["target"]},
+            },
+            "loggers": {"cielo.tests.queue": {"handlers": ["queue"], "level": "INFO", "propagate": False}},
+        })
+        target = logging.getHandlerByName("target")
+        logging.getLogger("cielo.tests.queue").warning("Synced %d subscriptions", 3)
+        log.stop_listeners()  # drains the queue
+        self.assertEqual([record.getMessage() for record in target.records], ["Synced 3 subscriptions"])
+
+    def test_json_formatter(self):
+        record = logging.LogRecord("inventory.sync", logging.ERROR, __file__, 1, "Sync of %s failed", ("sub",), None)
+        entry = json.loads(JsonFormatter().format(record))
+        self.assertEqual((entry["level"], entry["logger"], entry["message"]), ("ERROR", "inventory.sync", "Sync of sub failed"))
@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from common.metrics import registry as metrics_registry
+
+
+class PerformanceMiddlewareTests(TestCase):
+    def setUp(self):
+        metrics_registry.reset()
+        self.user = get_user_model().objects.create_user(username="metrics", password="password")
+        self.staff = get_user_model().objects.create_user(username="ops", password="password", is_staff=True)
+
+    @override_settings(CIELO_METRICS_SAMPLE_RATE=1.0)
+    def test_sampled_request_records_queries_and_server_timing(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("inventory:virtual_machines"))
+        self.assertRegex(response["Server-Timing"], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries"$')
+        key = ("inventory:virtual_machines", "GET")
+        self.assertEqual(metrics_registry.latency[key].count, 1)
+        self.assertEqual(metrics_registry.responses[key + ("200",)], 1)
+        self.assertEqual(metrics_registry.response_bytes[key], len(response.content))
+        self.assertGreater(metrics_registry.queries[key], 0)
+
+    @override_settings(CIELO_METRICS_SAMPLE_RATE=0)
+    def test_unsampled_request_skips_database_metrics(self):
+        response = self.client.get("/does-not-exist/")
+        self.assertRegex(response["Server-Timing"], r'^app;dur=[\d.]+$')
+        self.assertEqual(metrics_registry.responses[("<unmatched>", "GET", "404")], 1)
+        self.assertEqual(dict(metrics_registry.queries), {})
+
+    @override_settings(CIELO_METRICS_TOKEN="s3cret")
+    def test_metrics_endpoint_is_protected(self):
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 403)
+        self.assertEqual(self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong").status_code, 403)
+        self.client.logout()
+        response = self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer s3cret")
+        self.assertEqual(response.status_code, 200)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(reverse("metrics")).status_code, 200)
+        # A stale token does not lock staff out.
+        self.assertEqual(self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer wrong").status_code, 200)
+
+    def test_metrics_render_prometheus_text(self):
+        metrics_registry.observe('inventory:search', 'GET', 200, 0.02, size=100, queries=3, query_seconds=0.004)
+        self.client.force_login(self.staff)
+        body = self.client.get(reverse("metrics")).content.decode()
+        self.assertIn('# TYPE cielo_http_request_duration_seconds histogram', body)
+        self.assertIn('cielo_http_request_duration_seconds_bucket{view="inventory:search",method="GET",le="0.01"} 0', body)
+        self.assertIn('cielo_http_request_duration_seconds_bucket{view="inventory:search",method="GET",le="0.025"} 1', body)
+        self.assertIn('cielo_http_request_duration_seconds_bucket{view="inventory:search",method="GET",le="+Inf"} 1', body)
+        self.assertIn('cielo_http_responses_total{view="inventory:search",method="GET",status="200"} 1', body)
+        self.assertIn('cielo_db_queries_total{view="inventory:search",method="GET"} 3', body)
+
+    def test_debug_logging_only_in_debug_mode(self):
+        self.client.force_login(self.user)
+        with self.assertNoLogs("common.middleware", level="DEBUG"):
+            self.client.get(reverse("inventory:storage_accounts"))
+        # The middleware chain is built on a client's first request.
+        client = Client()
+        client.force_login(self.user)
+        with override_settings(CIELO_DEBUG_REQUEST_LOGGING=True), \
+                self.assertLogs("common.middleware", level="DEBUG") as logs:
+            client.post(reverse("users:change_password"), {"old_password": "password"})
+        output = "\n".join(logs.output)
+        self.assertIn("Session data", output)
+        self.assertIn("'old_password': '********'", output)
+        self.assertNotIn("['password']", output)
@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from common.context_processors import cielo_navigation_context
+from common.navigation import children_url
+from inventory.models import AzureSubscription, VirtualMachine
+
+
+class NavigationRegistryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.superuser = get_user_model().objects.create_superuser(
+            username="navadmin", email="navadmin@example.com", password="pass123"
+        )
+        self.subscription = AzureSubscription.objects.create(
+            name="Sub1",
+            subscription_id="12345678-1234-1234-1234-123456789012",
+        )
+
+    def _navigation_items(self, user):
+        request = self.factory.get("/")
+        request.user = user
+        return cielo_navigation_context(request)["cielo_navigation_items"]
+
+    def _subscriptions_item(self, items):
+        for item in items:
+            if item.get("children_url") == reverse("navigation_children", kwargs={"node": "inventory.subscriptions"}):
+                return item
+        return None
+
+    def test_steady_state_only_reads_the_version(self):
+        self._navigation_items(self.superuser)
+        with self.assertNumQueries(1):
+            items = self._navigation_items(self.superuser)
+        self.assertIsNotNone(self._subscriptions_item(items))
+        self.assertFalse(any(item.get("sub_items") for item in items))
+
+    def test_subscription_save_and_delete_invalidate_cache(self):
+        self.subscription.delete()
+        self.assertIsNone(self._subscriptions_item(self._navigation_items(self.superuser)))
+        AzureSubscription.objects.create(
+            name="Sub2", subscription_id="22345678-1234-1234-1234-123456789012"
+        )
+        self.assertIsNotNone(self._subscriptions_item(self._navigation_items(self.superuser)))
+
+    def test_changes_made_by_other_processes_invalidate(self):
+        self.assertIsNotNone(self._subscriptions_item(self._navigation_items(self.superuser)))
+        # Another process, with a cache of its own.
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                                                   "LOCATION": "other-process"}}):
+            self.subscription.delete()
+        self.assertIsNone(self._subscriptions_item(self._navigation_items(self.superuser)))
+
+    def test_cache_is_keyed_by_permission_set(self):
+        self._navigation_items(self.superuser)
+        self.assertEqual(self._navigation_items(AnonymousUser()), [])
+
+
+@override_settings(CIELO_NAVIGATION_PAGE_SIZE=2)
+class LazyNavigationNodeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.superuser = get_user_model().objects.create_superuser(
+            username="navadmin", email="navadmin@example.com", password="pass123"
+        )
+        self.client.force_login(self.superuser)
+        self.subscriptions = [
+            AzureSubscription.objects.create(name=f"Sub{i}", subscription_id=f"{i}2345678-1234-1234-1234-123456789012")
+            for i in range(3)
+        ]
+        for group in ("rg-a", "rg-b", "rg-c"):
+            for i in range(3):
+                VirtualMachine.objects.create(name=f"{group}-vm{i}", subscription=self.subscriptions[0], resource_group=group)
+
+    def _walk(self, url):
+        """Follows 'next' links, returning every page's labels."""
+        pages = []
+        while url:
+            data = self.client.get(url).json()
+            pages.append([item["label"] for item in data["items"]])
+            url = data["next"]
+        return pages
+
+    def test_subscriptions_are_paginated(self):
+        self.assertEqual(self._walk(children_url("inventory.subscriptions")), [["Sub0", "Sub1"], ["Sub2"]])
+
+    def test_tree_levels(self):
+        data = self.client.get(children_url("inventory.subscriptions")).json()
+        groups_url = data["items"][0]["children_url"]
+        self.assertEqual(self._walk(groups_url), [["rg-a", "rg-b"], ["rg-c"]])
+        vms_url = self.client.get(groups_url).json()["items"][1]["children_url"]
+        self.assertEqual(self._walk(vms_url), [["rg-b-vm0", "rg-b-vm1"], ["rg-b-vm2"]])
+
+    def test_html_fragment(self):
+        response = self.client.get(children_url("inventory.subscriptions"), {"format": "html"})
+        self.assertContains(response, 'class="cielo-nav-toggle"', count=2)
+        self.assertContains(response, 'class="cielo-nav-more')
+        self.assertNotContains(response, "<html")
+
+    def test_permissions_and_unknown_nodes(self):
+        self.assertEqual(self.client.get(reverse("navigation_children", kwargs={"node": "inventory.nope"})).status_code, 404)
+        viewer = get_user_model().objects.create_user(username="viewer", password="password")
+        self.client.force_login(viewer)
+        self.assertEqual(self.client.get(children_url("inventory.subscriptions")).json(), {"items": [], "next": None})
+        self.client.logout()
+        self.assertEqual(self.client.get(children_url("inventory.subscriptions")).status_code, 302)
@@ -0,0 +1,92 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+from common.pagination import KeysetPaginator, decode_cursor, encode_cursor
+from inventory.models import AzureSubscription, VirtualMachine
+
+
+class KeysetPaginatorTests(TestCase):
+    def setUp(self):
+        subscription = AzureSubscription.objects.create(
+            name="Sub1",
+            subscription_id="12345678-1234-1234-1234-123456789012",
+        )
+        # Duplicate names make sure the id tie-breaker is honoured.
+        for i in range(12):
+            VirtualMachine.objects.create(name=f"vm{i // 2:02d}", subscription=subscription)
+        self.expected = list(VirtualMachine.objects.order_by("name", "id").values_list("pk", flat=True))
+
+    def _paginator(self, count_mode="exact"):
+        return KeysetPaginator(VirtualMachine.objects.all(), 5, count_mode=count_mode)
+
+    def test_forward_and_backward_walk(self):
+        paginator = self._paginator()
+        pages = [paginator.get_page()]
+        while pages[-1].has_next():
+            pages.append(paginator.get_page(after=pages[-1].next_cursor))
+        self.assertEqual([vm.pk for page in pages for vm in page], self.expected)
+        self.assertFalse(pages[0].has_previous())
+
+        previous = paginator.get_page(before=pages[-1].previous_cursor)
+        self.assertEqual([vm.pk for vm in previous], [vm.pk for vm in pages[-2]])
+
+    def test_last_page(self):
+        page = self._paginator().get_page(last=True)
+        self.assertEqual([vm.pk for vm in page], self.expected[-5:])
+        self.assertFalse(page.has_next())
+        self.assertTrue(page.has_previous())
+
+    def test_deep_page_is_a_single_query(self):
+        paginator = self._paginator(count_mode=None)
+        cursor = paginator.get_page().next_cursor
+        with self.assertNumQueries(1):
+            list(paginator.get_page(after=cursor))
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        self.assertIsNone(decode_cursor("not-a-cursor!"))
+        page = self._paginator().get_page(after="not-a-cursor!")
+        self.assertEqual([vm.pk for vm in page], self.expected[:5])
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        paginator = self._paginator()
+        for values in (["vm01", "abc"], [None, None], ["vm01"], [["vm01"], {}]):
+            with self.subTest(values=values):
+                cursor = encode_cursor(values)
+                self.assertEqual([vm.pk for vm in paginator.get_page(after=cursor)], self.expected[:5])
+                self.assertEqual([vm.pk for vm in paginator.get_page(before=cursor)], self.expected[:5])
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(["vm 01", 7])), ["vm 01", 7])
+
+    def test_estimated_count(self):
+        self.assertEqual(self._paginator(count_mode="estimate").count, 12)
+
+
+class VirtualMachineListingTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="testuser", password="pass123")
+        for i in range(7):
+            VirtualMachine.objects.create(name=f"vm{i}")
+        self.client.login(username="testuser", password="pass123")
+
+    def test_next_page_follows_cursor(self):
+        url = reverse("inventory:virtual_machines")
+        first = self.client.get(url)
+        self.assertEqual(first.context["page_obj"].paginator.count, 7)
+        second = self.client.get(url, {"after": first.context["page_obj"].next_cursor})
+        self.assertEqual([vm.name for vm in second.context["page_obj"]], ["vm5", "vm6"])
+
+    def test_tampered_cursor_shows_the_first_page(self):
+        url = reverse("inventory:virtual_machines")
+        for cursor in ("WyJ2bTEiLCAiYWJjIl0", "W251bGwsIG51bGxd"):
+            for direction in ("after", "before"):
+                with self.subTest(cursor=cursor, direction=direction):
+                    response = self.client.get(url, {direction: cursor})
+                    self.assertEqual(response.status_code, 200)
+                    self.assertEqual([vm.name for vm in response.context["page_obj"]][:1], ["vm0"])
+
+    @override_settings(CIELO_INVENTORY_COUNT_MODE="estimate")
+    def test_estimated_count_mode(self):
+        response = self.client.get(reverse("inventory:virtual_machines"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context["page_obj"].paginator.count_is_estimate)
@@ -0,0 +1,71 @@
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group, Permission
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from common.context_processors import cielo_navigation_context
+
+
+class CachedPermissionBackendTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username="operator", password="password")
+        self.group = Group.objects.create(name="Inventory viewers")
+        self.group.permissions.add(Permission.objects.get(codename="view_virtualmachine"))
+        self.user.groups.add(self.group)
+
+    def _fresh_user(self):
+        # A new user object, as loaded by AuthenticationMiddleware on each request.
+        return get_user_model().objects.get(pk=self.user.pk)
+
+    def test_snapshot_is_reused_across_requests(self):
+        self.assertTrue(self._fresh_user().has_perm("inventory.view_virtualmachine"))
+        user = self._fresh_user()
+        # Only the version is read.
+        with self.assertNumQueries(1):
+            self.assertTrue(user.has_perm("inventory.view_virtualmachine"))
+            self.assertFalse(user.has_perm("inventory.view_storageaccount"))
+            self.assertEqual(user.get_all_permissions(), {"inventory.view_virtualmachine"})
+
+    def test_async_checks_share_the_snapshot(self):
+        self.assertTrue(async_to_sync(self._fresh_user().ahas_perm)("inventory.view_virtualmachine"))
+        # A snapshot cached by the async path serves sync checks, and vice versa.
+        user, other = self._fresh_user(), self._fresh_user()
+        with self.assertNumQueries(2):
+            self.assertTrue(user.has_perm("inventory.view_virtualmachine"))
+            self.assertFalse(async_to_sync(other.ahas_perm)("inventory.view_storageaccount"))
+
+    def test_navigation_needs_no_permission_queries(self):
+        request = RequestFactory().get("/")
+        request.user = self._fresh_user()
+        cielo_navigation_context(request)
+        request.user = self._fresh_user()
+        with CaptureQueriesContext(connection) as queries:
+            cielo_navigation_context(request)
+        self.assertFalse([query["sql"] for query in queries if "auth_" in query["sql"]])
+
+    def test_group_and_membership_changes_invalidate(self):
+        self.assertFalse(self._fresh_user().has_perm("inventory.view_storageaccount"))
+        self.group.permissions.add(Permission.objects.get(codename="view_storageaccount"))
+        self.assertTrue(self._fresh_user().has_perm("inventory.view_storageaccount"))
+        self.user.groups.remove(self.group)
+        self.assertFalse(self._fresh_user().has_perm("inventory.view_virtualmachine"))
+        self.user.user_permissions.add(Permission.objects.get(codename="view_virtualmachine"))
+        self.assertTrue(self._fresh_user().has_perm("inventory.view_virtualmachine"))
+
+    def test_changes_made_by_other_processes_invalidate(self):
+        self.assertFalse(self._fresh_user().has_perm("inventory.view_storageaccount"))
+        # Another process, with a cache of its own.
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                                                   "LOCATION": "other-process"}}):
+            self.group.permissions.add(Permission.objects.get(codename="view_storageaccount"))
+        self.assertTrue(self._fresh_user().has_perm("inventory.view_storageaccount"))
+
+    def test_superuser_and_active_flags_are_respected(self):
+        self.assertFalse(self._fresh_user().has_perm("auth.delete_group"))
+        get_user_model().objects.filter(pk=self.user.pk).update(is_superuser=True)
+        self.assertTrue(self._fresh_user().has_perm("auth.delete_group"))
+        get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertFalse(self._fresh_user().has_perm("inventory.view_virtualmachine"))
@@ -0,0 +1,137 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from inventory import resources
+from inventory.bulk_import import InventoryImporter
+from inventory.models import CloudResource, InventoryVersion, StorageAccount
+from inventory.resources import ResourceType
+from io import StringIO
+
+SUBSCRIPTION_ID = "12345678-1234-1234-1234-123456789012"
+
+
+def disk(name, sku="Premium_LRS", state="Attached", **row):
+    return {"id": f"/subscriptions/{SUBSCRIPTION_ID}/resourceGroups/rg/providers/Microsoft.Compute/disks/{name}",
+            "name": name, "type": "Microsoft.Compute/disks", "subscriptionId": SUBSCRIPTION_ID,
+            "location": "westeurope", "sku": {"name": sku},
+            "properties": {"diskSizeGB": 128, "diskState": state}, **row}
+
+
+class ResourceTypeTests(TestCase):
+    def test_declarations_are_validated(self):
+        with self.assertRaises(ValueError):
+            ResourceType("x/y", "y", "Y", attributes={"sku": "sku.name"}, indexed=["size"])
+        with self.assertRaises(ValueError):
+            ResourceType("x/y", "y", "Y", attributes={"location": "properties.location"})
+        attributes = {f"a{i}": f"a{i}" for i in range(resources.INDEXED_SLOTS + 1)}
+        with self.assertRaises(ValueError):
+            ResourceType("x/y", "y", "Y", attributes=attributes, indexed=list(attributes))
+
+    def test_registry(self):
+        disks = resources.registry.by_slug("disks")
+        self.assertEqual(disks.type, "microsoft.compute/disks")
+        self.assertEqual(disks.columns, {"sku": "indexed_1", "state": "indexed_2"})
+        self.assertIn("microsoft.network/virtualnetworks", resources.registry)
+
+    def test_saving_promotes_indexed_attributes(self):
+        resource = CloudResource.objects.create(
+            type="microsoft.compute/disks", name="d1", resource_id="/d1",
+            attributes={"sku": {"name": "Standard_LRS"}, "properties": {"diskState": "Unattached"}})
+        resource.refresh_from_db()
+        self.assertEqual((resource.indexed_1, resource.indexed_2, resource.indexed_3),
+                         ("Standard_LRS", "Unattached", ""))
+
+
+class ResourceImportTests(TestCase):
+    def test_import(self):
+        stats = InventoryImporter().run([
+            disk("d1", tags={"env": "prod"}),
+            disk("d2", sku="Standard_LRS", state="Unattached"),
+            {"id": "/vnet1", "name": "vnet1", "type": "Microsoft.Network/virtualNetworks",
+             "properties": {"addressSpace": {"addressPrefixes": ["10.0.0.0/16"]}}},
+            {"id": "/lb1", "name": "lb1", "type": "Microsoft.Network/loadBalancers"},
+            {"id": "/sa1", "name": "sa1", "type": "Microsoft.Storage/storageAccounts"},
+        ])
+        self.assertEqual((stats.resources, stats.storage_accounts, stats.skipped), (3, 1, 1))
+        d1 = CloudResource.objects.get(name="d1")
+        self.assertEqual(d1.subscription.subscription_id, SUBSCRIPTION_ID)
+        self.assertEqual(d1.attributes, {"sku": {"name": "Premium_LRS"},
+                                         "properties": {"diskSizeGB": 128, "diskState": "Attached"}})
+        self.assertEqual((d1.indexed_1, d1.indexed_2), ("Premium_LRS", "Attached"))
+
+        InventoryImporter().run([disk("d1", sku="Standard_LRS")])
+        self.assertEqual(CloudResource.objects.get(name="d1").indexed_1, "Standard_LRS")
+        self.assertEqual(CloudResource.objects.count(), 3)
+
+    def test_rebuild_indexes(self):
+        InventoryImporter().run([disk("d1"), disk("d2")])
+        CloudResource.objects.update(indexed_1="", indexed_2="")
+        version = InventoryVersion.objects.get(model="inventory.cloudresource").version
+        out = StringIO()
+        call_command("rebuild_resource_indexes", "disks", stdout=out)
+        self.assertIn("Updated 2 disks", out.getvalue())
+        # Cached pages of the type are revalidated.
+        self.assertGreater(InventoryVersion.objects.get(model="inventory.cloudresource").version, version)
+        self.assertEqual(set(CloudResource.objects.values_list("indexed_1", "indexed_2")), {("Premium_LRS", "Attached")})
+
+
+class ResourceViewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        InventoryImporter().run([
+            disk("d1", tags={"env": "prod"}),
+            disk("d2", sku="Standard_LRS", state="Unattached", tags={"env": "dev"}),
+            disk("d3", state="Unattached"),
+        ])
+        cls.user = get_user_model().objects.create_user("viewer", password="password")
+        cls.user.user_permissions.add(Permission.objects.get(codename="view_cloudresource"))
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def _names(self, **params):
+        response = self.client.get(reverse("inventory:resources", kwargs={"slug": "disks"}), params)
+        self.assertEqual(response.status_code, 200)
+        return [resource.name for resource in response.context["page_obj"].object_list]
+
+    def test_listing_filters(self):
+        self.assertEqual(self._names(), ["d1", "d2", "d3"])
+        self.assertEqual(self._names(state="Unattached"), ["d2", "d3"])
+        self.assertEqual(self._names(sku="Premium_LRS", state="Unattached"), ["d3"])
+        self.assertEqual(self._names(selector="env=prod"), ["d1"])
+        self.assertEqual(self._names(name="d2"), ["d2"])
+        self.assertEqual(self._names(size_gb="128"), ["d1", "d2", "d3"])
+
+    def test_indexed_filter_uses_index(self):
+        queryset = resources.registry.by_slug("disks").filter(
+            resources.registry.by_slug("disks").queryset(), "state", "Attached").order_by("name", "id")
+        if connection.vendor == "sqlite":
+            sql, params = queryset.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+            self.assertIn("inventory_res_indexed_2_idx", plan)
+
+    def test_detail_and_permissions(self):
+        d1 = CloudResource.objects.get(name="d1")
+        response = self.client.get(reverse("inventory:resource_detail", kwargs={"slug": "disks", "pk": d1.pk}))
+        self.assertContains(response, "Premium_LRS")
+        self.assertEqual(response.context["tags"], {"env": "prod"})
+        response = self.client.get(reverse("inventory:resource_detail", kwargs={"slug": "virtual-networks", "pk": d1.pk}))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.client.get(reverse("inventory:resources", kwargs={"slug": "nope"})).status_code, 404)
+
+        self.client.force_login(get_user_model().objects.create_user("other", password="password"))
+        self.assertEqual(self.client.get(reverse("inventory:resources", kwargs={"slug": "disks"})).status_code, 403)
+
+
+class StorageAccountListingTests(TestCase):
+    def test_lists_storage_accounts(self):
+        StorageAccount.objects.create(name="logs", resource_id="/sa/logs", sku="Standard_LRS", access_tier="Hot")
+        self.client.force_login(get_user_model().objects.create_user("viewer", password="password"))
+        response = self.client.get(reverse("inventory:storage_accounts"))
+        self.assertContains(response, "logs")
+        self.assertContains(response, "Hot")
@@ -0,0 +1,100 @@
+from io import StringIO
+from pathlib import Path
+import json
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from inventory import rollups
+from inventory.models import AzureSubscription, InventoryRollup, VirtualMachine
+
+
+class InventoryRollupTests(TestCase):
+    def setUp(self):
+        self.sub1 = AzureSubscription.objects.create(name="Sub1", subscription_id="12345678-1234-1234-1234-123456789012")
+        self.sub2 = AzureSubscription.objects.create(name="Sub2", subscription_id="22345678-1234-1234-1234-123456789012")
+
+    def _groups(self):
+        return {
+            (subscription_id, location, environment): vm_count
+            for subscription_id, location, environment, vm_count in InventoryRollup.objects.filter(vm_count__gt=0)
+            .values_list("subscription_id", "location", "environment", "vm_count")
+        }
+
+    def _recomputed(self):
+        expected = self._groups()
+        call_command("rebuild_inventory_rollups", stdout=StringIO())
+        self.assertEqual(self._groups(), expected)
+        return expected
+
+    def test_signals_track_create_update_delete(self):
+        vm = VirtualMachine.objects.create(name="vm1", location="eastus", environment="Prod", subscription=self.sub1)
+        VirtualMachine.objects.create(name="vm2", location="eastus", environment="Prod", subscription=self.sub1)
+        self.assertEqual(self._recomputed(), {(self.sub1.pk, "eastus", "Prod"): 2})
+
+        vm.location = "westus"
+        vm.save()
+        VirtualMachine.objects.get(name="vm2").delete()
+        self.assertEqual(self._recomputed(), {(self.sub1.pk, "westus", "Prod"): 1})
+
+        # Saving an instance that was not loaded from the database.
+        VirtualMachine(pk=vm.pk, name="vm1", location="westus", environment="Dev", subscription=self.sub2).save()
+        self.assertEqual(self._recomputed(), {(self.sub2.pk, "westus", "Dev"): 1})
+
+    def test_subscription_delete_moves_vms_to_unassigned(self):
+        VirtualMachine.objects.create(name="vm1", location="eastus", environment="Prod", subscription=self.sub1)
+        VirtualMachine.objects.create(name="vm2", location="eastus", environment="Prod")
+        self.sub1.delete()
+        self.assertEqual(self._recomputed(), {(None, "eastus", "Prod"): 2})
+
+    def test_bulk_import_updates_rollups(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "export.ndjson"
+            rows = [{"id": f"/vm/{i}", "name": f"vm{i}", "location": "eastus", "environment": "Prod",
+                     "subscriptionId": self.sub1.subscription_id} for i in range(4)]
+            path.write_text("\n".join(json.dumps(row) for row in rows))
+            call_command("import_inventory", str(path), stdout=StringIO())
+            rows[0]["location"] = "westus"
+            path.write_text("\n".join(json.dumps(row) for row in rows))
+            call_command("import_inventory", str(path), stdout=StringIO())
+        self.assertEqual(self._recomputed(), {(self.sub1.pk, "eastus", "Prod"): 3, (self.sub1.pk, "westus", "Prod"): 1})
+
+    def test_listing_total_reads_rollup(self):
+        user = get_user_model().objects.create_user(username="testuser", password="pass123")
+        for i in range(3):
+            VirtualMachine.objects.create(name=f"vm{i}", location="eastus", environment="Prod", subscription=self.sub1)
+        VirtualMachine.objects.create(name="other", location="westus", environment="Prod", subscription=self.sub2)
+        self.client.force_login(user)
+        response = self.client.get(reverse("inventory:virtual_machines"), {"location": "eastus"})
+        self.assertEqual(response.context["page_obj"].paginator.count, 3)
+        self.assertIsNotNone(response.context["page_obj"].paginator.count_func)
+        response = self.client.get(reverse("inventory:virtual_machines"))
+        self.assertEqual(response.context["page_obj"].paginator.count, 4)
+
+    def test_subscription_breakdown(self):
+        for i, (location, environment) in enumerate([("eastus", "Prod"), ("eastus", "Dev"), ("westus", "Prod")] * 2):
+            VirtualMachine.objects.create(name=f"vm{i}", location=location, environment=environment, subscription=self.sub1)
+        VirtualMachine.objects.create(name="vm-eastus-extra", location="eastus", environment="Prod", subscription=self.sub1)
+        VirtualMachine.objects.create(name="other", location="westus", environment="Prod", subscription=self.sub2)
+        for mode in ("rollup", "exact"):
+            with self.subTest(mode=mode), self.settings(CIELO_INVENTORY_COUNT_MODE=mode), self.assertNumQueries(1):
+                breakdown = rollups.subscription_breakdown(self.sub1.pk)
+                self.assertEqual(breakdown.total, 7)
+                self.assertEqual(breakdown.locations, [("eastus", 5), ("westus", 2)])
+                self.assertEqual(breakdown.environments, [("Prod", 5), ("Dev", 2)])
+
+    def test_subscription_detail_page(self):
+        user = get_user_model().objects.create_user(username="testuser", password="pass123")
+        for i in range(30):
+            VirtualMachine.objects.create(name=f"vm{i:02d}", location="eastus", environment="Prod", subscription=self.sub1)
+        VirtualMachine.objects.create(name="other", location="westus", environment="Prod", subscription=self.sub2)
+        self.client.force_login(user)
+        url = reverse("inventory:azure_subscription_detail", kwargs={"pk": self.sub1.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.context["breakdown"].total, 30)
+        self.assertEqual([vm.name for vm in response.context["page_obj"]], [f"vm{i:02d}" for i in range(25)])
+        response = self.client.get(url, {"after": response.context["page_obj"].next_cursor})
+        self.assertEqual([vm.name for vm in response.context["page_obj"]], [f"vm{i:02d}" for i in range(25, 30)])
+        self.assertContains(response, "?subscription=%d&amp;location=eastus" % self.sub1.pk)
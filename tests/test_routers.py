@@ -0,0 +1,118 @@
+from pathlib import Path
+from unittest import mock
+import os
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.db import OperationalError, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from common.middleware import ReplicaPinningMiddleware
+from common.routers import ReplicaRouter, pin_to_primary, replica_reads
+from inventory.models import VirtualMachine
+
+# The database of ReplicaDatabaseTests, which the test runner only creates
+# (and migrates, like the primary) for an alias known when it starts.
+if "replica" not in connections.settings:
+    connections.settings["replica"] = connections.configure_settings({"default": {}, "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": "",
+        "TEST": {"NAME": str(Path(tempfile.gettempdir()) / f"cielo-test-replica-{os.getpid()}.sqlite3")},
+    }})["replica"]
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter(replicas=["replica1", "replica2"], apps=["inventory"], retry_after=30)
+        patcher = mock.patch("common.routers.connections")
+        self.connections = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_outside_requests_use_the_primary(self):
+        self.assertIsNone(self.router.db_for_read(VirtualMachine))
+
+    def test_safe_reads_round_robin_over_replicas(self):
+        with replica_reads():
+            aliases = [self.router.db_for_read(VirtualMachine) for _ in range(4)]
+        self.assertEqual(aliases, ["replica1", "replica2", "replica1", "replica2"])
+
+    def test_other_apps_read_from_the_primary(self):
+        with replica_reads():
+            self.assertIsNone(self.router.db_for_read(get_user_model()))
+
+    def test_reads_after_a_write_stick_to_the_primary(self):
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(VirtualMachine), "replica1")
+            self.assertEqual(self.router.db_for_write(VirtualMachine), "default")
+            self.assertIsNone(self.router.db_for_read(VirtualMachine))
+        with replica_reads():
+            pin_to_primary()
+            self.assertIsNone(self.router.db_for_read(VirtualMachine))
+        # The pin does not leak past the block.
+        with replica_reads():
+            self.assertIsNotNone(self.router.db_for_read(VirtualMachine))
+
+    def test_unreachable_replica_is_skipped_until_retry(self):
+        broken = mock.Mock()
+        broken.ensure_connection.side_effect = OperationalError("unable to open database file")
+        healthy = mock.Mock()
+        self.connections.__getitem__.side_effect = lambda alias: broken if alias == "replica1" else healthy
+        with replica_reads(), mock.patch("common.routers.time.monotonic", return_value=100.0) as monotonic:
+            with self.assertLogs("common.routers", "WARNING"):
+                aliases = [self.router.db_for_read(VirtualMachine) for _ in range(3)]
+            self.assertEqual(aliases, ["replica2"] * 3)
+            self.assertEqual(broken.ensure_connection.call_count, 1)
+
+            broken.ensure_connection.side_effect = None
+            monotonic.return_value = 131.0
+            self.assertEqual(
+                {self.router.db_for_read(VirtualMachine) for _ in range(2)}, {"replica1", "replica2"})
+
+    def test_all_replicas_down_falls_back_to_the_primary(self):
+        self.connections.__getitem__.return_value.ensure_connection.side_effect = OperationalError("down")
+        with replica_reads(), self.assertLogs("common.routers", "WARNING"):
+            self.assertEqual(self.router.db_for_read(VirtualMachine), "default")
+
+    def test_replicas_are_never_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica1", "inventory"))
+        self.assertIsNone(self.router.allow_migrate("default", "inventory"))
+
+    def test_without_replicas_routing_is_left_to_django(self):
+        router = ReplicaRouter(replicas=[])
+        with replica_reads():
+            self.assertIsNone(router.db_for_read(VirtualMachine))
+
+
+@override_settings(CIELO_READ_REPLICAS=["replica"], DATABASE_ROUTERS=["common.routers.ReplicaRouter"])
+class ReplicaDatabaseTests(TestCase):
+    """Routing through ReplicaPinningMiddleware, with the replica in a second SQLite file."""
+    databases = {"default", "replica"}
+
+    @classmethod
+    def setUpTestData(cls):
+        # A row only the replica has, written without signals.
+        VirtualMachine.objects.using("replica").bulk_create([VirtualMachine(name="replica-vm")])
+
+    def setUp(self):
+        VirtualMachine.objects.create(name="primary-vm")
+
+    def _request(self, method):
+        seen = []
+
+        def view(request):
+            seen.append(set(VirtualMachine.objects.values_list("name", flat=True)))
+            VirtualMachine.objects.create(name="new-vm")
+            seen.append(set(VirtualMachine.objects.values_list("name", flat=True)))
+            return HttpResponse()
+
+        ReplicaPinningMiddleware(view)(getattr(RequestFactory(), method)("/"))
+        return seen
+
+    def test_safe_requests_read_the_replica_until_they_write(self):
+        self.assertEqual(self._request("get"), [{"replica-vm"}, {"primary-vm", "new-vm"}])
+        # The next request starts on the replica again.
+        self.assertEqual(self._request("get")[0], {"replica-vm"})
+
+    def test_unsafe_requests_and_code_outside_requests_read_the_primary(self):
+        self.assertEqual(self._request("post")[0], {"primary-vm"})
+        self.assertEqual(set(VirtualMachine.objects.values_list("name", flat=True)), {"primary-vm", "new-vm"})
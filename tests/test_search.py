@@ -0,0 +1,79 @@
+from io import StringIO
+from pathlib import Path
+import json
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from inventory.models import AzureSubscription, StorageAccount, VirtualMachine
+from inventory.search import SearchResults, match_expression
+
+
+class InventorySearchTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username="searcher", password="password")
+        self.user.user_permissions.set(Permission.objects.filter(
+            codename__in=["view_virtualmachine", "view_storageaccount", "view_azuresubscription"]))
+        self.user = get_user_model().objects.get(pk=self.user.pk)
+        self.subscription = AzureSubscription.objects.create(name="Payments Prod", subscription_id="12345678-1234-1234-1234-123456789012")
+        self.vm = VirtualMachine.objects.create(name="payments-web-01", location="eastus", environment="Production",
+                                                subscription=self.subscription)
+        VirtualMachine.objects.create(name="billing-db-01", location="westeurope", environment="Production")
+        self.account = StorageAccount.objects.create(name="paymentslogs", location="eastus", sku="Standard_LRS",
+                                                      access_tier="Hot")
+
+    def _names(self, text, user=None):
+        results = SearchResults(text, user or self.user)
+        return [result["name"] for result in results[:len(results)]]
+
+    def test_match_expression_quotes_prefix_terms(self):
+        self.assertEqual(match_expression('pay "web'), '"pay"* "web"*')
+        self.assertEqual(match_expression("--"), "")
+
+    def test_searches_across_models(self):
+        self.assertCountEqual(self._names("payments"), ["Payments Prod", "payments-web-01", "paymentslogs"])
+        self.assertEqual(self._names("paymentsl"), ["paymentslogs"])
+        self.assertEqual(self._names("pay web"), ["payments-web-01"])
+        self.assertEqual(self._names("nothing"), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.vm.name = "checkout-web-01"
+        self.vm.save()
+        self.assertEqual(self._names("checkout"), ["checkout-web-01"])
+        self.assertNotIn("payments-web-01", self._names("payments"))
+        self.vm.delete()
+        self.assertEqual(self._names("checkout"), [])
+
+    def test_results_are_limited_to_viewable_models(self):
+        viewer = get_user_model().objects.create_user(username="viewer", password="password")
+        viewer.user_permissions.add(Permission.objects.get(codename="view_storageaccount"))
+        viewer = get_user_model().objects.get(pk=viewer.pk)
+        self.assertEqual(self._names("payments", user=viewer), ["paymentslogs"])
+
+    def test_bulk_import_and_rebuild_keep_index_in_sync(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "inventory.ndjson"
+            path.write_text(json.dumps({
+                "id": "/subscriptions/x/providers/Microsoft.Compute/virtualMachines/imported-vm",
+                "type": "Microsoft.Compute/virtualMachines", "name": "imported-vm", "location": "eastus",
+            }) + "\n")
+            call_command("import_inventory", str(path), stdout=StringIO())
+        self.assertEqual(self._names("imported"), ["imported-vm"])
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(self._names("imported"), ["imported-vm"])
+        self.assertCountEqual(self._names("eastus"), ["payments-web-01", "paymentslogs", "imported-vm"])
+
+    def test_search_view_paginates(self):
+        for i in range(25):
+            VirtualMachine.objects.create(name=f"batch-{i:02d}", location="eastus", environment="Test")
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("inventory:search"), {"q": "batch"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["page_obj"].paginator.count, 25)
+        self.assertEqual(len(response.context["page_obj"]), 20)
+        response = self.client.get(reverse("inventory:search"), {"q": "batch", "page": 2})
+        self.assertEqual(len(response.context["page_obj"]), 5)
+        self.assertContains(response, 'action="/inventory/search/"')
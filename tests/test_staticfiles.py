@@ -0,0 +1,104 @@
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.templatetags.static import static
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from common.middleware import StaticFilesMiddleware
+from common.staticfiles import PrunedAppDirectoriesFinder, resolve_reference
+from io import StringIO
+from pathlib import Path
+import gzip
+import tempfile
+
+
+class PrunedFinderTests(SimpleTestCase):
+    def test_only_used_theme_assets_are_listed(self):
+        listed = {path for path, storage in PrunedAppDirectoriesFinder().list([])}
+        # Named in templates
+        self.assertIn('material_theme/css/app.min.css', listed)
+        self.assertIn('common/js/navigation.js', listed)
+        # Referenced from a used stylesheet
+        self.assertIn('material_theme/fonts/boxicons.woff2', listed)
+        # Outside the pruned prefixes everything is kept
+        self.assertIn('admin/css/base.css', listed)
+        # Unused theme libraries are left out
+        self.assertNotIn('material_theme/libs/chart.js/Chart.min.js', listed)
+        self.assertLess(len(listed), 500)
+
+    def test_finding_single_files_is_unaffected(self):
+        self.assertIsNotNone(finders.find('material_theme/libs/chart.js/Chart.min.js'))
+
+    @override_settings(CIELO_STATIC_KEEP=['material_theme/libs/chart.js/*'])
+    def test_keep_patterns(self):
+        listed = {path for path, storage in PrunedAppDirectoriesFinder().list([])}
+        self.assertIn('material_theme/libs/chart.js/Chart.min.js', listed)
+
+    def test_resolve_reference(self):
+        self.assertEqual(resolve_reference('theme/css/app.css', '../fonts/a.woff?v=1#x'), 'theme/fonts/a.woff')
+        self.assertEqual(resolve_reference('theme/css/app.css', '/static/theme/a.png'), 'theme/a.png')
+        for url in ('data:image/png;base64,AAAA', 'https://fonts.example/x.css', '//cdn/x.css', '#icon', '/media/a.png'):
+            self.assertIsNone(resolve_reference('theme/css/app.css', url))
+
+    def test_unhashed_urls_until_collected(self):
+        self.assertEqual(static('common/js/navigation.js'), '/static/common/js/navigation.js')
+
+
+class CollectedStaticTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(cls.root.cleanup)
+        cls.enterClassContext(override_settings(
+            STATIC_ROOT=cls.root.name,
+            CIELO_SERVE_STATIC=True,
+            CIELO_STATIC_KEEP=[],
+            # Prune the admin's and the app's own assets as well, to keep this quick
+            CIELO_STATIC_PRUNED_PREFIXES=['material_theme/', 'admin/', 'common/'],
+        ))
+        call_command('collectstatic', '--noinput', verbosity=0, stdout=StringIO())
+
+    def setUp(self):
+        self.middleware = StaticFilesMiddleware(lambda request: HttpResponse('app'))
+        self.hashed = staticfiles_storage.stored_name('material_theme/css/app.min.css')
+        self.factory = RequestFactory()
+
+    def test_collected_files_are_hashed_and_precompressed(self):
+        root = Path(self.root.name)
+        self.assertNotEqual(self.hashed, 'material_theme/css/app.min.css')
+        self.assertEqual(static('material_theme/css/app.min.css'), f'/static/{self.hashed}')
+        original = (root / self.hashed).read_bytes()
+        self.assertEqual(gzip.decompress((root / f'{self.hashed}.gz').read_bytes()), original)
+        self.assertFalse((root / 'material_theme/libs/chart.js').exists())
+        # Stylesheet references point at the hashed fonts
+        icons = (root / staticfiles_storage.stored_name('material_theme/css/icons.min.css')).read_text()
+        self.assertRegex(icons, r'url\(["\']?\.\./fonts/boxicons\.[0-9a-f]{12}\.woff2')
+
+    def test_hashed_files_are_immutable_and_negotiated(self):
+        response = self.middleware(self.factory.get(f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='gzip, deflate'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        body = b''.join(response.streaming_content)
+        self.assertEqual(gzip.decompress(body), (Path(self.root.name) / self.hashed).read_bytes())
+
+        response = self.middleware(self.factory.get(f'/static/{self.hashed}'))
+        self.assertFalse(response.has_header('Content-Encoding'))
+        response.close()
+
+        not_modified = self.middleware(self.factory.get(
+            f'/static/{self.hashed}', HTTP_IF_MODIFIED_SINCE=response['Last-Modified']))
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_unhashed_files_are_revalidated(self):
+        response = self.middleware(self.factory.get('/static/material_theme/css/app.min.css'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=60')
+        response.close()
+
+    def test_other_requests_pass_through(self):
+        for path in ('/static/missing.css', '/inventory/'):
+            self.assertEqual(self.middleware(self.factory.get(path)).content, b'app')
+        self.assertEqual(self.middleware(self.factory.post(f'/static/{self.hashed}')).status_code, 405)
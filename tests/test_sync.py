@@ -0,0 +1,97 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase
+from inventory.models import AzureSubscription, InventoryRollup, SubscriptionSyncState, VirtualMachine
+from inventory.sync import AzureInventoryClient, InventorySyncEngine
+from .azure_stub import AzureStub
+from unittest import mock
+
+SUBSCRIPTION_IDS = [f"{i}2345678-1234-1234-1234-123456789012" for i in range(3)]
+
+
+class InventorySyncTests(TestCase):
+    def setUp(self):
+        self.subscriptions = [
+            AzureSubscription.objects.create(name=f"Sub{i}", subscription_id=subscription_id)
+            for i, subscription_id in enumerate(SUBSCRIPTION_IDS)
+        ]
+
+    def _stub(self, **kwargs):
+        stub = AzureStub(**kwargs).start()
+        self.addCleanup(stub.stop)
+        for subscription_id in SUBSCRIPTION_IDS:
+            for i in range(5):
+                stub.set_vm(subscription_id, f"vm-{subscription_id[:1]}-{i}")
+        return stub
+
+    def _sync(self, stub, **kwargs):
+        client = AzureInventoryClient(base_url=stub.url, backoff=0)
+        return {result.subscription.subscription_id: result
+                for result in InventorySyncEngine(client=client, concurrency=2, **kwargs).run()}
+
+    def test_initial_sync_pages_and_retries_throttling(self):
+        stub = self._stub(throttle_first=1)
+        results = self._sync(stub)
+        self.assertEqual(VirtualMachine.objects.count(), 15)
+        for subscription in self.subscriptions:
+            self.assertEqual(results[subscription.subscription_id].created, 5)
+            self.assertEqual(subscription.virtual_machines.count(), 5)
+        self.assertEqual(SubscriptionSyncState.objects.get(subscription=self.subscriptions[0]).last_changed_rows, 5)
+
+    def test_unchanged_subscriptions_are_not_modified(self):
+        stub = self._stub()
+        self._sync(stub)
+        stub.set_vm(SUBSCRIPTION_IDS[0], "vm-0-1", location="westeurope")
+        stub.delete_vm(SUBSCRIPTION_IDS[0], "vm-0-2")
+
+        results = self._sync(stub)
+        changed = results[SUBSCRIPTION_IDS[0]]
+        self.assertEqual((changed.created, changed.updated, changed.deleted), (0, 1, 1))
+        self.assertTrue(results[SUBSCRIPTION_IDS[1]].not_modified)
+        self.assertEqual(VirtualMachine.objects.get(name="vm-0-1").location, "westeurope")
+        self.assertFalse(VirtualMachine.objects.filter(name="vm-0-2").exists())
+        self.assertEqual(InventoryRollup.objects.virtual_machine_count(), VirtualMachine.objects.count())
+        self.assertEqual(InventoryRollup.objects.virtual_machine_count(location="westeurope"), 1)
+
+    def test_delta_link_fetches_only_changes(self):
+        stub = self._stub(delta=True)
+        self._sync(stub)
+        stub.set_vm(SUBSCRIPTION_IDS[1], "vm-new")
+        stub.delete_vm(SUBSCRIPTION_IDS[1], "vm-1-0")
+        stub.requests.clear()
+
+        results = self._sync(stub)
+        changed = results[SUBSCRIPTION_IDS[1]]
+        self.assertEqual((changed.created, changed.deleted), (1, 1))
+        self.assertEqual(results[SUBSCRIPTION_IDS[0]].changed, 0)
+        self.assertTrue(all("$deltatoken" in path for path in stub.requests))
+        self.assertEqual(VirtualMachine.objects.count(), 15)
+
+    def test_failing_subscriptions_do_not_abort_the_others(self):
+        stub = self._stub()
+        stub.broken.add(SUBSCRIPTION_IDS[0])
+        apply = InventorySyncEngine._apply
+
+        def failing_apply(engine, subscription, *args):
+            if subscription.subscription_id == SUBSCRIPTION_IDS[1]:
+                raise DatabaseError("disk I/O error")
+            return apply(engine, subscription, *args)
+
+        with mock.patch.object(InventorySyncEngine, "_apply", failing_apply):
+            results = self._sync(stub)
+        self.assertIn("invalid JSON", results[SUBSCRIPTION_IDS[0]].error)
+        self.assertEqual(results[SUBSCRIPTION_IDS[1]].error, "DatabaseError: disk I/O error")
+        self.assertEqual((results[SUBSCRIPTION_IDS[2]].error, results[SUBSCRIPTION_IDS[2]].created), ("", 5))
+        states = {state.subscription.subscription_id: state for state in SubscriptionSyncState.objects.select_related("subscription")}
+        self.assertEqual(states[SUBSCRIPTION_IDS[1]].last_error, "DatabaseError: disk I/O error")
+        self.assertEqual(states[SUBSCRIPTION_IDS[2]].last_changed_rows, 5)
+        self.assertEqual(VirtualMachine.objects.count(), 5)
+
+    def test_command_reports_per_subscription(self):
+        stub = self._stub()
+        out = StringIO()
+        call_command("sync_inventory", "--base-url", stub.url, stdout=out)
+        self.assertIn("5 created, 0 updated, 0 deleted", out.getvalue())
+        self.assertIn("Synced 3/3 subscriptions", out.getvalue())
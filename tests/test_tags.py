@@ -0,0 +1,151 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from inventory import tags
+from inventory.bulk_import import InventoryImporter
+from inventory.models import AzureSubscription, ResourceTag, StorageAccount, VirtualMachine
+from inventory.sync import AzureInventoryClient, InventorySyncEngine
+from inventory.tags import Requirement, SelectorError, parse_selector
+from .azure_stub import AzureStub
+import json
+
+SUBSCRIPTION_ID = "12345678-1234-1234-1234-123456789012"
+
+VM_TAGS = {
+    "web-1": {"env": "prod", "team": "web", "region": "eastus"},
+    "web-2": {"env": "prod", "team": "web", "region": "westus"},
+    "etl-1": {"env": "prod", "team": "data", "region": "eastus"},
+    "etl-2": {"env": "dev", "team": "data", "region": "northeurope", "owner": "ana"},
+    "bare": {},
+}
+
+
+def vm_id(name):
+    return f"/subscriptions/{SUBSCRIPTION_ID}/resourceGroups/rg/providers/Microsoft.Compute/virtualMachines/{name}"
+
+
+class SelectorParserTests(TestCase):
+    def test_parse(self):
+        self.assertEqual(parse_selector("env=prod, team!=data,region in (eastus, westus),Owner,!cost-center"), [
+            Requirement("env", "in", ["prod"]),
+            Requirement("team", "notin", ["data"]),
+            Requirement("region", "in", ["eastus", "westus"]),
+            Requirement("owner", "exists"),
+            Requirement("cost-center", "!"),
+        ])
+        self.assertEqual(parse_selector("env==prod,tier notin (gold)"),
+                         [Requirement("env", "in", ["prod"]), Requirement("tier", "notin", ["gold"])])
+        self.assertEqual(parse_selector(" "), [])
+
+    def test_invalid_selectors(self):
+        for selector in ["env=prod,", "env in (a,)", "env in a,b", "=prod", "env=(prod)", "env=a=b",
+                         ",".join(["env"] * (tags.MAX_REQUIREMENTS + 1))]:
+            with self.subTest(selector=selector), self.assertRaises(SelectorError):
+                parse_selector(selector)
+
+
+class TagSelectorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("viewer", password="password")
+        cls.user.user_permissions.add(Permission.objects.get(codename="view_virtualmachine"))
+        rows = [{"id": vm_id(name), "name": name, "subscriptionId": SUBSCRIPTION_ID, "tags": vm_tags}
+                for name, vm_tags in VM_TAGS.items()]
+        InventoryImporter().run(rows)
+
+    def _names(self, selector):
+        return sorted(tags.filter_queryset(VirtualMachine.objects.all(), selector).values_list("name", flat=True))
+
+    def test_selectors(self):
+        cases = {
+            "env=prod": ["etl-1", "web-1", "web-2"],
+            "env=prod,team!=data": ["web-1", "web-2"],
+            "team!=data": ["bare", "web-1", "web-2"],
+            "region in (eastus,westus)": ["etl-1", "web-1", "web-2"],
+            "region notin (eastus,westus)": ["bare", "etl-2"],
+            "env=prod,region in (eastus, westus),team=data": ["etl-1"],
+            "owner": ["etl-2"],
+            "!owner": ["bare", "etl-1", "web-1", "web-2"],
+            "!owner,team!=web": ["bare", "etl-1"],
+            "ENV=prod,team=Web": [],
+        }
+        for selector, names in cases.items():
+            with self.subTest(selector=selector):
+                self.assertEqual(self._names(selector), names)
+
+    def test_requirements_are_index_intersections(self):
+        queryset = tags.filter_queryset(VirtualMachine.objects.all(), "env=prod,region in (eastus,westus),team!=data")
+        sql, params = queryset.query.sql_with_params()
+        self.assertIn("INTERSECT", sql)
+        self.assertIn("EXCEPT", sql)
+        if connection.vendor == "sqlite":
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+                plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+            self.assertIn("COVERING INDEX inventory_tag_inverted_idx", plan)
+            self.assertNotIn("SCAN inventory_resourcetag", plan)
+
+    def test_listing_and_export(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("inventory:virtual_machines"), {"selector": "env=prod,team!=data"})
+        self.assertEqual(response.context["page_obj"].paginator.count, 2)
+        self.assertIn("selector=env%3Dprod%2Cteam%21%3Ddata", response.context["listing_query"])
+
+        response = self.client.get(reverse("inventory:virtual_machines"), {"selector": "env in prod"})
+        self.assertContains(response, "is-invalid")
+        self.assertEqual(response.context["page_obj"].paginator.count, 5)
+
+        url = reverse("inventory:export", kwargs={"resource": "virtual-machines", "fmt": "ndjson"})
+        response = self.client.get(url, {"selector": "owner"})
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)["name"] for line in lines], ["etl-2"])
+        response = self.client.get(url, {"selector": "env in prod"})
+        self.assertEqual(response.status_code, 400)
+
+
+class TagStorageTests(TestCase):
+    def _tags(self, model, name):
+        obj = model.objects.get(name=name)
+        return tags.tags_for(model, [obj.pk]).get(obj.pk, {})
+
+    def test_import_replaces_tags_only_when_given(self):
+        InventoryImporter().run([
+            {"id": vm_id("vm1"), "name": "vm1", "tags": {"Env": "prod", "Team": "web"}},
+            {"id": "/sa/logs", "name": "logs", "type": "Microsoft.Storage/storageAccounts",
+             "tags": '{"retention": "30d"}'},
+        ])
+        self.assertEqual(self._tags(VirtualMachine, "vm1"), {"env": "prod", "team": "web"})
+        self.assertEqual(self._tags(StorageAccount, "logs"), {"retention": "30d"})
+
+        InventoryImporter().run([{"id": vm_id("vm1"), "name": "vm1", "location": "eastus"}])
+        self.assertEqual(self._tags(VirtualMachine, "vm1"), {"env": "prod", "team": "web"})
+        InventoryImporter().run([{"id": vm_id("vm1"), "name": "vm1", "tags": {"env": "dev"}}])
+        self.assertEqual(self._tags(VirtualMachine, "vm1"), {"env": "dev"})
+
+    def test_deletes_remove_tags(self):
+        InventoryImporter().run([{"id": vm_id("vm1"), "name": "vm1", "tags": {"env": "prod"}},
+                                 {"id": vm_id("vm2"), "name": "vm2", "tags": {"env": "prod"}}])
+        VirtualMachine.objects.filter(name="vm1").delete()
+        self.assertEqual(list(ResourceTag.objects.values_list("object_id", flat=True)),
+                         [VirtualMachine.objects.get().pk])
+
+    def test_sync_writes_tags(self):
+        AzureSubscription.objects.create(name="Sub1", subscription_id=SUBSCRIPTION_ID)
+        stub = AzureStub().start()
+        self.addCleanup(stub.stop)
+        stub.set_vm(SUBSCRIPTION_ID, "vm1")
+        stub.set_vm(SUBSCRIPTION_ID, "vm2")
+        client = AzureInventoryClient(base_url=stub.url, backoff=0)
+        InventorySyncEngine(client=client).run()
+        self.assertEqual(self._tags(VirtualMachine, "vm1"), {"environment": "Production"})
+
+        # A change of tags alone is a change
+        stub.vms[SUBSCRIPTION_ID]["vm2"]["tags"]["owner"] = "ana"
+        stub.set_vm(SUBSCRIPTION_ID, "vm1", environment="Test")
+        stub.vms[SUBSCRIPTION_ID]["vm1"]["tags"]["owner"] = "ana"
+        [result] = InventorySyncEngine(client=client).run()
+        self.assertEqual(result.updated, 2)
+        self.assertEqual(self._tags(VirtualMachine, "vm2"), {"environment": "Production", "owner": "ana"})
+        self.assertEqual(self._tags(VirtualMachine, "vm1"), {"environment": "Test", "owner": "ana"})
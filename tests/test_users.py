@@ -0,0 +1,56 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from users.models import UserProfile
+
+
+class AdminBootstrapTests(TestCase):
+    def test_no_admin_is_created_at_startup(self):
+        self.assertFalse(get_user_model().objects.filter(username="admin").exists())
+
+    def test_bootstrap_admin_is_idempotent(self):
+        out = StringIO()
+        call_command("bootstrap_admin", stdout=out)
+        call_command("bootstrap_admin", stdout=out)
+        admin = get_user_model().objects.get(username="admin")
+        self.assertTrue(admin.is_superuser)
+        self.assertTrue(admin.check_password("admin"))
+        self.assertTrue(UserProfile.must_change(admin))
+        self.assertIn("already exists", out.getvalue())
+
+
+class MustChangePasswordTests(TestCase):
+    def setUp(self):
+        call_command("bootstrap_admin", "--password", "initial-pass", stdout=StringIO())
+
+    def _login(self):
+        return self.client.post(reverse("users:login"), {"username": "admin", "password": "initial-pass"})
+
+    def test_flagged_user_is_sent_to_change_password(self):
+        self.assertRedirects(self._login(), reverse("users:change_password"), fetch_redirect_response=False)
+
+    def test_login_hashes_the_password_once(self):
+        with mock.patch.object(PBKDF2PasswordHasher, "encode", autospec=True,
+                               side_effect=PBKDF2PasswordHasher.encode) as encode:
+            self._login()
+        self.assertEqual(encode.call_count, 1)
+
+    def test_changing_the_password_clears_the_flag(self):
+        self._login()
+        self.client.post(reverse("users:change_password"), {
+            "old_password": "initial-pass", "new_password1": "N3w-Secret-pass", "new_password2": "N3w-Secret-pass",
+        })
+        self.assertFalse(UserProfile.must_change(get_user_model().objects.get(username="admin")))
+        self.client.logout()
+        response = self.client.post(reverse("users:login"), {"username": "admin", "password": "N3w-Secret-pass"})
+        self.assertRedirects(response, reverse("inventory:virtual_machines"), fetch_redirect_response=False)
+
+    def test_development_deployments_skip_the_redirect(self):
+        with mock.patch.dict("os.environ", {"CIELO_DEPLOYMENT": "development"}):
+            response = self._login()
+        self.assertRedirects(response, reverse("inventory:virtual_machines"), fetch_redirect_response=False)
@@ -0,0 +1,115 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Permission
+from django.contrib.messages import constants
+from django.contrib.messages.storage.base import Message
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.db import connection
+from django.http import HttpRequest
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from inventory.bulk_import import InventoryImporter
+from inventory.models import AzureSubscription, InventoryVersion, StorageAccount, VirtualMachine
+
+SUBSCRIPTION_ID = "12345678-1234-1234-1234-123456789012"
+
+
+def version(model):
+    return InventoryVersion.objects.get(model=model._meta.label_lower).version
+
+
+class InventoryVersionTests(TestCase):
+    def test_saves_and_deletes_bump_the_version(self):
+        before = version(VirtualMachine)
+        vm = VirtualMachine.objects.create(name="vm1")
+        vm.name = "vm2"
+        vm.save()
+        vm.delete()
+        self.assertEqual(version(VirtualMachine), before + 3)
+        self.assertEqual(version(StorageAccount), 1)
+
+    def test_bulk_import_bumps_once_per_batch(self):
+        before = version(VirtualMachine), version(AzureSubscription)
+        rows = [{"id": f"/subscriptions/{SUBSCRIPTION_ID}/resourceGroups/rg/providers/Microsoft.Compute/virtualMachines/vm{i}",
+                 "name": f"vm{i}", "subscriptionId": SUBSCRIPTION_ID} for i in range(10)]
+        InventoryImporter(batch_size=5).run(rows)
+        self.assertEqual((version(VirtualMachine), version(AzureSubscription)), (before[0] + 2, before[1] + 1))
+
+    def test_missing_rows_are_created(self):
+        InventoryVersion.objects.all().delete()
+        StorageAccount.objects.create(name="sa1")
+        self.assertEqual(version(StorageAccount), 1)
+
+
+class ConditionalPageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user("viewer", password="password")
+        cls.subscription = AzureSubscription.objects.create(name="Sub1", subscription_id=SUBSCRIPTION_ID)
+        VirtualMachine.objects.create(name="vm1", subscription=cls.subscription)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse("inventory:virtual_machines")
+
+    def _revalidate(self, response, url=None):
+        return self.client.get(url or self.url, headers={"If-None-Match": response["ETag"]})
+
+    def test_unchanged_pages_are_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["ETag"].startswith('W/"'))
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("no-cache", response["Cache-Control"])
+        self.assertTrue(response.has_header("Last-Modified"))
+
+        with CaptureQueriesContext(connection) as queries:
+            not_modified = self._revalidate(response)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified["ETag"], response["ETag"])
+        # Only the session, the user and the version table are read.
+        tables = ("inventory_virtualmachine", "inventory_azuresubscription", "inventory_inventoryrollup")
+        self.assertFalse([query["sql"] for query in queries if any(table in query["sql"] for table in tables)])
+
+        detail = reverse("inventory:azure_subscription_detail", kwargs={"pk": self.subscription.pk})
+        self.assertEqual(self._revalidate(self.client.get(detail), detail).status_code, 304)
+
+    def test_changes_invalidate_the_etag(self):
+        response = self.client.get(self.url)
+        VirtualMachine.objects.create(name="vm2", subscription=self.subscription)
+        response = self._revalidate(response)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "vm2")
+        self.assertEqual(self._revalidate(response).status_code, 304)
+
+    def test_etag_depends_on_url_user_and_permissions(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self._revalidate(response, f"{self.url}?location=westeurope").status_code, 200)
+
+        self.user.user_permissions.add(Permission.objects.get(codename="add_virtualmachine"))
+        self.assertEqual(self._revalidate(response).status_code, 200)
+
+        response = self.client.get(self.url)
+        self.client.force_login(get_user_model().objects.create_user("other", password="password"))
+        self.assertEqual(self._revalidate(response).status_code, 200)
+
+    def test_etag_depends_on_the_session(self):
+        response = self.client.get(self.url)
+        self.client.logout()
+        self.client.force_login(self.user)
+        revalidated = self._revalidate(response)
+        self.assertEqual(revalidated.status_code, 200)
+        self.assertNotEqual(revalidated["ETag"], response["ETag"])
+
+    def test_pages_with_pending_messages_are_not_revalidated(self):
+        response = self.client.get(self.url)
+        storage = CookieStorage(HttpRequest())
+        self.client.cookies[storage.cookie_name] = storage._encode([Message(constants.INFO, "Saved")])
+        revalidated = self._revalidate(response)
+        self.assertEqual(revalidated.status_code, 200)
+        self.assertFalse(revalidated.has_header("ETag"))
+
+    def test_if_modified_since_alone_is_not_enough(self):
+        response = self.client.get(self.url)
+        response = self.client.get(self.url, headers={"If-Modified-Since": response["Last-Modified"]})
+        self.assertEqual(response.status_code, 200)
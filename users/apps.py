@@ -1,18 +1,25 @@
 from django.apps import AppConfig
-import os
 from django.contrib.auth import get_user_model
-from django.db.utils import OperationalError, ProgrammingError
 
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
 
     def ready(self):
-        deployment = os.environ.get('CIELO_DEPLOYMENT', '').lower()
-        try:
-            User = get_user_model()
-            if not User.objects.filter(username='admin').exists():
-                User.objects.create_superuser('admin', 'admin@example.com', 'admin')
-        except (OperationalError, ProgrammingError):
-            # Database might not be ready during migration commands
-            pass
+        # No database access here: ready() runs in every process. The default
+        # administrator is created by the bootstrap_admin management command.
+        self.connect_permission_cache_invalidation()
+
+    def connect_permission_cache_invalidation(self):
+        from django.contrib.auth.models import Group, Permission
+        from django.db.models.signals import m2m_changed, post_delete, post_save
+        from .backends import invalidate, user_saved
+
+        User = get_user_model()
+        for model in (Group, Permission):
+            post_save.connect(invalidate, sender=model, dispatch_uid=f'cielo_permissions_{model._meta.model_name}_save')
+            post_delete.connect(invalidate, sender=model, dispatch_uid=f'cielo_permissions_{model._meta.model_name}_delete')
+        post_save.connect(user_saved, sender=User, dispatch_uid='cielo_permissions_user_save')
+        post_delete.connect(invalidate, sender=User, dispatch_uid='cielo_permissions_user_delete')
+        for through in (User.groups.through, User.user_permissions.through, Group.permissions.through):
+            m2m_changed.connect(invalidate, sender=through, dispatch_uid=f'cielo_permissions_{through._meta.model_name}')
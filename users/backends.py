@@ -0,0 +1,101 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from common.models import CacheVersion
+import logging
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = 'cielo:permissions'
+VERSION_NAME = 'permissions'
+
+
+def get_version():
+    return CacheVersion.objects.get_version(VERSION_NAME)
+
+
+async def aget_version():
+    return await CacheVersion.objects.aget_version(VERSION_NAME)
+
+
+def invalidate(**kwargs):
+    """Drops all cached permission snapshots. Usable as a signal receiver."""
+    CacheVersion.objects.bump(VERSION_NAME)
+
+
+def user_saved(sender, instance, created, **kwargs):
+    # A new user may reuse the primary key of a deleted one.
+    if created:
+        invalidate()
+
+
+class CachedPermissionBackend(ModelBackend):
+    """
+    ModelBackend whose per-user permission sets are cached across requests.
+
+    ModelBackend loads a user's user and group permissions from the database
+    once per request. This backend keeps them in the cache as a snapshot
+    keyed on the user and a version stamp, which is bumped whenever groups,
+    permissions, their assignments or the set of users change (see
+    UsersConfig.ready), so permission checks on later requests cost no
+    queries. Snapshots record
+    the is_superuser flag they were computed for and are recomputed when it
+    differs; inactive users have no permissions and are never cached.
+    The async methods (used by user.ahas_perm in async views) share the
+    same snapshots.
+    """
+
+    def _snapshot(self, user_obj):
+        if not user_obj.is_active or user_obj.is_anonymous:
+            return None
+        snapshot = getattr(user_obj, '_cielo_permission_snapshot', None)
+        if snapshot is not None:
+            return snapshot
+        key = f'{CACHE_KEY_PREFIX}:{get_version()}:{user_obj.pk}'
+        snapshot = cache.get(key)
+        if snapshot is None or snapshot['superuser'] != user_obj.is_superuser:
+            snapshot = {
+                'superuser': user_obj.is_superuser,
+                'user': frozenset(super().get_user_permissions(user_obj)),
+                'group': frozenset(super().get_group_permissions(user_obj)),
+            }
+            cache.set(key, snapshot, getattr(settings, 'CIELO_PERMISSION_CACHE_TIMEOUT', 300))
+            logger.debug("Cached permission snapshot for user %s", user_obj.pk)
+        user_obj._cielo_permission_snapshot = snapshot
+        return snapshot
+
+    async def _asnapshot(self, user_obj):
+        """See _snapshot()."""
+        if not user_obj.is_active or user_obj.is_anonymous:
+            return None
+        snapshot = getattr(user_obj, '_cielo_permission_snapshot', None)
+        if snapshot is not None:
+            return snapshot
+        key = f'{CACHE_KEY_PREFIX}:{await aget_version()}:{user_obj.pk}'
+        snapshot = await cache.aget(key)
+        if snapshot is None or snapshot['superuser'] != user_obj.is_superuser:
+            snapshot = {
+                'superuser': user_obj.is_superuser,
+                'user': frozenset(await super().aget_user_permissions(user_obj)),
+                'group': frozenset(await super().aget_group_permissions(user_obj)),
+            }
+            await cache.aset(key, snapshot, getattr(settings, 'CIELO_PERMISSION_CACHE_TIMEOUT', 300))
+            logger.debug("Cached permission snapshot for user %s", user_obj.pk)
+        user_obj._cielo_permission_snapshot = snapshot
+        return snapshot
+
+    def get_user_permissions(self, user_obj, obj=None):
+        snapshot = self._snapshot(user_obj) if obj is None else None
+        return set(snapshot['user']) if snapshot else set()
+
+    def get_group_permissions(self, user_obj, obj=None):
+        snapshot = self._snapshot(user_obj) if obj is None else None
+        return set(snapshot['group']) if snapshot else set()
+
+    async def aget_user_permissions(self, user_obj, obj=None):
+        snapshot = await self._asnapshot(user_obj) if obj is None else None
+        return set(snapshot['user']) if snapshot else set()
+
+    async def aget_group_permissions(self, user_obj, obj=None):
+        snapshot = await self._asnapshot(user_obj) if obj is None else None
+        return set(snapshot['group']) if snapshot else set()
@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from users.models import UserProfile
+import os
+
+class Command(BaseCommand):
+    help = ('Creates the default administrator account if it does not exist yet. The account must change '
+            'its password on first login. Safe to run repeatedly.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='admin')
+        parser.add_argument('--email', default='admin@example.com')
+        parser.add_argument('--password', default=os.environ.get('CIELO_ADMIN_PASSWORD', 'admin'),
+                            help='Initial password (default: $CIELO_ADMIN_PASSWORD or "admin").')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        username = options['username']
+        if User.objects.filter(username=username).exists():
+            self.stdout.write(f'User "{username}" already exists; nothing to do.')
+            return
+        user = User.objects.create_superuser(username, options['email'], options['password'])
+        UserProfile.objects.update_or_create(user=user, defaults={'must_change_password': True})
+        self.stdout.write(self.style.SUCCESS(f'Created administrator "{username}"; the password must be changed on first login.'))
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.1 on 2026-10-18 19:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+from django.db import migrations, models
+
+
+def flag_default_admin(apps, schema_editor):
+    # The default administrator used to be created at process startup; keep
+    # forcing a password change if it still has the default password.
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    UserProfile = apps.get_model('users', 'UserProfile')
+    db_alias = schema_editor.connection.alias
+    admin = User.objects.using(db_alias).filter(username='admin').first()
+    if admin is not None and check_password('admin', admin.password):
+        UserProfile.objects.using(db_alias).update_or_create(user=admin, defaults={'must_change_password': True})
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProfile',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cielo_profile', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('must_change_password', models.BooleanField(default=False, help_text='Send the user to the password change page after logging in.', verbose_name='Must change password')),
+            ],
+            options={
+                'verbose_name': 'User Profile',
+                'verbose_name_plural': 'User Profiles',
+            },
+        ),
+        migrations.RunPython(flag_default_admin, migrations.RunPython.noop),
+    ]
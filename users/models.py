@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class UserProfile(models.Model):
+    """CIELO-specific per-user state that django.contrib.auth does not store."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='cielo_profile')
+    must_change_password = models.BooleanField(_("Must change password"), default=False,
+                                               help_text="Send the user to the password change page after logging in.")
+
+    class Meta:
+        verbose_name = _("User Profile")
+        verbose_name_plural = _("User Profiles")
+
+    def __str__(self):
+        return str(self.user)
+
+    @classmethod
+    def must_change(cls, user):
+        """One primary-key lookup; no password hashing."""
+        return cls.objects.filter(user=user, must_change_password=True).exists()
@@ -1,5 +1,6 @@
 from django.contrib.auth.views import LoginView, LogoutView, PasswordChangeView
 from django.urls import reverse
+from .models import UserProfile
 import os
 import logging
 
@@ -10,27 +11,25 @@ class CieloLoginView(LoginView):
     template_name = 'users/login.html'
 
     def get_success_url(self):
-        logger.debug(f"CieloLoginView.get_success_url called for user: {self.request.user}")
+        logger.debug("CieloLoginView.get_success_url called for user: %s", self.request.user)
         user = self.request.user
         deployment = os.environ.get('CIELO_DEPLOYMENT', '').lower()
-        logger.debug(f"Deployment environment: {deployment}")
-        if (
-            user.username == 'admin'
-            and user.check_password('admin')
-            and deployment not in ('development', 'dev')
-        ):
-            logger.debug("Redirecting admin to change password")
+        logger.debug("Deployment environment: %s", deployment)
+        # A stored flag rather than check_password('admin'), which would cost
+        # a full password hash on every administrator login.
+        if deployment not in ('development', 'dev') and UserProfile.must_change(user):
+            logger.debug("Redirecting %s to change password", user)
             return reverse('users:change_password')
         success_url = super().get_success_url()
-        logger.debug(f"Login success URL: {success_url}")
+        logger.debug("Login success URL: %s", success_url)
         return success_url
 
     def form_valid(self, form):
-        logger.debug(f"CieloLoginView.form_valid called for user: {form.get_user()}")
+        logger.debug("CieloLoginView.form_valid called for user: %s", form.get_user())
         return super().form_valid(form)
 
     def form_invalid(self, form):
-        logger.debug(f"CieloLoginView.form_invalid called with errors: {form.errors}")
+        logger.debug("CieloLoginView.form_invalid called with errors: %s", form.errors)
         return super().form_invalid(form)
 
 
@@ -40,12 +39,14 @@ class CieloPasswordChangeView(PasswordChangeView):
     def get_success_url(self):
         logger.debug("CieloPasswordChangeView.get_success_url called")
         success_url = reverse('users:login')
-        logger.debug(f"Password change success URL: {success_url}")
+        logger.debug("Password change success URL: %s", success_url)
         return success_url
 
     def form_valid(self, form):
-        logger.debug(f"CieloPasswordChangeView.form_valid called for user: {self.request.user}")
-        return super().form_valid(form)
+        logger.debug("CieloPasswordChangeView.form_valid called for user: %s", self.request.user)
+        response = super().form_valid(form)
+        UserProfile.objects.filter(user=self.request.user, must_change_password=True).update(must_change_password=False)
+        return response
 
 
 class CieloLogoutView(LogoutView):
@@ -54,28 +55,24 @@ class CieloLogoutView(LogoutView):
 
     def get_next_page(self):
         """Override to render template instead of redirecting."""
-        logger.debug("CieloLogoutView.get_next_page called")
-        logger.debug(f"User before logout: {self.request.user}")
-        logger.debug(f"User is authenticated: {self.request.user.is_authenticated}")
+        logger.debug("CieloLogoutView.get_next_page called for user: %s", self.request.user)
         return None
 
     def dispatch(self, request, *args, **kwargs):
-        logger.debug(f"CieloLogoutView.dispatch called - Method: {request.method}")
-        logger.debug(f"User: {request.user}, Authenticated: {request.user.is_authenticated}")
-        logger.debug(f"Session key: {request.session.session_key}")
+        # Debug calls pass the lazy user as an argument: it is only loaded
+        # when a record is actually formatted.
+        logger.debug("CieloLogoutView.dispatch called - Method: %s, User: %s, Session key: %s",
+                     request.method, request.user, request.session.session_key)
         return super().dispatch(request, *args, **kwargs)
 
     def post(self, request, *args, **kwargs):
-        logger.debug("CieloLogoutView.post called")
-        logger.debug(f"User before logout in post: {request.user}")
+        logger.debug("CieloLogoutView.post called for user: %s", request.user)
         response = super().post(request, *args, **kwargs)
-        logger.debug(f"Response type: {type(response)}")
-        logger.debug(f"Response status: {getattr(response, 'status_code', 'N/A')}")
+        logger.debug("Logout response: %s %s", type(response).__name__, getattr(response, 'status_code', 'N/A'))
         return response
 
     def get(self, request, *args, **kwargs):
-        logger.debug("CieloLogoutView.get called")
-        logger.debug(f"User in get: {request.user}")
+        logger.debug("CieloLogoutView.get called for user: %s", request.user)
         # For GET requests, actually perform the logout and render the template
         if request.user.is_authenticated:
             logger.debug("User is authenticated, performing logout")
@@ -83,5 +80,5 @@ class CieloLogoutView(LogoutView):
         else:
             logger.debug("User not authenticated, just render template")
             response = super().get(request, *args, **kwargs)
-        logger.debug(f"Response type: {type(response)}")
+        logger.debug("Logout response: %s %s", type(response).__name__, getattr(response, 'status_code', 'N/A'))
         return response